@@ -0,0 +1,100 @@
+import os
+import time
+from collections import Counter, deque
+from typing import Optional
+
+# Model calls per reply; tools are offered on all but the last one
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "4"))
+# Prompt plus completion tokens across the steps of one reply
+AGENT_TOKEN_BUDGET = int(os.getenv("AGENT_TOKEN_BUDGET", "32000"))
+# Wall clock for one reply; once spent, the next step must answer
+AGENT_TIME_BUDGET_SECONDS = float(os.getenv("AGENT_TIME_BUDGET_SECONDS", "60"))
+
+
+class StepBudget:
+    """
+    Limits of one reply's agent loop. Each step is one model call plus the
+    tools it asked for. A step may offer tools only while there is room for
+    another step afterwards, so the loop always ends with an answer rather
+    than a tool call nobody reads.
+    """
+
+    def __init__(self, max_steps: int = AGENT_MAX_STEPS, max_tokens: int = AGENT_TOKEN_BUDGET,
+                 max_seconds: float = AGENT_TIME_BUDGET_SECONDS):
+        self.max_steps = max(1, max_steps)
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.started = time.monotonic()
+        self.steps = 0
+        self.tokens = 0
+        # Which limit made the loop stop offering tools, if any
+        self.stopped_by: Optional[str] = None
+
+    def charge(self, tokens: int):
+        self.tokens += tokens
+
+    def allows_tools(self) -> bool:
+        if self.steps + 1 >= self.max_steps:
+            self.stopped_by = "steps"
+        elif self.tokens >= self.max_tokens:
+            self.stopped_by = "tokens"
+        elif time.monotonic() - self.started >= self.max_seconds:
+            self.stopped_by = "time"
+        else:
+            return True
+        return False
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+class AgentLoopStats:
+    """Steps per reply, step latency and which budget ended tool use."""
+
+    def __init__(self):
+        self.replies = 0
+        self.steps = Counter()
+        self.stopped_by = Counter()
+        self.tool_rounds = 0
+        # Tool calls the model sent on a step that offered none, never run
+        self.ignored_tool_calls = 0
+        self.tokens = 0
+        self._step_times = deque(maxlen=1000)
+        self._reply_times = deque(maxlen=1000)
+
+    def record_step(self, seconds: float, ran_tools: bool):
+        self._step_times.append(seconds)
+        if ran_tools:
+            self.tool_rounds += 1
+
+    def record_ignored_tool_calls(self, count: int):
+        self.ignored_tool_calls += count
+
+    def record_reply(self, budget: StepBudget):
+        self.replies += 1
+        self.steps[budget.steps] += 1
+        self.tokens += budget.tokens
+        if budget.stopped_by:
+            self.stopped_by[budget.stopped_by] += 1
+        self._reply_times.append(budget.elapsed())
+
+    def stats(self) -> dict:
+        steps = sorted(self._step_times)
+        replies = sorted(self._reply_times)
+        return {
+            "max_steps": AGENT_MAX_STEPS,
+            "token_budget": AGENT_TOKEN_BUDGET,
+            "time_budget_seconds": AGENT_TIME_BUDGET_SECONDS,
+            "replies": self.replies,
+            "steps_per_reply": dict(sorted(self.steps.items())),
+            "tool_rounds": self.tool_rounds,
+            "ignored_tool_calls": self.ignored_tool_calls,
+            "budget_stops": dict(self.stopped_by),
+            "avg_tokens_per_reply": round(self.tokens / self.replies) if self.replies else None,
+            "step_p50_ms": round(steps[len(steps) // 2] * 1000, 1) if steps else None,
+            "step_p99_ms": round(steps[int(len(steps) * 0.99)] * 1000, 1) if steps else None,
+            "reply_p50_ms": round(replies[len(replies) // 2] * 1000, 1) if replies else None,
+        }
+
+
+agent_loop_stats = AgentLoopStats()
@@ -1,18 +1,217 @@
+import asyncio
 import os
 import json
+import time
 from typing import List, Dict, Any
-from mistralai import Mistral
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.database.models import User
 from .planner import Planner
 from .memory import AgentMemory
 from .tools import AgentTools
+from .context import get_context
+from .events import encode_event
+from .llm import llm_user, mistral_client
+from .agent_loop import StepBudget, agent_loop_stats
+from .prompt import PromptBuilder, PromptSection, clip, estimate_tokens, prefix_stats
+from .tool_calls import ToolCallAssembler
+from .tool_registry import ToolContext, ToolHandler, ToolRegistry
+
+# A plan is an LLM call that may queue and retry, so it gets more than the default tool timeout
+PLAN_TOOL_TIMEOUT = float(os.getenv("TOOL_PLAN_TIMEOUT_SECONDS", "90"))
+
+# Built once per process: the schemas are sent on every completion and
+# must stay byte-identical for provider-side prompt caching
+TOOL_DEFINITIONS: List[Dict] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_study_plan",
+            "description": "Generate a detailed study plan for a specific goal.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "goal": {"type": "string", "description": "The learning goal (e.g. 'Learn React')"},
+                    "timeframe": {"type": "string", "description": "Duration (e.g. '4 weeks')"},
+                    "weak_topics": {"type": "array", "items": {"type": "string"}, "description": "Topics the user struggles with"}
+                },
+                "required": ["goal"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_youtube_resources",
+            "description": "Search for learning videos on YouTube.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "topic": {"type": "string", "description": "The topic to search for"}
+                },
+                "required": ["topic"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_web_resources",
+            "description": "Search for documentation, tutorials and articles on a topic.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "topic": {"type": "string", "description": "The topic to search for"}
+                },
+                "required": ["topic"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "retrieve_current_plan",
+            "description": "Retrieve the full study plan created earlier in this chat session.",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_goal_progress",
+            "description": "Update the progress of the current goal when user completes tasks or achieves milestones.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "completed_tasks": {"type": "integer", "description": "Number of completed tasks/milestones"},
+                    "total_tasks": {"type": "integer", "description": "Total tasks/milestones defined in the plan"},
+                    "status": {"type": "string", "enum": ["active", "completed", "paused"], "description": "The updated status of the goal"}
+                },
+                "required": ["completed_tasks"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "conduct_quiz",
+            "description": "Generate a short quiz or assessment to test the user's knowledge on a topic.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "topic": {"type": "string", "description": "The subject of the quiz"},
+                    "difficulty": {"type": "string", "enum": ["beginner", "intermediate", "advanced"], "description": "Complexity level"}
+                },
+                "required": ["topic"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "schedule_learning_session",
+            "description": "Schedule a specific learning session or task in the user's calendar.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string", "description": "Title of the session"},
+                    "start_time_str": {"type": "string", "description": "ISO format date/time (e.g. 2024-05-01T10:00:00)"},
+                    "duration_minutes": {"type": "integer", "description": "Length of session in minutes"},
+                    "goal_id": {"type": "integer", "description": "Optional goal ID to link to"}
+                },
+                "required": ["title", "start_time_str", "duration_minutes"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_user_schedule",
+            "description": "Retrieve the user's scheduled tasks and sessions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date_str": {"type": "string", "description": "Optional date to filter by (ISO format)"}
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_notification",
+            "description": "Create a notification or alert for the user on their dashboard.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string", "description": "Title of the alert"},
+                    "message": {"type": "string", "description": "Detailed message"},
+                    "type": {"type": "string", "enum": ["daily_task", "reminder", "system"]},
+                    "scheduled_for": {"type": "string", "description": "Optional ISO format time to show this alert"}
+                },
+                "required": ["title", "message"]
+            }
+        }
+    }
+]
+
+TOOLS_JSON = json.dumps(TOOL_DEFINITIONS)
+
+# Identity, guidelines and nothing else: every system message starts with
+# exactly these bytes, so the provider can reuse the cached prefix (with
+# the tool schemas) across users and turns. Per-turn data goes after it.
+SYSTEM_PROMPT_PREFIX = """You are a PURE AUTONOMOUS AI LEARNING AGENT.
+Your core identity is to be PROACTIVE and GOAL-ORIENTED. Don't wait for instructions to be helpful.
+
+--- AGENT BEHAVIOR GUIDELINES ---
+1. ISOLATION: Focus strictly on the CURRENT ACTIVE MISSION shown below.
+2. PROACTIVITY: Actively check the user's schedule using 'get_user_schedule'. 
+3. SCHEDULING: If a new goal is set or a milestone reached, use 'schedule_learning_session' to book time in their calendar.
+4. ALERTS: Use 'create_notification' for daily tasks, reminders, or encouraging messages.
+5. ASSESSMENT: Regularly offer to 'conduct_quiz'. If the user's progress is stagnant, proactively ask about their status or if they need resources.
+6. AUTONOMY: Don't just respond; lead the user. Use your tools whenever it helps the user stay on track.
+
+Be comprehensive, motivating, and highly organized. 
+Update progress using 'update_goal_progress' whenever the user completes a task.
+"""
+
+SYSTEM_PROMPT_CONTEXT = """
+--- CURRENT DATE AND TIME ---
+Today's Date: {current_date}
+Current Time: {current_time}
+IMPORTANT: When scheduling events or referring to dates, use the year 2026, NOT 2024 or any other year.
+--- END OF DATE/TIME INFO ---
+
+{current_goal}
+
+{session_summary}{session_history}
+
+{memories}
+
+{other_goals}
+"""
+
+# Section frames; PromptBuilder only adds a header and footer when at least one item fits
+SESSION_HISTORY_HEADER = "\n--- CURRENT SESSION HISTORY ---\n"
+SESSION_HISTORY_FOOTER = "--- END OF CURRENT SESSION HISTORY ---\n"
+SESSION_SUMMARY_HEADER = "\n--- EARLIER IN THIS SESSION (SUMMARY) ---\n"
+SESSION_SUMMARY_FOOTER = "--- END OF SUMMARY ---\n"
+MEMORIES_HEADER = "\n--- RELEVANT MEMORIES (EARLIER CONVERSATIONS AND ROADMAPS) ---\n"
+MEMORIES_FOOTER = "--- END OF RELEVANT MEMORIES ---\n"
+NO_MEMORIES = "\n(No relevant memories of earlier conversations.)\n"
+OTHER_GOALS_HEADER = "\n--- YOUR OTHER MISSIONS (LONG-TERM MEMORY) ---\n"
+OTHER_GOALS_FOOTER = "--- END OF LONG-TERM MEMORY ---\n"
+NO_OTHER_GOALS = "\n(No other missions recorded in long-term memory.)\n"
 
 class AgentBrain:
     def __init__(self):
         self.planner = Planner()
         self.memory = AgentMemory()
         self.tools = AgentTools()
+        self.registry = ToolRegistry(self._get_tools_definition(), self._tool_handlers())
+        self.prompt_builder = PromptBuilder()
         
         self.api_key = os.getenv("MISTRAL_API_KEY")
         self.mock_mode = os.getenv("MOCK_AGENT_MODE", "false").lower() == "true"
@@ -27,119 +226,11 @@ class AgentBrain:
             # Mask key for logging
             masked_key = self.api_key[:5] + "..." + self.api_key[-5:] if len(self.api_key) > 10 else "***"
             print(f"✅ Mistral client initialized with key: {masked_key}")
-            self.client = Mistral(api_key=self.api_key)
+            # Pooled and rate limited; its HTTP client is opened by the app lifespan
+            self.client = mistral_client
 
     def _get_tools_definition(self) -> List[Dict]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "generate_study_plan",
-                    "description": "Generate a detailed study plan for a specific goal.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "goal": {"type": "string", "description": "The learning goal (e.g. 'Learn React')"},
-                            "timeframe": {"type": "string", "description": "Duration (e.g. '4 weeks')"},
-                            "weak_topics": {"type": "array", "items": {"type": "string"}, "description": "Topics the user struggles with"}
-                        },
-                        "required": ["goal"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_youtube_resources",
-                    "description": "Search for learning videos on YouTube.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "topic": {"type": "string", "description": "The topic to search for"}
-                        },
-                        "required": ["topic"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "update_goal_progress",
-                    "description": "Update the progress of the current goal when user completes tasks or achieves milestones.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "completed_tasks": {"type": "integer", "description": "Number of completed tasks/milestones"},
-                            "total_tasks": {"type": "integer", "description": "Total tasks/milestones defined in the plan"},
-                            "status": {"type": "string", "enum": ["active", "completed", "paused"], "description": "The updated status of the goal"}
-                        },
-                        "required": ["completed_tasks"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "conduct_quiz",
-                    "description": "Generate a short quiz or assessment to test the user's knowledge on a topic.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "topic": {"type": "string", "description": "The subject of the quiz"},
-                            "difficulty": {"type": "string", "enum": ["beginner", "intermediate", "advanced"], "description": "Complexity level"}
-                        },
-                        "required": ["topic"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "schedule_learning_session",
-                    "description": "Schedule a specific learning session or task in the user's calendar.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "title": {"type": "string", "description": "Title of the session"},
-                            "start_time_str": {"type": "string", "description": "ISO format date/time (e.g. 2024-05-01T10:00:00)"},
-                            "duration_minutes": {"type": "integer", "description": "Length of session in minutes"},
-                            "goal_id": {"type": "integer", "description": "Optional goal ID to link to"}
-                        },
-                        "required": ["title", "start_time_str", "duration_minutes"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_user_schedule",
-                    "description": "Retrieve the user's scheduled tasks and sessions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "date_str": {"type": "string", "description": "Optional date to filter by (ISO format)"}
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_notification",
-                    "description": "Create a notification or alert for the user on their dashboard.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "title": {"type": "string", "description": "Title of the alert"},
-                            "message": {"type": "string", "description": "Detailed message"},
-                            "type": {"type": "string", "enum": ["daily_task", "reminder", "system"]},
-                            "scheduled_for": {"type": "string", "description": "Optional ISO format time to show this alert"}
-                        },
-                        "required": ["title", "message"]
-                    }
-                }
-            }
-        ]
+        return TOOL_DEFINITIONS
 
     def _process_mock_message(self, user_message: str) -> dict:
         """
@@ -161,240 +252,263 @@ class AgentBrain:
             "text": f"I'm in Mock Mode! You said: '{user_message}'. To use the real AI, please add a valid MISTRAL_API_KEY to your .env and set MOCK_AGENT_MODE=false."
         }
 
-    async def process_message_stream(self, user_message: str, user: User, db: Session, session_id: int):
+    def _tool_handlers(self) -> Dict[str, ToolHandler]:
+        """How each tool in _get_tools_definition runs; ids come from the ToolContext."""
+        tools = self.tools
+        return {
+            "generate_study_plan": ToolHandler("io", lambda args, ctx: self.planner.generate_plan(
+                goal=args.get("goal"),
+                timeframe=args.get("timeframe", "2 weeks"),
+                weak_topics=args.get("weak_topics", []),
+                client=self.client
+            ), timeout=PLAN_TOOL_TIMEOUT),
+            "search_youtube_resources": ToolHandler("io", lambda args, ctx: tools.search_youtube(args.get("topic"))),
+            "search_web_resources": ToolHandler("io", lambda args, ctx: tools.search_web_resources(args.get("topic"))),
+            "conduct_quiz": ToolHandler("io", lambda args, ctx: tools.conduct_quiz(
+                topic=args.get("topic"),
+                difficulty=args.get("difficulty", "beginner")
+            )),
+            "update_goal_progress": ToolHandler("db", lambda args, ctx, db: tools.update_goal_progress(
+                session_id=ctx.session_id,
+                completed_tasks=args.get("completed_tasks"),
+                total_tasks=args.get("total_tasks"),
+                status=args.get("status"),
+                db=db
+            )),
+            "retrieve_current_plan": ToolHandler("db", lambda args, ctx, db: tools.retrieve_current_plan(
+                session_id=ctx.session_id,
+                db=db
+            )),
+            "schedule_learning_session": ToolHandler("db", lambda args, ctx, db: tools.schedule_learning_session(
+                title=args.get("title"),
+                start_time_str=args.get("start_time_str"),
+                duration_minutes=args.get("duration_minutes"),
+                goal_id=args.get("goal_id"),
+                user_id=ctx.user_id,
+                db=db
+            )),
+            "get_user_schedule": ToolHandler("db", lambda args, ctx, db: tools.get_user_schedule(
+                date_str=args.get("date_str"),
+                user_id=ctx.user_id,
+                db=db
+            )),
+            "create_notification": ToolHandler("db", lambda args, ctx, db: tools.create_notification(
+                title=args.get("title"),
+                message=args.get("message"),
+                type=args.get("type", "reminder"),
+                scheduled_for=args.get("scheduled_for"),
+                user_id=ctx.user_id,
+                db=db
+            )),
+        }
+
+    def _dispatch_tool(self, ready: dict, user: User, session_id: int, tool_tasks: list) -> dict:
+        """Starts one assembled tool call as a task and returns its status event."""
+        function_name = ready["call"]["function"]["name"]
+        if "error" in ready:
+            # Malformed arguments fail this call only; the model sees the error as its result
+            task = asyncio.get_running_loop().create_future()
+            task.set_result({"error": ready["error"]})
+            tool_tasks.append((ready["call"], function_name, task))
+        elif function_name in self.registry:
+            task = asyncio.ensure_future(
+                self.registry.run(function_name, ready["args"], ToolContext(user.id, session_id))
+            )
+            tool_tasks.append((ready["call"], function_name, task))
+        return {"type": "status", "text": f"Running tool: {function_name}..."}
+
+    def _tool_events(self, function_name: str, result, user: User) -> List[dict]:
+        """UI events for a finished tool; a plan is also saved to memory."""
+        if isinstance(result, dict) and "error" in result:
+            # Failed or timed out in the registry: the model sees the error, the UI gets no plan or resources
+            return [{"type": "status", "text": f"{result['error']}; continuing without it..."}]
+        if function_name == "generate_study_plan":
+            # Explicitly save roadmap to memory
+            roadmap_text = f"Study Plan/Roadmap: {result.get('overview', '')}\nSchedule: {json.dumps(result.get('weekly_schedule', []))}"
+            self.memory.add_memory(user.id, roadmap_text, {"type": "roadmap", "goal": result.get('overview', '')})
+            return [{"type": "plan", "content": result}]
+        if function_name in ["search_youtube_resources", "search_web_resources"]:
+            key = "videos" if "youtube" in function_name else "web"
+            return [{"type": "resources", "content": {key: result}}]
+        return []
+
+    async def process_message_stream(self, user_message: str, user: User, db: AsyncSession, session_id: int):
         """
         Streaming version of process_message.
-        Yields JSON chunks for the frontend to consume.
+        Yields NDJSON lines for the frontend to consume.
+        """
+        async for event in self.process_message_events(user_message, user, db, session_id):
+            yield encode_event(event)
+
+    async def process_message_events(self, user_message: str, user: User, db: AsyncSession, session_id: int):
+        """
+        Yields the reply as structured event dicts (status, chat_start,
+        chat_chunk, plan, resources, chat_end, error); callers serialize
+        them once. `user` only needs an `id`.
         """
-        import asyncio
         
         if self.mock_mode:
             # Yield mock response in chunks for simulation
             resp = self._process_mock_message(user_message)
-            yield json.dumps({"type": "chat_start", "role": "agent"}) + "\n"
+            yield {"type": "chat_start", "role": "agent"}
             words = resp["text"].split()
             for i, word in enumerate(words):
-                yield json.dumps({"type": "chat_chunk", "text": word + (" " if i < len(words)-1 else "")}) + "\n"
+                yield {"type": "chat_chunk", "text": word + (" " if i < len(words)-1 else "")}
                 await asyncio.sleep(0.05)
             
             if resp.get("type") == "plan":
-                yield json.dumps({"type": "plan", "content": resp["content"]}) + "\n"
+                yield {"type": "plan", "content": resp["content"]}
             return
 
         if not self.client:
-            yield json.dumps({"type": "error", "text": "MISTRAL_API_KEY is missing."}) + "\n"
+            yield {"type": "error", "text": "MISTRAL_API_KEY is missing."}
             return
 
+        # Upstream calls made for this turn count against this user's share
+        llm_user.set(user.id)
+
         # Immediate feedback
-        yield json.dumps({"type": "status", "text": "Analyzing your goal..."}) + "\n"
+        yield {"type": "status", "text": "Analyzing your goal..."}
 
-        # 1. Retrieve Global Context (Cross-Session Memory)
-        from backend.database.models import Chat
-        
-        # Fetch last 20 messages across OTHER sessions (long-term memory)
-        recent_chats = db.query(Chat).filter(Chat.user_id == user.id, Chat.session_id != session_id)\
-            .order_by(Chat.timestamp.desc())\
-            .limit(20).all()
-        
-        # Reverse to get chronological order (oldest to newest for LLM)
-        recent_chats.reverse()
-        
-        # 1. Retrieve Global Context (Summary of Other Goals)
-        from backend.database.models import Chat, Goal
-        
-        other_goals = db.query(Goal).filter(Goal.user_id == user.id, Goal.session_id != session_id).all()
-        
-        global_summary = ""
-        if other_goals:
-            global_summary = "\n--- YOUR OTHER MISSIONS (LONG-TERM MEMORY) ---\n"
-            for g in other_goals:
-                global_summary += f"- Mission: {g.text} | Progress: {g.progress}% | Status: {g.status}\n"
-            global_summary += "--- END OF LONG-TERM MEMORY ---\n"
-        else:
-            global_summary = "\n(No other missions recorded in long-term memory.)\n"
-
-        # 2. Specifically look for current session's goal
-        from backend.database.models import Goal
-        current_goal = db.query(Goal).filter(Goal.session_id == session_id).first()
-        current_goal_info = "No specific ACTIVE mission for this chat yet."
-        if current_goal:
-            current_goal_info = f"CURRENT ACTIVE MISSION: '{current_goal.text}'\nProgress: {current_goal.progress}% ({current_goal.completed_tasks}/{current_goal.total_tasks} milestones completed)\nStatus: {current_goal.status}"
-
-        # 3. Retrieve Current Session History (Focused Context)
-        session_chats = db.query(Chat).filter(Chat.session_id == session_id)\
-            .order_by(Chat.timestamp.desc())\
-            .limit(10).all()
-        session_chats.reverse()
-        session_context = "\n--- CURRENT SESSION HISTORY ---\n"
-        for c in session_chats:
-            session_context += f"{c.role.capitalize()}: {c.message}\n"
-        session_context += "--- END OF CURRENT SESSION HISTORY ---\n"
-
-        tools = self._get_tools_definition()
+        # 1. Retrieve mission and session context (cached per session, three queries on a miss),
+        #    and the long-term memories closest to this message; a slow query embedding
+        #    is given up after MEMORY_RETRIEVAL_TIMEOUT_MS rather than delaying the reply
+        context, memories = await asyncio.gather(
+            get_context(db, user.id, session_id),
+            self.memory.retrieve_memory(user.id, user_message)
+        )
+
+        # End the read transaction so the pooled connection is not held
+        # for the whole (slow) LLM reply.
+        await db.commit()
+
+        tools = self.registry.definitions()
         
-        # Get current date/time for the agent
+        # Get current date/time for the agent; minutes are enough and repeat between close turns
         from datetime import datetime
-        current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        current_date = datetime.now().strftime("%B %d, %Y")
+        now = datetime.now()
         
-        system_msg = f"""You are a PURE AUTONOMOUS AI LEARNING AGENT.
-Your core identity is to be PROACTIVE and GOAL-ORIENTED. Don't wait for instructions to be helpful.
+        # Sections are filled in priority order until the prompt budget is spent
+        system_msg = self.prompt_builder.build(SYSTEM_PROMPT_CONTEXT, [
+            PromptSection("current_goal", 0, [context.render_current_goal()]),
+            PromptSection("session_history", 1, [clip(line) for line in context.history_items()],
+                          header=SESSION_HISTORY_HEADER, footer=SESSION_HISTORY_FOOTER,
+                          empty=SESSION_HISTORY_HEADER + SESSION_HISTORY_FOOTER, chronological=True),
+            PromptSection("session_summary", 2, [clip(context.session_summary) + "\n"] if context.session_summary else [],
+                          header=SESSION_SUMMARY_HEADER, footer=SESSION_SUMMARY_FOOTER),
+            PromptSection("memories", 3, [clip(item) for item in self.memory.memory_items(memories)],
+                          header=MEMORIES_HEADER, footer=MEMORIES_FOOTER, empty=NO_MEMORIES),
+            PromptSection("other_goals", 4, context.other_goal_items(),
+                          header=OTHER_GOALS_HEADER, footer=OTHER_GOALS_FOOTER, empty=NO_OTHER_GOALS),
+        ], prefix=SYSTEM_PROMPT_PREFIX, values={
+            "current_date": now.strftime("%B %d, %Y"),
+            "current_time": now.strftime("%Y-%m-%d %H:%M"),
+        }).text
 
---- CURRENT DATE AND TIME ---
-Today's Date: {current_date}
-Current Time: {current_datetime}
-IMPORTANT: When scheduling events or referring to dates, use the year 2026, NOT 2024 or any other year.
---- END OF DATE/TIME INFO ---
+        messages = [
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": user_message}
+        ]
+
+        budget = StepBudget()
+        try:
+            yield {"type": "chat_start", "role": "agent"}
 
-{current_goal_info}
+            text_parts = []
+            # Each step is one completion; tool results go back to the model
+            # until it answers in text or a budget runs out
+            while True:
+                offer_tools = budget.allows_tools()
+                budget.steps += 1
+                step_started = time.perf_counter()
+                if budget.steps > 1:
+                    text = "Wrapping up response..." if not offer_tools else f"Reviewing results (step {budget.steps})..."
+                    yield {"type": "status", "text": text}
 
-{session_context}
+                # Mistral chat.stream_async returns an async iterator; it holds an
+                # upstream slot until closed, so nothing may yield before `async with`
+                # Tools stay in the request even when they may not be called, so
+                # every step shares the same cacheable prefix
+                prefix_stats.record(user.id, TOOLS_JSON, messages, SYSTEM_PROMPT_PREFIX)
+                stream = await self.client.chat.stream_async(
+                    model="mistral-large-latest",
+                    messages=messages,
+                    tools=tools,
+                    tool_choice="auto" if offer_tools else "none"
+                )
 
-{global_summary}
+                step_parts = []
+                usage = None
+                assembler = ToolCallAssembler()
+                # (tool call, name, task) in call order; each task starts as soon
+                # as its arguments are complete, while the model is still streaming
+                tool_tasks = []
+                shown = set()
+                ignored_calls = 0
 
---- AGENT BEHAVIOR GUIDELINES ---
-1. ISOLATION: Focus strictly on the CURRENT ACTIVE MISSION shown above.
-2. PROACTIVITY: Actively check the user's schedule using 'get_user_schedule'. 
-3. SCHEDULING: If a new goal is set or a milestone reached, use 'schedule_learning_session' to book time in their calendar.
-4. ALERTS: Use 'create_notification' for daily tasks, reminders, or encouraging messages.
-5. ASSESSMENT: Regularly offer to 'conduct_quiz'. If the user's progress is stagnant, proactively ask about their status or if they need resources.
-6. AUTONOMY: Don't just respond; lead the user. Use your tools whenever it helps the user stay on track.
+                try:
+                    # Closing the stream drops the HTTP response if we are cancelled mid-reply
+                    async with stream:
+                        async for chunk in stream:
+                            usage = getattr(chunk.data, "usage", None) or usage
+                            delta = chunk.data.choices[0].delta
 
-Be comprehensive, motivating, and highly organized. 
-Update progress using 'update_goal_progress' whenever the user completes a task.
-"""
+                            # Handle text chunks
+                            if delta.content:
+                                text_parts.append(delta.content)
+                                step_parts.append(delta.content)
+                                yield {"type": "chat_chunk", "text": delta.content}
 
-        messages = [
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_message}
-        ]
+                            # Handle tool call chunks; on a step with tool_choice="none"
+                            # the model may still send some, and they are dropped
+                            if delta.tool_calls and not offer_tools:
+                                ignored_calls += sum(1 for tc_delta in delta.tool_calls if tc_delta.id)
+                            elif delta.tool_calls:
+                                for tc_delta in delta.tool_calls:
+                                    for ready in assembler.feed(tc_delta):
+                                        yield self._dispatch_tool(ready, user, session_id, tool_tasks)
 
-        try:
-            # Mistral chat.stream_async returns an async iterator
-            stream = await self.client.chat.stream_async(
-                model="mistral-large-latest",
-                messages=messages,
-                tools=tools,
-                tool_choice="auto"
-            )
-            
-            full_text = ""
-            tool_calls_collected = []
-            
-            yield json.dumps({"type": "chat_start", "role": "agent"}) + "\n"
-
-            async for chunk in stream:
-                delta = chunk.data.choices[0].delta
-                
-                # Handle text chunks
-                if delta.content:
-                    full_text += delta.content
-                    yield json.dumps({"type": "chat_chunk", "text": delta.content}) + "\n"
-                
-                # Handle tool call chunks
-                if delta.tool_calls:
-                    for tc_delta in delta.tool_calls:
-                        if len(tool_calls_collected) <= tc_delta.index:
-                            tool_calls_collected.append({
-                                "id": tc_delta.id,
-                                "function": {
-                                    "name": tc_delta.function.name,
-                                    "arguments": tc_delta.function.arguments or ""
-                                }
-                            })
-                        else:
-                            if tc_delta.function.arguments:
-                                tool_calls_collected[tc_delta.index]["function"]["arguments"] += tc_delta.function.arguments
-
-            if tool_calls_collected:
-                assistant_msg = {
+                            # Show plans and resources that finished before the model did
+                            for position, (_, function_name, task) in enumerate(tool_tasks):
+                                if position not in shown and task.done() and task.exception() is None:
+                                    shown.add(position)
+                                    for event in self._tool_events(function_name, task.result(), user):
+                                        yield event
+
+                    for ready in assembler.finish():
+                        yield self._dispatch_tool(ready, user, session_id, tool_tasks)
+
+                    # This round's tools run concurrently; a client disconnect cancels them all here
+                    results = await asyncio.gather(*[t[2] for t in tool_tasks])
+                finally:
+                    for _, _, task in tool_tasks:
+                        if not task.done():
+                            task.cancel()
+
+                step_text = "".join(step_parts)
+                if usage is not None and getattr(usage, "total_tokens", None):
+                    budget.charge(usage.total_tokens)
+                else:
+                    budget.charge(estimate_tokens(json.dumps(messages)) + estimate_tokens(step_text)
+                                  + sum(estimate_tokens(c["function"]["arguments"]) for c in assembler.calls))
+
+                if ignored_calls:
+                    agent_loop_stats.record_ignored_tool_calls(ignored_calls)
+                # Hard stop at max_steps even if a budget check above ever lets tools through
+                if not assembler.calls or budget.steps >= budget.max_steps:
+                    agent_loop_stats.record_step(time.perf_counter() - step_started, ran_tools=False)
+                    break
+
+                messages.append({
                     "role": "assistant",
-                    "content": full_text or None,
-                    "tool_calls": tool_calls_collected
-                }
-                messages.append(assistant_msg)
-                
-                # Parallelize tool execution
-                tool_tasks = []
-                for tool_call in tool_calls_collected:
-                    function_name = tool_call["function"]["name"]
-                    function_args = json.loads(tool_call["function"]["arguments"])
-                    
-                    yield json.dumps({"type": "status", "text": f"Running tool: {function_name}..."}) + "\n"
-                    
-                    if function_name == "generate_study_plan":
-                        task = self.planner.generate_plan(
-                            goal=function_args.get("goal"),
-                            timeframe=function_args.get("timeframe", "2 weeks"),
-                            weak_topics=function_args.get("weak_topics", []),
-                            client=self.client
-                        )
-                    elif function_name == "search_youtube_resources":
-                        task = self.tools.search_youtube(function_args.get("topic"))
-                    elif function_name == "search_web_resources":
-                        task = self.tools.search_web_resources(function_args.get("topic"))
-                    elif function_name == "update_goal_progress":
-                        task = self.tools.update_goal_progress(
-                            session_id=session_id,
-                            completed_tasks=function_args.get("completed_tasks"),
-                            total_tasks=function_args.get("total_tasks"),
-                            status=function_args.get("status"),
-                            db=db
-                        )
-                    elif function_name == "retrieve_current_plan":
-                        task = self.tools.retrieve_current_plan(
-                            session_id=session_id,
-                            db=db
-                        )
-                    elif function_name == "conduct_quiz":
-                        task = self.tools.conduct_quiz(
-                            topic=function_args.get("topic"),
-                            difficulty=function_args.get("difficulty", "beginner")
-                        )
-                    elif function_name == "set_reminder":
-                        task = self.tools.set_reminder(
-                            task=function_args.get("task"),
-                            time=function_args.get("time")
-                        )
-                    elif function_name == "schedule_learning_session":
-                        task = self.tools.schedule_learning_session(
-                            title=function_args.get("title"),
-                            start_time_str=function_args.get("start_time_str"),
-                            duration_minutes=function_args.get("duration_minutes"),
-                            goal_id=function_args.get("goal_id"),
-                            db=db
-                        )
-                    elif function_name == "get_user_schedule":
-                        task = self.tools.get_user_schedule(
-                            date_str=function_args.get("date_str"),
-                            db=db
-                        )
-                    elif function_name == "create_notification":
-                        task = self.tools.create_notification(
-                            title=function_args.get("title"),
-                            message=function_args.get("message"),
-                            type=function_args.get("type", "reminder"),
-                            scheduled_for=function_args.get("scheduled_for"),
-                            db=db
-                        )
-                    else:
-                        continue
-                    
-                    tool_tasks.append((tool_call, function_name, task))
-
-                # Execute all tasks in parallel
-                results = await asyncio.gather(*[t[2] for t in tool_tasks])
-                
-                for (tool_call, function_name, _), result in zip(tool_tasks, results):
-                    # Yield result immediately to UI
-                    if function_name == "generate_study_plan":
-                        yield json.dumps({"type": "plan", "content": result}) + "\n"
-                        # Explicitly save roadmap to memory
-                        roadmap_text = f"Study Plan/Roadmap: {result.get('overview', '')}\nSchedule: {json.dumps(result.get('weekly_schedule', []))}"
-                        self.memory.add_memory(user.id, roadmap_text, {"type": "roadmap", "goal": result.get('overview', '')})
-                    elif function_name in ["search_youtube_resources", "search_web_resources"]:
-                        key = "videos" if "youtube" in function_name else "web"
-                        yield json.dumps({"type": "resources", "content": {key: result}}) + "\n"
+                    "content": step_text or None,
+                    "tool_calls": assembler.calls
+                })
+
+                for position, ((tool_call, function_name, _), result) in enumerate(zip(tool_tasks, results)):
+                    if position not in shown:
+                        for event in self._tool_events(function_name, result, user):
+                            yield event
 
                     messages.append({
                         "role": "tool",
@@ -402,28 +516,25 @@ Update progress using 'update_goal_progress' whenever the user completes a task.
                         "content": json.dumps(result),
                         "tool_call_id": tool_call["id"]
                     })
+                agent_loop_stats.record_step(time.perf_counter() - step_started, ran_tools=True)
 
-                # Final follow up
-                yield json.dumps({"type": "status", "text": "Wrapping up response..."}) + "\n"
-                
-                follow_up_stream = await self.client.chat.stream_async(
-                    model="mistral-large-latest",
-                    messages=messages
+            full_text = "".join(text_parts)
+            # Remember the exchange so later turns (and other sessions) can
+            # retrieve it; queued, so the reply does not wait for the embedding
+            if full_text:
+                self.memory.add_memory(
+                    user.id,
+                    f"User: {user_message}\nAgent: {full_text}",
+                    {"type": "exchange", "session_id": session_id}
                 )
-                
-                async for chunk in follow_up_stream:
-                    delta = chunk.data.choices[0].delta
-                    if delta.content:
-                        full_text += delta.content
-                        yield json.dumps({"type": "chat_chunk", "text": delta.content}) + "\n"
-
-            yield json.dumps({"type": "chat_end", "full_text": full_text}) + "\n"
+            agent_loop_stats.record_reply(budget)
+            yield {"type": "chat_end", "full_text": full_text}
 
         except Exception as e:
             error_msg = str(e)
             print(f"❌ Error in Mistral streaming: {error_msg}")
-            yield json.dumps({"type": "error", "text": f"Error communicating with Mistral: {error_msg}"}) + "\n"
+            yield {"type": "error", "text": f"Error communicating with Mistral: {error_msg}"}
 
-    def process_message(self, user_message: str, user: User, db: Session, session_id: int) -> dict:
+    def process_message(self, user_message: str, user: User, db: AsyncSession, session_id: int) -> dict:
         
         return {"text": "Sync process_message is deprecated. Please use the streaming version."}
@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database.models import Chat, Goal, SessionSummary
+from .prompt import HISTORY_LIMIT
+
+
+@dataclass
+class GoalSummary:
+    session_id: Optional[int]
+    text: str
+    progress: int
+    status: str
+    completed_tasks: int
+    total_tasks: int
+
+
+@dataclass
+class ConversationContext:
+    """
+    Everything the agent prompt needs about the user's missions and the current session.
+
+    `session_history` holds every message after the session summary (up to
+    `history_limit`), so each message is always either quoted or summarized;
+    the prompt budget decides how many of the oldest ones are left out.
+    """
+    current_goal: Optional[GoalSummary] = None
+    other_goals: List[GoalSummary] = field(default_factory=list)
+    session_history: List[Tuple[int, str, str]] = field(default_factory=list)  # (chat id, role, message), oldest first
+    history_limit: int = HISTORY_LIMIT
+    # Rolling summary of the session's messages up to chat id `summarized_until`
+    session_summary: str = ""
+    summarized_until: int = 0
+    # Rendered current mission, dropped whenever it changes
+    _rendered: Dict[str, str] = field(default_factory=dict, repr=False)
+
+    def append_message(self, chat_id: int, role: str, message: str):
+        self.session_history.append((chat_id, role, message))
+        del self.session_history[:-self.history_limit]
+
+    def apply_goal(self, session_id: int, goal: GoalSummary):
+        """Applies a created/updated goal as seen from the chat session `session_id`."""
+        if goal.session_id == session_id:
+            self.current_goal = goal
+            self._rendered.pop("current_goal", None)
+            return
+        self.other_goals = [g for g in self.other_goals if g.session_id != goal.session_id] + [goal]
+
+    def apply_summary(self, summary: str, summarized_until: int):
+        """Takes a newer summary and drops the messages it now covers."""
+        if summarized_until < self.summarized_until:
+            return
+        self.session_summary = summary
+        self.summarized_until = summarized_until
+        self.session_history = [m for m in self.session_history if m[0] > summarized_until]
+
+    def history_items(self) -> List[str]:
+        """The messages since the summary as prompt lines, newest first."""
+        return [f"{role.capitalize()}: {message}\n" for _, role, message in reversed(self.session_history)]
+
+    def other_goal_items(self) -> List[str]:
+        return [f"- Mission: {g.text} | Progress: {g.progress}% | Status: {g.status}\n" for g in self.other_goals]
+
+    def render_current_goal(self) -> str:
+        if "current_goal" not in self._rendered:
+            self._rendered["current_goal"] = self._render_current_goal()
+        return self._rendered["current_goal"]
+
+    def _render_current_goal(self) -> str:
+        goal = self.current_goal
+        if not goal:
+            return "No specific ACTIVE mission for this chat yet."
+        return f"CURRENT ACTIVE MISSION: '{goal.text}'\nProgress: {goal.progress}% ({goal.completed_tasks}/{goal.total_tasks} milestones completed)\nStatus: {goal.status}"
+
+
+class ContextCache:
+    """
+    In-process LRU cache of ConversationContext keyed by (user_id, session_id).
+
+    Writers update cached entries in place (write-through) instead of
+    invalidating them, so a busy session keeps hitting the cache. Entries also
+    expire after `ttl_seconds`, which bounds staleness when several workers
+    write to the same store.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, ConversationContext]]" = OrderedDict()
+        # Bumped on every write for a user; a load that raced with a write is not cached
+        self._user_versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, user_id: int) -> int:
+        with self._lock:
+            return self._user_versions.get(user_id, 0)
+
+    def get(self, user_id: int, session_id: int) -> Optional[ConversationContext]:
+        key = (user_id, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id: int, session_id: int, context: ConversationContext, version: int):
+        with self._lock:
+            if self._user_versions.get(user_id, 0) != version:
+                return
+            self._entries[(user_id, session_id)] = (time.monotonic() + self.ttl_seconds, context)
+            self._entries.move_to_end((user_id, session_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def append_message(self, user_id: int, session_id: int, chat_id: int, role: str, message: str):
+        with self._lock:
+            self._bump(user_id)
+            entry = self._entries.get((user_id, session_id))
+            if entry:
+                entry[1].append_message(chat_id, role, message)
+
+    def upsert_goal(self, user_id: int, goal: GoalSummary):
+        with self._lock:
+            self._bump(user_id)
+            if goal.session_id is None:
+                # Goals without a chat session never appear in the prompt
+                return
+            for (cached_user, cached_session), (_, context) in self._entries.items():
+                if cached_user == user_id:
+                    context.apply_goal(cached_session, goal)
+
+    def set_summary(self, user_id: int, session_id: int, summary: str, summarized_until: int):
+        with self._lock:
+            self._bump(user_id)
+            entry = self._entries.get((user_id, session_id))
+            if entry:
+                entry[1].apply_summary(summary, summarized_until)
+
+    def invalidate(self, user_id: int, session_id: int):
+        with self._lock:
+            self._bump(user_id)
+            self._entries.pop((user_id, session_id), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _bump(self, user_id: int):
+        self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+
+
+context_cache = ContextCache(
+    max_entries=int(os.getenv("CONTEXT_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "300")),
+)
+
+
+def goal_summary(goal) -> GoalSummary:
+    return GoalSummary(goal.session_id, goal.text, goal.progress, goal.status, goal.completed_tasks, goal.total_tasks)
+
+
+async def build_context(db: AsyncSession, user_id: int, session_id: int,
+                        history_limit: int = HISTORY_LIMIT) -> ConversationContext:
+    """
+    Loads the prompt context in three column-only queries: every goal
+    relevant to this turn (the session's goal and the user's other missions),
+    the session's rolling summary, and the messages after it.
+    """
+    goal_rows = (await db.execute(
+        select(
+            Goal.user_id, Goal.session_id, Goal.text, Goal.progress, Goal.status,
+            Goal.completed_tasks, Goal.total_tasks,
+        )
+        .filter(or_(Goal.user_id == user_id, Goal.session_id == session_id))
+        .order_by(Goal.id)
+    )).all()
+
+    summary_row = (await db.execute(
+        select(SessionSummary.summary, SessionSummary.summarized_until)
+        .filter(SessionSummary.session_id == session_id)
+    )).first()
+    summarized_until = summary_row.summarized_until if summary_row else 0
+
+    chat_rows = (await db.execute(
+        select(Chat.id, Chat.role, Chat.message)
+        .filter(Chat.session_id == session_id, Chat.id > summarized_until)
+        .order_by(Chat.timestamp.desc(), Chat.id.desc())
+        .limit(history_limit)
+    )).all()
+
+    context = ConversationContext(
+        history_limit=history_limit,
+        session_summary=summary_row.summary if summary_row else "",
+        summarized_until=summarized_until,
+    )
+    for row in goal_rows:
+        summary = GoalSummary(row.session_id, row.text, row.progress, row.status, row.completed_tasks, row.total_tasks)
+        if row.session_id == session_id:
+            if context.current_goal is None:
+                context.current_goal = summary
+        elif row.user_id == user_id and row.session_id is not None:
+            # Goals without a chat session never matched the old `session_id != x` filter
+            context.other_goals.append(summary)
+
+    # Newest-first from the query; the prompt wants chronological order
+    context.session_history = [(row.id, row.role, row.message) for row in reversed(chat_rows)]
+    return context
+
+
+async def get_context(db: AsyncSession, user_id: int, session_id: int) -> ConversationContext:
+    """
+    Returns the cached context for this session, loading it from the database on a miss.
+    """
+    context = context_cache.get(user_id, session_id)
+    if context is None:
+        version = context_cache.version(user_id)
+        context = await build_context(db, user_id, session_id)
+        context_cache.put(user_id, session_id, context, version)
+    return context
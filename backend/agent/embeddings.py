@@ -0,0 +1,75 @@
+import os
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+from .llm import mistral_client
+
+# "mistral" (mistral-embed through the managed client) or "hashing" (local, no API calls)
+EMBEDDER = os.getenv("EMBEDDER", "mistral" if os.getenv("MISTRAL_API_KEY") else "hashing")
+HASHING_DIMENSIONS = int(os.getenv("HASHING_EMBEDDER_DIMENSIONS", "512"))
+
+_WORD = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """
+    Local feature-hashing embedder: words and character trigrams hashed into
+    a fixed number of signed buckets, L2-normalized. Captures lexical overlap
+    only, but costs no API call and is deterministic across processes.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower())
+        features = list(words)
+        for word in words:
+            padded = f" {word} "
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        return normalize(vectors)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return self.embed_sync(texts)
+
+
+class MistralEmbedder:
+    """mistral-embed through the managed client, so calls share its pool and limits."""
+
+    name = "mistral"
+    model = "mistral-embed"
+
+    def __init__(self, client=mistral_client):
+        self.client = client
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        response = await self.client.embeddings.create_async(model=self.model, inputs=texts)
+        return normalize(np.array([item.embedding for item in response.data], dtype=np.float32))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length, so a dot product is the cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def get_embedder(name: str = EMBEDDER):
+    if name == "mistral":
+        return MistralEmbedder()
+    if name == "hashing":
+        return HashingEmbedder()
+    raise ValueError(f"Unknown embedder: {name}")
@@ -0,0 +1,46 @@
+import json
+from typing import List, Optional
+
+
+def encode_event(event: dict) -> str:
+    """One NDJSON line for the chat stream."""
+    return json.dumps(event) + "\n"
+
+
+class ReplyRecorder:
+    """
+    Turns the brain's structured events into NDJSON lines, serializing each
+    event exactly once, while keeping what the router persists afterwards:
+    the reply text (as a list of parts), its message type and JSON content.
+    """
+
+    def __init__(self):
+        self.text_parts: List[str] = []
+        self.msg_type = "chat"
+        self.content: Optional[str] = None
+        # Set when the client disconnected before the reply finished
+        self.truncated = False
+        self._full_text: Optional[str] = None
+
+    def encode(self, event: dict) -> str:
+        kind = event["type"]
+        if kind == "chat_chunk":
+            self.text_parts.append(event["text"])
+        elif kind in ("plan", "resources"):
+            content = event["content"]
+            # Serialized once, shared by the stored row and the wire line
+            content_json = json.dumps(content)
+            self.msg_type = kind
+            self.content = content_json if isinstance(content, (dict, list)) else content
+            return f'{{"type": "{kind}", "content": {content_json}}}\n'
+        elif kind == "chat_end":
+            # The client already has the text from the chunks; don't send it twice
+            self._full_text = event.get("full_text")
+            return encode_event({"type": "chat_end"})
+        return encode_event(event)
+
+    @property
+    def text(self) -> str:
+        if self._full_text is not None:
+            return self._full_text
+        return "".join(self.text_parts)
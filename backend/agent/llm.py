@@ -0,0 +1,266 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import httpx
+from mistralai import Mistral
+
+# Upstream calls (streams and completions) in flight across all users ...
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# ... and per user, so one user's burst of tool calls can't take every slot
+LLM_PER_USER_CONCURRENCY = int(os.getenv("LLM_PER_USER_CONCURRENCY", "3"))
+# A call that waited this long (seconds) for a slot fails instead of queueing further
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+# Connection pool to the Mistral API
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", str(LLM_MAX_CONCURRENCY)))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", str(LLM_MAX_CONNECTIONS)))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+# Statuses worth another attempt: rate limited, or the API is briefly unavailable
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# The user an upstream call is made for; set by the brain at the start of a turn
+llm_user: ContextVar[Optional[int]] = ContextVar("llm_user", default=None)
+
+
+class LLMBusy(Exception):
+    """Raised when no upstream slot frees up within LLM_QUEUE_TIMEOUT."""
+
+    def __str__(self):
+        return "The assistant is busy right now, please try again in a moment."
+
+
+class _UserSlot:
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.holders = 0
+
+
+class _Slot:
+    """A held global + per-user slot; released exactly once."""
+
+    def __init__(self, owner: "ManagedMistral", user_slot: Optional[_UserSlot], user_id):
+        self._owner = owner
+        self._user_slot = user_slot
+        self._user_id = user_id
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._owner._release(self._user_slot, self._user_id)
+
+
+class _SlotStream:
+    """
+    An upstream event stream that keeps its slot until it is closed, since
+    the connection stays busy for the whole reply. Use it with `async with`.
+    """
+
+    def __init__(self, stream, slot: _Slot):
+        self._stream = stream
+        self._slot = slot
+
+    def __aiter__(self):
+        return self._stream.__aiter__()
+
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            return await self._stream.__aexit__(exc_type, exc, tb)
+        finally:
+            self._slot.release()
+
+
+class _Chat:
+    def __init__(self, owner: "ManagedMistral"):
+        self._owner = owner
+
+    async def stream_async(self, **kwargs) -> _SlotStream:
+        return await self._owner._call("chat", "stream_async", kwargs, streaming=True)
+
+    async def complete_async(self, **kwargs):
+        return await self._owner._call("chat", "complete_async", kwargs, streaming=False)
+
+
+class _Embeddings:
+    def __init__(self, owner: "ManagedMistral"):
+        self._owner = owner
+
+    async def create_async(self, **kwargs):
+        return await self._owner._call("embeddings", "create_async", kwargs, streaming=False)
+
+
+class ManagedMistral:
+    """
+    The app's one Mistral client. Exposes the `chat.stream_async`,
+    `chat.complete_async` and `embeddings.create_async` calls of the SDK,
+    on a pooled keep-alive HTTP client owned by the app lifespan, and puts
+    every call behind a global and a per-user semaphore. Calls that are
+    rate limited (or hit a brief outage) before any output are retried with
+    full-jitter exponential backoff, honouring Retry-After, without holding
+    a slot while waiting.
+
+    `sdk` may be replaced by any object with the same calls (the benchmarks
+    use a fake).
+    """
+
+    def __init__(self, max_concurrency: int, per_user: int):
+        self.max_concurrency = max_concurrency
+        self.per_user = per_user
+        self.sdk = None
+        self.chat = _Chat(self)
+        self.embeddings = _Embeddings(self)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._users: Dict[int, _UserSlot] = {}
+        self._waits = deque(maxlen=1000)
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.rejected = 0
+
+    async def start(self):
+        if self.sdk is not None:
+            return
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=10.0),
+        )
+        self.sdk = Mistral(api_key=os.getenv("MISTRAL_API_KEY"), async_client=self._http)
+
+    async def stop(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self.sdk = None
+
+    async def _acquire(self, user_id) -> _Slot:
+        user_slot = None
+        if user_id is not None:
+            user_slot = self._users.get(user_id)
+            if user_slot is None:
+                user_slot = self._users[user_id] = _UserSlot(self.per_user)
+            user_slot.holders += 1
+
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            # Per-user first: a user over their share queues without holding a global slot
+            if user_slot is not None:
+                await asyncio.wait_for(user_slot.semaphore.acquire(), LLM_QUEUE_TIMEOUT)
+            try:
+                remaining = LLM_QUEUE_TIMEOUT - (time.perf_counter() - started)
+                await asyncio.wait_for(self._global.acquire(), max(remaining, 0.0))
+            except BaseException:
+                if user_slot is not None:
+                    user_slot.semaphore.release()
+                raise
+        except asyncio.TimeoutError:
+            self._forget_user(user_slot, user_id)
+            self.rejected += 1
+            raise LLMBusy()
+        except BaseException:
+            self._forget_user(user_slot, user_id)
+            raise
+        finally:
+            self.waiting -= 1
+
+        self._waits.append(time.perf_counter() - started)
+        self.in_flight += 1
+        return _Slot(self, user_slot, user_id)
+
+    def _release(self, user_slot: Optional[_UserSlot], user_id):
+        self.in_flight -= 1
+        self._global.release()
+        if user_slot is not None:
+            user_slot.semaphore.release()
+            self._forget_user(user_slot, user_id)
+
+    def _forget_user(self, user_slot: Optional[_UserSlot], user_id):
+        if user_slot is None:
+            return
+        user_slot.holders -= 1
+        if user_slot.holders == 0:
+            self._users.pop(user_id, None)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        status = getattr(error, "status_code", None)
+        if status not in RETRY_STATUSES or attempt >= LLM_MAX_RETRIES:
+            return None
+        if status == 429:
+            self.rate_limited += 1
+        headers = getattr(error, "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = None
+        backoff = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+        if retry_after is not None:
+            # Spread the retries of everyone told the same Retry-After
+            return min(LLM_BACKOFF_MAX, retry_after) + backoff / 2
+        return backoff
+
+    async def _call(self, resource: str, method: str, kwargs: dict, streaming: bool):
+        if self.sdk is None:
+            await self.start()
+        user_id = llm_user.get()
+        attempt = 0
+        while True:
+            slot = await self._acquire(user_id)
+            self.calls += 1
+            try:
+                result = await getattr(getattr(self.sdk, resource), method)(**kwargs)
+            except Exception as e:
+                slot.release()
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                slot.release()
+                raise
+            if streaming:
+                return _SlotStream(result, slot)
+            slot.release()
+            return result
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "per_user_concurrency": self.per_user,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "active_users": len(self._users),
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "rejected": self.rejected,
+            "queue_wait_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            "queue_wait_p99_ms": round(waits[int(len(waits) * 0.99)] * 1000, 1) if waits else None,
+        }
+
+
+mistral_client = ManagedMistral(LLM_MAX_CONCURRENCY, LLM_PER_USER_CONCURRENCY)
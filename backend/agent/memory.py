@@ -1,36 +1,403 @@
-import chromadb
-import time
+import asyncio
 import hashlib
 import os
-import json
-from chromadb import Documents, EmbeddingFunction, Embeddings
-from sqlalchemy.orm import Session
-from backend.database.models import Goal, Plan, Preference
-
-class MistralEmbeddingFunction(EmbeddingFunction):
-    def __init__(self, api_key: str):
-        from mistralai.client import MistralClient
-        self.client = MistralClient(api_key=api_key)
-
-    def __call__(self, input: Documents) -> Embeddings:
-        response = self.client.embeddings(
-            model="mistral-embed",
-            input=input
-        )
-        return [data.embedding for data in response.data]
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
 
-class AgentMemory:
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import Goal, Memory, Preference
+from .embeddings import get_embedder
+from .vector_index import VectorIndex
+
+# Memories put in the prompt per turn, and the least cosine similarity that counts
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "5"))
+MEMORY_MIN_SCORE = float(os.getenv("MEMORY_MIN_SCORE", "0.3"))
+# Longest a reply waits for retrieval (a remote embedding call) before going on without memories
+MEMORY_RETRIEVAL_TIMEOUT = float(os.getenv("MEMORY_RETRIEVAL_TIMEOUT_MS", "300")) / 1000
+# Users whose index is kept in memory (LRU); others are reloaded from the table on demand
+MEMORY_INDEX_USERS = int(os.getenv("MEMORY_INDEX_USERS", "64"))
+# Longer texts are cut before embedding and storing
+MEMORY_MAX_CHARS = int(os.getenv("MEMORY_MAX_CHARS", "4000"))
+MEMORY_LOAD_BATCH = 5000
+# Texts waiting to be embedded before new ones are dropped
+MEMORY_INGEST_QUEUE_SIZE = int(os.getenv("MEMORY_INGEST_QUEUE_SIZE", "10000"))
+# Texts per embedding call, and how long (seconds) a batch waits to fill up
+MEMORY_INGEST_BATCH = int(os.getenv("MEMORY_INGEST_BATCH", "64"))
+MEMORY_INGEST_LINGER = float(os.getenv("MEMORY_INGEST_LINGER_MS", "50")) / 1000
+MEMORY_INGEST_RETRIES = int(os.getenv("MEMORY_INGEST_RETRIES", "3"))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class _UserMemories:
     def __init__(self):
-        pass
-        
-    def add_memory(self, user_id: int, text: str, metadata: dict = None):
-        pass
+        self.index: Optional[VectorIndex] = None
+        self.ready = asyncio.Event()
+        # Added while the index was loading; merged in once it is
+        self.pending: List[Tuple[int, np.ndarray]] = []
+
+    def add(self, memory_id: int, vector: np.ndarray):
+        if not self.ready.is_set():
+            self.pending.append((memory_id, vector))
+            return
+        if self.index is None:
+            self.index = VectorIndex(len(vector))
+        self.index.add([memory_id], vector[None, :])
+
+
+class MemoryStore:
+    """
+    Per-user vector indexes over the memories table. A user's index is
+    loaded on their first retrieval and kept for the most recent
+    MEMORY_INDEX_USERS users; new memories are added to a loaded index as
+    they are stored. Only vectors from the current embedder are indexed.
+    """
+
+    def __init__(self, embedder=None, max_users: int = MEMORY_INDEX_USERS):
+        self._embedder = embedder
+        self.max_users = max_users
+        self._users: "OrderedDict[int, _UserMemories]" = OrderedDict()
+        self._search_times = deque(maxlen=1000)
+        self.added = 0
+        self.duplicates = 0
+        self.retrievals = 0
+        self.retrieval_timeouts = 0
+        self.loads = 0
+        self.failures = 0
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = get_embedder()
+        return self._embedder
+
+    async def _user(self, user_id: int) -> _UserMemories:
+        memories = self._users.get(user_id)
+        if memories is not None:
+            self._users.move_to_end(user_id)
+            await memories.ready.wait()
+            return memories
+        memories = self._users[user_id] = _UserMemories()
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        try:
+            await self._load(user_id, memories)
+        finally:
+            memories.ready.set()
+        return memories
+
+    async def _load(self, user_id: int, memories: _UserMemories):
+        self.loads += 1
+        last_id = 0
+        try:
+            async with AsyncSessionLocal() as db:
+                while True:
+                    rows = (await db.execute(
+                        select(Memory.id, Memory.embedding)
+                        .where(Memory.user_id == user_id, Memory.embedder == self.embedder.name, Memory.id > last_id)
+                        .order_by(Memory.id)
+                        .limit(MEMORY_LOAD_BATCH)
+                    )).all()
+                    if not rows:
+                        break
+                    vectors = np.frombuffer(b"".join(row.embedding for row in rows), dtype=np.float32)
+                    vectors = vectors.reshape(len(rows), -1)
+                    if memories.index is None:
+                        memories.index = VectorIndex(vectors.shape[1])
+                    memories.index.add([row.id for row in rows], vectors)
+                    last_id = rows[-1].id
+        except Exception as e:
+            self.failures += 1
+            print(f"Memory index load failed: {e}")
+        for memory_id, vector in memories.pending:
+            if memory_id > last_id:
+                if memories.index is None:
+                    memories.index = VectorIndex(len(vector))
+                memories.index.add([memory_id], vector[None, :])
+        memories.pending.clear()
+
+    async def add_batch(self, items: List["MemoryItem"]) -> int:
+        """
+        Embeds and stores the items that are not stored yet, with one
+        embedding call and one transaction. Returns how many were stored;
+        embedding errors propagate so the caller can retry.
+        """
+        async with AsyncSessionLocal() as db:
+            # Texts stored by another embedder are embedded again for this one
+            existing = set((await db.execute(
+                select(Memory.user_id, Memory.content_hash)
+                .where(Memory.embedder == self.embedder.name, Memory.content_hash.in_({item.digest for item in items}))
+            )).all())
+            # End the read before the (possibly remote) embedding call
+            await db.commit()
+            fresh = [item for item in items if (item.user_id, item.digest) not in existing]
+            self.duplicates += len(items) - len(fresh)
+            if not fresh:
+                return 0
+
+            vectors = await self.embedder.embed([item.text for item in fresh])
+            rows = [
+                Memory(
+                    user_id=item.user_id, text=item.text, kind=item.kind, meta=item.meta, content_hash=item.digest,
+                    embedder=self.embedder.name, embedding=vector.astype(np.float32).tobytes(),
+                )
+                for item, vector in zip(fresh, vectors)
+            ]
+            db.add_all(rows)
+            try:
+                await db.commit()
+                stored = list(zip(rows, vectors))
+            except IntegrityError:
+                # Some were stored concurrently (another worker); keep the rest one by one
+                await db.rollback()
+                stored = []
+                for row, vector in zip(rows, vectors):
+                    db.add(row)
+                    try:
+                        await db.commit()
+                        stored.append((row, vector))
+                    except IntegrityError:
+                        await db.rollback()
+                        self.duplicates += 1
+
+        self.added += len(stored)
+        for row, vector in stored:
+            memories = self._users.get(row.user_id)
+            if memories is not None:
+                memories.add(row.id, vector)
+        return len(stored)
+
+    async def search(self, user_id: int, query: str, k: int, min_score: float) -> List[dict]:
+        memories = await self._user(user_id)
+        if memories.index is None or memories.index.size == 0:
+            return []
+        vector = (await self.embedder.embed([query]))[0]
+        started = time.perf_counter()
+        hits = [(memory_id, score) for memory_id, score in memories.index.search(vector, k) if score >= min_score]
+        self._search_times.append(time.perf_counter() - started)
+        self.retrievals += 1
+        if not hits:
+            return []
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Memory.id, Memory.text, Memory.kind).where(Memory.id.in_([memory_id for memory_id, _ in hits]))
+            )).all()
+        by_id = {row.id: row for row in rows}
+        return [
+            {"id": memory_id, "text": by_id[memory_id].text, "kind": by_id[memory_id].kind, "score": round(score, 4)}
+            for memory_id, score in hits if memory_id in by_id
+        ]
+
+    def stats(self) -> dict:
+        times = sorted(self._search_times)
+        return {
+            "embedder": self.embedder.name,
+            "loaded_users": len(self._users),
+            "indexed_vectors": sum(m.index.size for m in self._users.values() if m.index is not None),
+            "added": self.added,
+            "duplicates": self.duplicates,
+            "retrievals": self.retrievals,
+            "retrieval_timeouts": self.retrieval_timeouts,
+            "loads": self.loads,
+            "failures": self.failures,
+            "search_p50_ms": round(times[len(times) // 2] * 1000, 2) if times else None,
+            "search_p99_ms": round(times[int(len(times) * 0.99)] * 1000, 2) if times else None,
+        }
+
+
+memory_store = MemoryStore()
+
+
+@dataclass
+class MemoryItem:
+    user_id: int
+    text: str
+    kind: str
+    meta: dict
+    digest: str
+
+
+class MemoryIngestQueue:
+    """
+    Background ingestion for agent memory. `submit` only enqueues, so a
+    reply never waits on an embedding call. One worker drains the queue in
+    micro-batches across users (up to `batch_size` texts, or whatever
+    arrived within `linger` seconds of the first), embeds each batch with
+    one call and stores it in one transaction. A text already queued or
+    stored for the same user is skipped. A failed batch is retried with
+    exponential backoff, then dropped. When the queue is full, new texts are
+    dropped rather than making the caller wait.
+    """
+
+    def __init__(self, store: MemoryStore, max_size: int, batch_size: int, linger: float, retries: int):
+        self.store = store
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.linger = linger
+        self.retries = retries
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        # (user_id, digest) queued or being stored
+        self._pending: Set[Tuple[int, str]] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.batches = 0
+        self.batched = 0
+        self.stored = 0
+        self.retried = 0
+        self.failed = 0
+
+    def submit(self, user_id: int, text: str, kind: str = "note", meta: Optional[dict] = None) -> bool:
+        text = text[:MEMORY_MAX_CHARS]
+        item = MemoryItem(user_id, text, kind, meta or {}, content_hash(text))
+        key = (user_id, item.digest)
+        if key in self._pending:
+            self.deduplicated += 1
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self._pending.add(key)
+        self.submitted += 1
+        if self._task is None or self._task.done():
+            # Scripts and tests that skip the app lifespan still get a worker
+            self.start()
+        return True
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Stores what is queued (for up to `timeout` seconds), then stops the worker."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Memory ingest stopped with {self._queue.qsize()} texts still queued")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _next_batch(self) -> List[MemoryItem]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.linger
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._ingest(batch)
+            finally:
+                for item in batch:
+                    self._pending.discard((item.user_id, item.digest))
+                    self._queue.task_done()
+
+    async def _ingest(self, batch: List[MemoryItem]):
+        self.batches += 1
+        self.batched += len(batch)
+        for attempt in range(self.retries + 1):
+            try:
+                self.stored += await self.store.add_batch(batch)
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    self.failed += len(batch)
+                    print(f"Memory ingest dropped {len(batch)} texts: {e}")
+                    return
+                self.retried += 1
+                await asyncio.sleep(min(30.0, 2 ** attempt))
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize(),
+            "max_size": self.max_size,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched / self.batches, 2) if self.batches else None,
+            "stored": self.stored,
+            "retried": self.retried,
+            "failed": self.failed,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+memory_ingest = MemoryIngestQueue(
+    memory_store,
+    max_size=MEMORY_INGEST_QUEUE_SIZE,
+    batch_size=MEMORY_INGEST_BATCH,
+    linger=MEMORY_INGEST_LINGER,
+    retries=MEMORY_INGEST_RETRIES,
+)
+
+
+class AgentMemory:
+    def __init__(self, store: MemoryStore = memory_store, ingest: MemoryIngestQueue = memory_ingest):
+        self.store = store
+        self.ingest = ingest
+
+    def add_memory(self, user_id: int, text: str, metadata: dict = None) -> bool:
+        """Queues `text` to be embedded and stored for the user; the same text is stored once."""
+        metadata = metadata or {}
+        return self.ingest.submit(user_id, text, metadata.get("type", "note"), metadata)
+
+    async def retrieve_memory(self, user_id: int, query: str, n_results: int = MEMORY_TOP_K,
+                              timeout: Optional[float] = MEMORY_RETRIEVAL_TIMEOUT) -> List[dict]:
+        """
+        The user's memories most similar to `query`, best first, or none if
+        that takes longer than `timeout` seconds. A search that times out
+        keeps running in the background, so the user's index still loads.
+        """
+        search = asyncio.ensure_future(self.store.search(user_id, query, n_results, MEMORY_MIN_SCORE))
+        # Nobody may await an abandoned search; consume its outcome so it is not logged as lost
+        search.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            return await asyncio.wait_for(asyncio.shield(search), timeout)
+        except asyncio.TimeoutError:
+            self.store.retrieval_timeouts += 1
+            return []
+        except Exception as e:
+            print(f"Memory retrieval failed: {e}")
+            return []
 
-    def retrieve_memory(self, user_id: int, query: str, n_results: int = 5):
-        return []
+    def memory_items(self, memories: List[dict]) -> List[str]:
+        """Prompt lines for retrieved memories, best match first."""
+        return [f"- [{memory['kind']}] {memory['text']}\n" for memory in memories]
 
-    def get_user_goals(self, db: Session, user_id: int):
-        return db.query(Goal).filter(Goal.user_id == user_id).all()
+    async def get_user_goals(self, db: AsyncSession, user_id: int):
+        result = await db.execute(select(Goal).filter(Goal.user_id == user_id))
+        return result.scalars().all()
 
-    def get_user_preferences(self, db: Session, user_id: int):
-        return db.query(Preference).filter(Preference.user_id == user_id).first()
+    async def get_user_preferences(self, db: AsyncSession, user_id: int):
+        result = await db.execute(select(Preference).filter(Preference.user_id == user_id))
+        return result.scalars().first()
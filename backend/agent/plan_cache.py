@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, select, update
+
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import PlanCacheEntry
+from .embeddings import get_embedder
+
+# Plans kept in memory (LRU) ...
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "512"))
+# ... and rows kept in the plan_cache table
+PLAN_CACHE_DB_SIZE = int(os.getenv("PLAN_CACHE_DB_SIZE", "10000"))
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Cosine similarity of goal embeddings that counts as the same request; 0 turns the fallback off
+PLAN_CACHE_SIMILARITY = float(os.getenv("PLAN_CACHE_SIMILARITY", "0"))
+# The table is pruned once per this many stored plans
+PLAN_CACHE_PRUNE_EVERY = 50
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+_TIMEFRAME = re.compile(r"(\d+|[a-z]+)\s*-?\s*(day|week|month|year)s?")
+_GOAL_NOISE = re.compile(r"[^\w+#.\s]")
+
+
+def normalize_goal(goal: str) -> str:
+    text = _GOAL_NOISE.sub(" ", (goal or "").lower())
+    return " ".join(text.split()).strip(".")
+
+
+def normalize_timeframe(timeframe: str) -> str:
+    text = " ".join((timeframe or "").lower().split())
+    match = _TIMEFRAME.fullmatch(text)
+    if match:
+        count, unit = match.groups()
+        n = int(count) if count.isdigit() else _NUMBER_WORDS.get(count)
+        if n:
+            return f"{n} {unit}" + ("s" if n != 1 else "")
+    return text
+
+
+def normalize_plan_request(goal: str, timeframe: str, weak_topics: Optional[List[str]]) -> Tuple[str, str, Tuple[str, ...]]:
+    """(goal, timeframe, weak_topics) with case, spacing and topic order made irrelevant."""
+    topics = sorted({" ".join(t.lower().split()) for t in (weak_topics or []) if t and t.strip()})
+    return normalize_goal(goal), normalize_timeframe(timeframe), tuple(topics)
+
+
+def plan_cache_key(normalized: Tuple[str, str, Tuple[str, ...]]) -> str:
+    goal, timeframe, topics = normalized
+    return hashlib.sha256(json.dumps([goal, timeframe, list(topics)]).encode("utf-8")).hexdigest()
+
+
+def _utcnow() -> datetime:
+    # Stored naive, as SQLite hands DateTime values back
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class _Entry:
+    plan_json: str
+    goal: str
+    shape: Tuple[str, Tuple[str, ...]]  # (timeframe, weak_topics): must match exactly for a similar hit
+    expires_at: float  # time.time()
+    vector: Optional[np.ndarray] = None
+
+
+class PlanCache:
+    """
+    Study plans by normalized request. Lookups go memory (LRU) -> the
+    plan_cache table -> optionally the most similar cached goal with the
+    same timeframe and weak topics -> the planner. Identical requests that
+    arrive while a plan is being generated wait for that one call.
+
+    Plans expire `ttl_seconds` after they were generated. The table keeps
+    the `db_size` most recently used rows; `last_used_at` there is bumped
+    when a row is read back into memory, not on every memory hit.
+    """
+
+    def __init__(self, max_entries: int, db_size: int, ttl_seconds: float, similarity: float, embedder=None):
+        self.max_entries = max_entries
+        self.db_size = db_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._embedder = embedder
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stores_since_prune = 0
+        self.hits = 0
+        self.db_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stored = 0
+        self.evictions = 0
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = get_embedder()
+        return self._embedder
+
+    async def get_or_create(self, goal: str, timeframe: str, weak_topics: Optional[List[str]],
+                            generate: Callable[[], Awaitable[dict]]) -> dict:
+        """The cached plan for this request, or the result of `generate()`, which is then cached."""
+        normalized = normalize_plan_request(goal, timeframe, weak_topics)
+        key = plan_cache_key(normalized)
+
+        entry = self._get_memory(key)
+        if entry is not None:
+            self.hits += 1
+            return json.loads(entry.plan_json)
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return json.loads(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The request generating this plan went away; take over
+                return await self.get_or_create(goal, timeframe, weak_topics, generate)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            plan_json = await self._resolve(key, normalized, generate)
+            future.set_result(plan_json)
+            return json.loads(plan_json)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; don't also log it as never retrieved
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _resolve(self, key: str, normalized, generate) -> str:
+        entry = await self._get_db(key)
+        if entry is not None:
+            self.db_hits += 1
+            return entry.plan_json
+
+        vector = None
+        if self.similarity > 0:
+            vector = await self._embed(normalized[0])
+            if vector is not None:
+                similar = self._most_similar(vector, (normalized[1], normalized[2]))
+                if similar is not None:
+                    self.similar_hits += 1
+                    # Repeats of this wording now hit in memory without an embedding call
+                    self._remember(key, similar)
+                    return similar.plan_json
+
+        self.misses += 1
+        plan = await generate()
+        plan_json = json.dumps(plan)
+        await self._store(key, normalized, plan_json, vector)
+        return plan_json
+
+    def _get_memory(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.time():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, entry: _Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _entry_from_row(self, row: PlanCacheEntry) -> _Entry:
+        vector = None
+        if row.embedding and self.similarity > 0 and row.embedder == self.embedder.name:
+            vector = np.asarray(row.embedding, dtype=np.float32)
+        created = row.created_at.replace(tzinfo=timezone.utc).timestamp()
+        return _Entry(
+            plan_json=row.plan_json,
+            goal=row.goal,
+            shape=(row.timeframe, tuple(row.weak_topics or [])),
+            expires_at=created + self.ttl_seconds,
+            vector=vector,
+        )
+
+    async def _get_db(self, key: str) -> Optional[_Entry]:
+        try:
+            async with AsyncSessionLocal() as db:
+                row = await db.get(PlanCacheEntry, key)
+                if row is None:
+                    return None
+                entry = self._entry_from_row(row)
+                if entry.expires_at < time.time():
+                    return None
+                await db.execute(
+                    update(PlanCacheEntry)
+                    .where(PlanCacheEntry.key == key)
+                    .values(hits=PlanCacheEntry.hits + 1, last_used_at=_utcnow())
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"Plan cache read failed: {e}")
+            return None
+        self._remember(key, entry)
+        return entry
+
+    async def _embed(self, goal: str) -> Optional[np.ndarray]:
+        try:
+            return (await self.embedder.embed([goal]))[0]
+        except Exception as e:
+            print(f"Plan cache embedding failed: {e}")
+            return None
+
+    def _most_similar(self, vector: np.ndarray, shape) -> Optional[_Entry]:
+        now = time.time()
+        candidates = [e for e in self._entries.values()
+                      if e.vector is not None and e.shape == shape and e.expires_at >= now]
+        if not candidates:
+            return None
+        scores = np.stack([e.vector for e in candidates]) @ vector
+        best = int(np.argmax(scores))
+        return candidates[best] if scores[best] >= self.similarity else None
+
+    async def _store(self, key: str, normalized, plan_json: str, vector: Optional[np.ndarray]):
+        goal, timeframe, topics = normalized
+        now = _utcnow()
+        self._remember(key, _Entry(plan_json, goal, (timeframe, topics), time.time() + self.ttl_seconds, vector))
+        self.stored += 1
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.merge(PlanCacheEntry(
+                    key=key,
+                    goal=goal,
+                    timeframe=timeframe,
+                    weak_topics=list(topics),
+                    plan_json=plan_json,
+                    embedder=self.embedder.name if vector is not None else None,
+                    embedding=vector.tolist() if vector is not None else None,
+                    hits=0,
+                    created_at=now,
+                    last_used_at=now,
+                ))
+                self._stores_since_prune += 1
+                if self._stores_since_prune >= PLAN_CACHE_PRUNE_EVERY:
+                    self._stores_since_prune = 0
+                    await db.flush()
+                    await self._prune(db, now)
+                await db.commit()
+        except Exception as e:
+            print(f"Plan cache write failed: {e}")
+
+    async def _prune(self, db, now: datetime):
+        await db.execute(delete(PlanCacheEntry).where(
+            PlanCacheEntry.created_at < now - timedelta(seconds=self.ttl_seconds)
+        ))
+        overflow = (
+            select(PlanCacheEntry.key)
+            .order_by(PlanCacheEntry.last_used_at.desc())
+            .offset(self.db_size)
+            .scalar_subquery()
+        )
+        await db.execute(delete(PlanCacheEntry).where(PlanCacheEntry.key.in_(overflow)))
+
+    async def load(self):
+        """Warms memory with the most recently used rows, so similar lookups have candidates after a restart."""
+        cutoff = _utcnow() - timedelta(seconds=self.ttl_seconds)
+        try:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(PlanCacheEntry)
+                    .where(PlanCacheEntry.created_at >= cutoff)
+                    .order_by(PlanCacheEntry.last_used_at.desc())
+                    .limit(self.max_entries)
+                )).scalars().all()
+        except Exception as e:
+            print(f"Plan cache warm-up failed: {e}")
+            return
+        for row in reversed(rows):
+            self._remember(row.key, self._entry_from_row(row))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.db_hits + self.similar_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "similar_hits": self.similar_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evictions": self.evictions,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "similarity_threshold": self.similarity,
+        }
+
+
+plan_cache = PlanCache(
+    max_entries=PLAN_CACHE_SIZE,
+    db_size=PLAN_CACHE_DB_SIZE,
+    ttl_seconds=PLAN_CACHE_TTL_SECONDS,
+    similarity=PLAN_CACHE_SIMILARITY,
+)
@@ -1,15 +1,34 @@
 import json
 from mistralai import Mistral
 import os
+from .plan_cache import PlanCache, plan_cache
 
 class Planner:
+    def __init__(self, cache: PlanCache = plan_cache):
+        self.cache = cache
+
     async def generate_plan(self, goal: str, timeframe: str = "2 weeks", weak_topics: list = [], client: Mistral = None) -> dict:
         """
         Generates a detailed, structured study plan for a specific goal and timeframe.
+        Plans are cached by normalized request, so repeats cost no upstream call.
         """
         if not client:
             return {"error": "Mistral API client or key missing"}
 
+        try:
+            return await self.cache.get_or_create(
+                goal, timeframe, weak_topics,
+                lambda: self._request_plan(goal, timeframe, weak_topics, client)
+            )
+        except Exception as e:
+            print("Planner error:", e)
+            return {
+                "overview": f"I standard plan generation failed for {goal}, but I recommend starting with the basics and practicing daily.",
+                "weekly_schedule": [],
+                "tips": ["Try breaking down your goal into daily small tasks.", "Search for documentation online."]
+            }
+
+    async def _request_plan(self, goal: str, timeframe: str, weak_topics: list, client: Mistral) -> dict:
         prompt = f"""
 Create a detailed, highly structured study plan for "{goal}" in {timeframe}.
 Focus on these weak areas if provided: {", ".join(weak_topics) if weak_topics else "None"}.
@@ -29,29 +48,14 @@ Return ONLY a valid JSON object with this exact structure:
 }}
 """
 
-        try:
-            # Using async chat completion
-            response = await client.chat.complete_async(
-                model="mistral-small-latest",
-                messages=[
-                    {"role": "system", "content": "You are a professional education planner. Return only valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
-            content = response.choices[0].message.content
-            return json.loads(content)
-        except Exception as e:
-            print("Planner error:", e)
-            return {
-                "overview": f"I standard plan generation failed for {goal}, but I recommend starting with the basics and practicing daily.",
-                "weekly_schedule": [],
-                "tips": ["Try breaking down your goal into daily small tasks.", "Search for documentation online."]
-            }
-        except Exception as e:
-            print("Planner error:", e)
-            return {
-                "overview": f"I standard plan generation failed for {goal}, but I recommend starting with the basics and practicing daily.",
-                "weekly_schedule": [],
-                "tips": ["Try breaking down your goal into daily small tasks.", "Search for documentation online."]
-            }
+        # Using async chat completion
+        response = await client.chat.complete_async(
+            model="mistral-small-latest",
+            messages=[
+                {"role": "system", "content": "You are a professional education planner. Return only valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        content = response.choices[0].message.content
+        return json.loads(content)
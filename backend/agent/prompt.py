@@ -0,0 +1,219 @@
+import hashlib
+import os
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Estimated tokens for the whole system prompt (the tool schemas are sent apart)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2500"))
+# Latest session messages never folded into the session summary, so always quoted verbatim
+RECENT_MESSAGES = int(os.getenv("PROMPT_RECENT_MESSAGES", "10"))
+# Most messages since the session summary kept for the prompt; the token budget decides how many fit
+HISTORY_LIMIT = int(os.getenv("PROMPT_HISTORY_LIMIT", "40"))
+# Longest single item (a message, a memory) quoted in the prompt
+PROMPT_ITEM_MAX_CHARS = int(os.getenv("PROMPT_ITEM_MAX_CHARS", "1500"))
+# Users whose last request (as block digests) is kept to measure shared prefixes
+PROMPT_PREFIX_TRACK_USERS = int(os.getenv("PROMPT_PREFIX_TRACK_USERS", "256"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) when the API reports no usage."""
+    return len(text) // 4 + 1
+
+
+def clip(text: str, limit: int = PROMPT_ITEM_MAX_CHARS) -> str:
+    """Shortens `text` to `limit` characters, keeping a trailing newline."""
+    if len(text) <= limit:
+        return text
+    end = "\n" if text.endswith("\n") else ""
+    return text[:limit - 3 - len(end)] + "..." + end
+
+
+@dataclass
+class PromptSection:
+    """
+    One budgeted part of the prompt. `items` are listed most important
+    first and are added in that order while they fit; a section stops at
+    the first item that does not, so a history never skips a message.
+    `header` and `footer` are only paid for when at least one item fits,
+    otherwise `empty` is rendered. Chronological sections (the session
+    history) are rendered oldest first.
+    """
+    name: str
+    priority: int
+    items: List[str]
+    header: str = ""
+    footer: str = ""
+    empty: str = ""
+    chronological: bool = False
+
+
+@dataclass
+class BuiltPrompt:
+    text: str
+    tokens: int
+    # Items of each section that did not fit the budget
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+
+class PromptStats:
+    def __init__(self):
+        self.builds = 0
+        self.tokens = 0
+        self.max_tokens = 0
+        self.over_budget = 0
+        self.dropped: Dict[str, int] = {}
+
+    def record(self, prompt: BuiltPrompt, budget: int):
+        self.builds += 1
+        self.tokens += prompt.tokens
+        self.max_tokens = max(self.max_tokens, prompt.tokens)
+        if prompt.tokens > budget:
+            self.over_budget += 1
+        for name, count in prompt.dropped.items():
+            self.dropped[name] = self.dropped.get(name, 0) + count
+
+    def stats(self) -> dict:
+        return {
+            "budget_tokens": PROMPT_TOKEN_BUDGET,
+            "builds": self.builds,
+            "avg_tokens": round(self.tokens / self.builds) if self.builds else None,
+            "max_tokens": self.max_tokens,
+            "over_budget": self.over_budget,
+            "dropped_items": dict(self.dropped),
+        }
+
+
+prompt_stats = PromptStats()
+
+
+class PromptBuilder:
+    """
+    Fills a prompt template within a token budget. The template's own text
+    (identity, guidelines) is always kept; each `{name}` placeholder is
+    filled from the section of that name, sections with a lower priority
+    number first, so when the budget runs short it is the least important
+    context that is left out. Placement in the template is independent of
+    priority.
+    """
+
+    def __init__(self, budget_tokens: int = PROMPT_TOKEN_BUDGET, stats: PromptStats = prompt_stats):
+        self.budget_tokens = budget_tokens
+        self.stats = stats
+
+    def build(self, template: str, sections: List[PromptSection], prefix: str = "",
+              values: Optional[Dict[str, str]] = None) -> BuiltPrompt:
+        """
+        `prefix` is prepended untouched (never formatted, so it stays
+        byte-identical); `values` fill the template's other placeholders.
+        Both always count against the budget.
+        """
+        values = values or {}
+        empty = {section.name: "" for section in sections}
+        remaining = self.budget_tokens - estimate_tokens(prefix + template.format(**values, **empty))
+        rendered, dropped = {}, {}
+        for section in sorted(sections, key=lambda s: s.priority):
+            kept = []
+            overhead = estimate_tokens(section.header + section.footer)
+            for item in section.items:
+                cost = estimate_tokens(item) + (0 if kept else overhead)
+                if cost > remaining:
+                    break
+                kept.append(item)
+                remaining -= cost
+            if not kept:
+                remaining -= estimate_tokens(section.empty)
+            if len(kept) < len(section.items):
+                dropped[section.name] = len(section.items) - len(kept)
+            if section.chronological:
+                kept.reverse()
+            rendered[section.name] = section.header + "".join(kept) + section.footer if kept else section.empty
+        text = prefix + template.format(**values, **rendered)
+        prompt = BuiltPrompt(text, estimate_tokens(text), dropped)
+        self.stats.record(prompt, self.budget_tokens)
+        return prompt
+
+
+def _block_digests(blocks: List[str]) -> List[Tuple[int, bytes]]:
+    """(length so far, digest of everything so far) after each block; equal digests mean an equal prefix."""
+    running = hashlib.blake2b(digest_size=16)
+    digests, length = [], 0
+    for block in blocks:
+        data = block.encode("utf-8")
+        # The length keeps block boundaries part of what is compared
+        running.update(len(data).to_bytes(8, "little"))
+        running.update(data)
+        length += len(block)
+        digests.append((length, running.digest()))
+    return digests
+
+
+class PrefixStats:
+    """
+    How much of each upstream chat request repeats the start of the same
+    user's previous one: the part a provider-side prompt cache can reuse.
+    A request is split into blocks in the order it is laid out for the
+    model (tool schemas, the static system prompt prefix, the rest of the
+    system prompt, then each message), and the shared prefix is the blocks
+    that match the previous request from the start. Only a digest per
+    block is kept, never the conversation text. A request is a prefix hit
+    when it shares at least the tool schemas and the static prefix.
+    """
+
+    def __init__(self, max_users: int = PROMPT_PREFIX_TRACK_USERS):
+        self.max_users = max_users
+        self._last: "OrderedDict[int, List[Tuple[int, bytes]]]" = OrderedDict()
+        self.requests = 0
+        self.compared = 0
+        self.hits = 0
+        self.shared_chars = 0
+        self.total_chars = 0
+        self.static_chars = 0
+
+    def record(self, user_id: int, tools_json: str, messages: List[dict], static_prefix: str = "") -> int:
+        """
+        `static_prefix` is the start of the system prompt meant to be the
+        same on every request. Returns how many characters this request
+        shares with the user's previous one.
+        """
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        rest = messages[1:] if system else messages
+        if static_prefix and system.startswith(static_prefix):
+            blocks = [tools_json, static_prefix, system[len(static_prefix):]]
+            static = len(tools_json) + len(static_prefix)
+        else:
+            blocks = [tools_json, system]
+            static = len(tools_json)
+        digests = _block_digests(blocks + [json.dumps(message) for message in rest])
+        self.requests += 1
+        self.static_chars = static
+        previous = self._last.pop(user_id, None)
+        shared = 0
+        if previous is not None:
+            for (length, digest), (_, earlier) in zip(digests, previous):
+                if digest != earlier:
+                    break
+                shared = length
+            self.compared += 1
+            self.shared_chars += shared
+            self.total_chars += digests[-1][0]
+            if shared >= static:
+                self.hits += 1
+        self._last[user_id] = digests
+        while len(self._last) > self.max_users:
+            self._last.popitem(last=False)
+        return shared
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "compared": self.compared,
+            "prefix_hits": self.hits,
+            "prefix_hit_ratio": round(self.hits / self.compared, 4) if self.compared else None,
+            "shared_prefix_ratio": round(self.shared_chars / self.total_chars, 4) if self.total_chars else None,
+            "static_prefix_chars": self.static_chars,
+        }
+
+
+prefix_stats = PrefixStats()
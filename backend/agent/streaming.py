@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, Set
+
+from .events import ReplyRecorder, encode_event
+
+# A coalesced chat_chunk is flushed once its text is this old (seconds) ...
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50")) / 1000
+# ... or this long (characters), whichever comes first
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "1024"))
+# Events buffered between the LLM and a slow client before the LLM read pauses
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+_END = object()
+
+# Finishing replies whose client has already gone
+_background: Set[asyncio.Task] = set()
+
+
+class StreamStats:
+    """Process-wide counters for /metrics."""
+
+    def __init__(self):
+        self.replies = 0
+        self.events_in = 0
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.stage_seconds = 0.0
+        self.backpressure_waits = 0
+        self.disconnects = 0
+        self.cancelled_upstream = 0
+        self.truncated_saved = 0
+
+    def stats(self) -> dict:
+        replies = self.replies or 1
+        return {
+            "replies": self.replies,
+            "events_in": self.events_in,
+            "frames_out": self.frames_out,
+            "bytes_per_reply": round(self.bytes_out / replies),
+            "frames_per_reply": round(self.frames_out / replies, 1),
+            "stage_ms_per_reply": round(self.stage_seconds * 1000 / replies, 3),
+            "backpressure_waits": self.backpressure_waits,
+            "disconnects": self.disconnects,
+            "cancelled_upstream": self.cancelled_upstream,
+            "truncated_saved": self.truncated_saved,
+        }
+
+
+stream_stats = StreamStats()
+
+
+class ReplyStream:
+    """
+    Sits between the brain's events and StreamingResponse.
+
+    A producer task pulls events into a bounded queue, so a client that
+    reads slowly stalls the LLM stream instead of growing server buffers.
+    The response side joins consecutive chat_chunk texts into one frame per
+    STREAM_FLUSH_INTERVAL / STREAM_FLUSH_CHARS. If the client disconnects
+    before the reply is complete, the producer is cancelled, which cancels
+    the LLM stream and any running tools inside the brain, and `on_complete`
+    still runs with what was generated and `recorder.truncated` set.
+    Otherwise `on_complete` runs once all events are in and the response
+    ends after it, so the client can rely on the reply being stored.
+    """
+
+    def __init__(
+        self,
+        events: AsyncIterator[dict],
+        on_complete: Callable[[ReplyRecorder], Awaitable[None]],
+        flush_interval: Optional[float] = None,
+        flush_chars: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ):
+        self.events = events
+        self.on_complete = on_complete
+        self.flush_interval = STREAM_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.flush_chars = STREAM_FLUSH_CHARS if flush_chars is None else flush_chars
+        self.recorder = ReplyRecorder()
+        self.upstream_done = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE if queue_size is None else queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _put(self, item):
+        if self._queue.full():
+            stream_stats.backpressure_waits += 1
+        await self._queue.put(item)
+
+    async def _pump(self):
+        try:
+            async for event in self.events:
+                stream_stats.events_in += 1
+                started = time.perf_counter()
+                if event["type"] == "chat_chunk":
+                    self.recorder.text_parts.append(event["text"])
+                    item = event["text"]
+                else:
+                    item = (self.recorder.encode(event),)
+                stream_stats.stage_seconds += time.perf_counter() - started
+                await self._put(item)
+        except asyncio.CancelledError:
+            # The generator may be parked at a yield (we were blocked on the
+            # queue); close it so its streams and sessions are released now.
+            await self.events.aclose()
+            self.recorder.truncated = True
+            self.upstream_done = True
+            await self.on_complete(self.recorder)
+            stream_stats.truncated_saved += 1
+            raise
+        except Exception as e:
+            print(f"❌ Error in reply stream: {e}")
+        self.upstream_done = True
+        await self.on_complete(self.recorder)
+        await self._put(_END)
+
+    def _flush(self, pending) -> str:
+        return encode_event({"type": "chat_chunk", "text": "".join(pending)})
+
+    async def body(self):
+        loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._pump())
+        stream_stats.replies += 1
+        pending, pending_chars, deadline = [], 0, None
+        try:
+            while True:
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                elif deadline is None:
+                    item = await self._queue.get()
+                else:
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), max(0.0, deadline - loop.time()))
+                    except asyncio.TimeoutError:
+                        item = None
+
+                started = time.perf_counter()
+                frame = None
+                if isinstance(item, str):
+                    if not pending:
+                        deadline = loop.time() + self.flush_interval
+                    pending.append(item)
+                    pending_chars += len(item)
+                    if pending_chars >= self.flush_chars or loop.time() >= deadline:
+                        frame = self._flush(pending)
+                        pending, pending_chars, deadline = [], 0, None
+                elif pending:
+                    # Timer ran out, or a non-text event must keep its place after the text
+                    frame = self._flush(pending)
+                    pending, pending_chars, deadline = [], 0, None
+                stream_stats.stage_seconds += time.perf_counter() - started
+
+                if frame:
+                    yield frame
+                    stream_stats.frames_out += 1
+                    stream_stats.bytes_out += len(frame)
+                if item is _END:
+                    break
+                if isinstance(item, tuple):
+                    yield item[0]
+                    stream_stats.frames_out += 1
+                    stream_stats.bytes_out += len(item[0])
+            await self._task
+        finally:
+            if not self._task.done():
+                # Storing the (possibly partial) reply outlives the response
+                _background.add(self._task)
+                self._task.add_done_callback(_background.discard)
+                if not self.upstream_done:
+                    stream_stats.disconnects += 1
+                    stream_stats.cancelled_upstream += 1
+                    self._task.cancel()
@@ -0,0 +1,175 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import Chat, SessionSummary
+from .context import context_cache
+from .llm import llm_user, mistral_client
+from .prompt import RECENT_MESSAGES, clip
+
+# Messages outside the prompt window left unsummarized before a refresh is worth a call
+SUMMARY_MIN_NEW = int(os.getenv("SESSION_SUMMARY_MIN_NEW", "6"))
+# Messages folded into the summary per LLM call
+SUMMARY_MAX_FOLD = int(os.getenv("SESSION_SUMMARY_MAX_FOLD", "40"))
+SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "2000"))
+SUMMARY_QUEUE_SIZE = int(os.getenv("SESSION_SUMMARY_QUEUE_SIZE", "1000"))
+SUMMARY_MODEL = "mistral-small-latest"
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a tutoring chat between a user and a learning agent. "
+    "Merge the new messages into the current summary. Keep the user's goals, decisions, "
+    "preferences, progress, open questions and any dates or commitments; drop small talk. "
+    f"Answer with the updated summary only, in plain prose under {SUMMARY_MAX_CHARS // 6} words."
+)
+
+
+class SessionSummarizer:
+    """
+    Keeps each chat session's rolling summary (SessionSummary) up to date in
+    the background. The latest `keep_recent` messages are never folded; once
+    at least `min_new` older messages are not yet in the summary, one LLM
+    call folds them (up to `max_fold` at a time) into it. The prompt quotes
+    every message after the summary, so none is missing while it waits.
+    `schedule` only enqueues, so a reply never waits on the summary. A
+    session already queued is not queued twice, a failed refresh is retried
+    on the session's next message, and the context cache is updated in place.
+    """
+
+    def __init__(self, client=mistral_client, keep_recent: int = RECENT_MESSAGES, min_new: int = SUMMARY_MIN_NEW,
+                 max_fold: int = SUMMARY_MAX_FOLD, max_size: int = SUMMARY_QUEUE_SIZE,
+                 enabled: Optional[bool] = None):
+        self.client = client
+        self.keep_recent = keep_recent
+        self.min_new = max(1, min_new)
+        self.max_fold = max_fold
+        if enabled is None:
+            enabled = bool(os.getenv("MISTRAL_API_KEY")) and os.getenv("MOCK_AGENT_MODE", "false").lower() != "true"
+        self.enabled = enabled
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._pending: Set[Tuple[int, int]] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.refreshes = 0
+        self.folded = 0
+        self.failed = 0
+
+    def schedule(self, user_id: int, session_id: int) -> bool:
+        if not self.enabled:
+            return False
+        key = (user_id, session_id)
+        if key in self._pending:
+            self.deduplicated += 1
+            return False
+        try:
+            self._queue.put_nowait(key)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self._pending.add(key)
+        self.scheduled += 1
+        if self._task is None or self._task.done():
+            self.start()
+        return True
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Finishes queued refreshes (for up to `timeout` seconds), then stops the worker."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Session summarizer stopped with {self._queue.qsize()} sessions still queued")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            user_id, session_id = await self._queue.get()
+            try:
+                await self.refresh(user_id, session_id)
+            except Exception as e:
+                self.failed += 1
+                print(f"Session summary for session {session_id} failed: {e}")
+            finally:
+                self._pending.discard((user_id, session_id))
+                self._queue.task_done()
+
+    async def refresh(self, user_id: int, session_id: int) -> int:
+        """Folds the session's unsummarized older messages into its summary; returns how many."""
+        folded = 0
+        async with AsyncSessionLocal() as db:
+            row = await db.get(SessionSummary, session_id)
+            while True:
+                covered = row.summarized_until if row else 0
+                rows = (await db.execute(
+                    select(Chat.id, Chat.role, Chat.message)
+                    .filter(Chat.session_id == session_id, Chat.id > covered)
+                    .order_by(Chat.id)
+                )).all()
+                # The newest messages are still quoted verbatim
+                older = rows[:-self.keep_recent] if self.keep_recent else rows
+                if len(older) < self.min_new:
+                    break
+                batch = older[:self.max_fold]
+                summary = await self._summarize(user_id, row.summary if row else "", batch)
+                if row is None:
+                    row = SessionSummary(session_id=session_id, user_id=user_id, summary="", message_count=0)
+                    db.add(row)
+                row.summary = summary
+                row.summarized_until = batch[-1].id
+                row.message_count += len(batch)
+                row.updated_at = datetime.now(timezone.utc)
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Another worker created the row first; its summary wins this round
+                    await db.rollback()
+                    break
+                folded += len(batch)
+                self.refreshes += 1
+                self.folded += len(batch)
+                context_cache.set_summary(user_id, session_id, summary, row.summarized_until)
+        return folded
+
+    async def _summarize(self, user_id: int, previous: str, messages) -> str:
+        transcript = "".join(f"{m.role.capitalize()}: {clip(m.message or '')}\n" for m in messages)
+        llm_user.set(user_id)
+        response = await self.client.chat.complete_async(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                {"role": "user", "content": f"Current summary:\n{previous or '(none yet)'}\n\nNew messages:\n{transcript}"},
+            ],
+        )
+        return clip(response.choices[0].message.content.strip(), SUMMARY_MAX_CHARS)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "depth": self._queue.qsize(),
+            "scheduled": self.scheduled,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "refreshes": self.refreshes,
+            "messages_folded": self.folded,
+            "failed": self.failed,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+session_summarizer = SessionSummarizer()
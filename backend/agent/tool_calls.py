@@ -0,0 +1,115 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+class _ArgumentScanner:
+    """
+    Follows a streamed JSON object one fragment at a time and reports when
+    the top-level object has closed. Each character is looked at once, so
+    checking after every fragment costs nothing extra over buffering.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.closed = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str):
+        for char in text:
+            if self.closed:
+                break
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            elif char in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    self.closed = True
+
+
+class ToolCallAssembler:
+    """
+    Rebuilds tool calls from streamed `delta.tool_calls` fragments and hands
+    each one back as soon as its arguments form a complete JSON object, so
+    the caller can start the tool while the model is still streaming.
+
+    `calls` keeps the assembled calls in the shape the follow-up request
+    expects ({"id", "function": {"name", "arguments"}}). A fragment carrying
+    a new id on a stream index already in use starts a new call, so a call
+    that was handed out is never changed afterwards. A call whose arguments
+    are not valid JSON is handed out with an `error` instead of `args`.
+    """
+
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self._scanners: List[_ArgumentScanner] = []
+        self._ready: List[bool] = []
+        # Stream index -> position in `calls` of the call it currently feeds
+        self._positions: Dict[Optional[int], int] = {}
+        self._last_index: Optional[int] = None
+
+    def feed(self, tc_delta) -> List[Dict[str, Any]]:
+        """Adds one fragment; returns the calls it completed (parsed args included)."""
+        stream_index = tc_delta.index if tc_delta.index is not None else self._last_index
+        self._last_index = stream_index
+        position = self._positions.get(stream_index)
+        if position is not None and tc_delta.id and self.calls[position]["id"] not in (None, tc_delta.id):
+            position = None
+        if position is None:
+            position = self._positions[stream_index] = len(self.calls)
+            self.calls.append({"id": None, "function": {"name": None, "arguments": ""}})
+            self._scanners.append(_ArgumentScanner())
+            self._ready.append(False)
+        if self._ready[position]:
+            # Already handed out: late fragments of it are ignored
+            return []
+
+        call = self.calls[position]
+        if tc_delta.id:
+            call["id"] = tc_delta.id
+        if tc_delta.function.name:
+            call["function"]["name"] = tc_delta.function.name
+
+        arguments = tc_delta.function.arguments
+        if isinstance(arguments, dict):
+            # The SDK may hand over already decoded arguments in one piece
+            arguments = json.dumps(arguments)
+        if arguments:
+            call["function"]["arguments"] += arguments
+            self._scanners[position].feed(arguments)
+        if not self._scanners[position].closed:
+            return []
+        parsed = self._parse(position)
+        return [parsed] if parsed is not None else []
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Called when the stream ends: returns every call not handed out yet."""
+        return [self._parse(position, final=True) for position in range(len(self.calls)) if not self._ready[position]]
+
+    def _parse(self, position: int, final: bool = False) -> Optional[Dict[str, Any]]:
+        call = self.calls[position]
+        if not final and (not call["id"] or not call["function"]["name"]):
+            return None
+        arguments = call["function"]["arguments"].strip() or "{}"
+        try:
+            args = json.loads(arguments)
+        except ValueError as e:
+            if not final:
+                # Balanced but not valid JSON yet; finish() reports it
+                return None
+            self._ready[position] = True
+            return {"index": position, "call": call, "args": None,
+                    "error": f"Invalid arguments for {call['function']['name']}: {e}"}
+        self._ready[position] = True
+        return {"index": position, "call": call, "args": args}
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.database.database import AsyncSessionLocal
+
+# Default budget for one tool call; slower tools set their own
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "20"))
+# Threads for tools that do CPU work (kept off the event loop)
+TOOL_CPU_WORKERS = int(os.getenv("TOOL_CPU_WORKERS", "4"))
+
+TOOL_KINDS = ("io", "db", "cpu")
+
+
+@dataclass
+class ToolContext:
+    """Who a tool call runs for; handlers read ids from here, never from the model."""
+    user_id: int
+    session_id: int
+
+
+@dataclass
+class ToolHandler:
+    """
+    How to run one tool. `kind` is "io" (native async, awaited on the loop),
+    "db" (async, called with its own AsyncSession as `db`) or "cpu" (a plain
+    function run on the tool thread pool). `fn` takes (args, ctx), plus
+    `db` for "db" tools.
+    """
+    kind: str
+    fn: Callable
+    timeout: Optional[float] = None
+
+
+@dataclass
+class Tool:
+    name: str
+    definition: Dict[str, Any]
+    kind: str
+    fn: Callable
+    timeout: float
+
+
+class ToolStats:
+    """Per-tool call counts, failures and latency, shared by every registry."""
+
+    def __init__(self):
+        self._tools: Dict[str, dict] = {}
+        self.in_flight = 0
+
+    def _entry(self, name: str) -> dict:
+        entry = self._tools.get(name)
+        if entry is None:
+            entry = self._tools[name] = {"calls": 0, "errors": 0, "timeouts": 0, "times": deque(maxlen=500)}
+        return entry
+
+    def record(self, name: str, seconds: float, outcome: str = "ok"):
+        entry = self._entry(name)
+        entry["calls"] += 1
+        if outcome == "error":
+            entry["errors"] += 1
+        elif outcome == "timeout":
+            entry["timeouts"] += 1
+        entry["times"].append(seconds)
+
+    def stats(self) -> dict:
+        tools = {}
+        for name, entry in sorted(self._tools.items()):
+            times = sorted(entry["times"])
+            tools[name] = {
+                "calls": entry["calls"],
+                "errors": entry["errors"],
+                "timeouts": entry["timeouts"],
+                "latency_p50_ms": round(times[len(times) // 2] * 1000, 1) if times else None,
+                "latency_p99_ms": round(times[int(len(times) * 0.99)] * 1000, 1) if times else None,
+            }
+        return {"in_flight": self.in_flight, "tools": tools}
+
+
+tool_stats = ToolStats()
+
+_cpu_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _cpu_executor() -> ThreadPoolExecutor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = ThreadPoolExecutor(max_workers=TOOL_CPU_WORKERS, thread_name_prefix="tool-cpu")
+    return _cpu_pool
+
+
+class ToolRegistry:
+    """
+    The tools the model may call, built from their JSON schema definitions
+    and a handler for each name. Every definition needs a handler and every
+    handler a definition, so the two cannot drift apart.
+
+    `run` isolates calls from each other: "db" tools get their own session
+    (calls gathered in parallel never share one connection), "cpu" tools run
+    on a thread pool, each call has a timeout, and a failing or timed out
+    tool returns {"error": ...} to the model instead of ending the reply.
+    """
+
+    def __init__(self, definitions: List[Dict[str, Any]], handlers: Dict[str, ToolHandler],
+                 stats: ToolStats = tool_stats):
+        self.stats = stats
+        self.tools: Dict[str, Tool] = {}
+        for definition in definitions:
+            name = definition["function"]["name"]
+            handler = handlers.get(name)
+            if handler is None:
+                raise ValueError(f"Tool '{name}' is defined but has no handler")
+            if handler.kind not in TOOL_KINDS:
+                raise ValueError(f"Tool '{name}' has unknown kind '{handler.kind}'")
+            self.tools[name] = Tool(name, definition, handler.kind, handler.fn, handler.timeout or TOOL_TIMEOUT_SECONDS)
+        extra = set(handlers) - set(self.tools)
+        if extra:
+            raise ValueError(f"Handlers without a tool definition: {', '.join(sorted(extra))}")
+        # The same list object on every call, so requests reuse one byte-identical schema
+        self._definitions = [tool.definition for tool in self.tools.values()]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tools
+
+    def definitions(self) -> List[Dict[str, Any]]:
+        return self._definitions
+
+    async def run(self, name: str, args: Dict[str, Any], ctx: ToolContext) -> Any:
+        tool = self.tools[name]
+        started = time.perf_counter()
+        self.stats.in_flight += 1
+        try:
+            result = await asyncio.wait_for(self._execute(tool, args, ctx), tool.timeout)
+        except asyncio.TimeoutError:
+            self.stats.record(name, time.perf_counter() - started, "timeout")
+            return {"error": f"{name} timed out after {tool.timeout:g} seconds"}
+        except Exception as e:
+            print(f"❌ Tool {name} failed: {e}")
+            self.stats.record(name, time.perf_counter() - started, "error")
+            return {"error": f"{name} failed: {e}"}
+        finally:
+            self.stats.in_flight -= 1
+        self.stats.record(name, time.perf_counter() - started)
+        return result
+
+    async def _execute(self, tool: Tool, args: Dict[str, Any], ctx: ToolContext) -> Any:
+        if tool.kind == "db":
+            async with AsyncSessionLocal() as db:
+                return await tool.fn(args, ctx, db=db)
+        if tool.kind == "cpu":
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_cpu_executor(), partial(tool.fn, args, ctx))
+        return await tool.fn(args, ctx)
@@ -1,4 +1,7 @@
+import json
 from typing import List, Dict
+from sqlalchemy import select
+from backend.agent.context import context_cache, goal_summary
 
 class AgentTools:
     async def search_youtube(self, topic: str) -> List[Dict]:
@@ -64,7 +67,8 @@ class AgentTools:
         if not db:
             return {"error": "No database session provided"}
             
-        goal = db.query(Goal).filter(Goal.session_id == session_id).first()
+        result = await db.execute(select(Goal).filter(Goal.session_id == session_id))
+        goal = result.scalars().first()
         if not goal:
             return {"error": "Goal not found for this session"}
         
@@ -80,7 +84,8 @@ class AgentTools:
         else:
             goal.progress = 0
             
-        db.commit()
+        await db.commit()
+        context_cache.upsert_goal(goal.user_id, goal_summary(goal))
         return {
             "success": True, 
             "new_progress": goal.progress, 
@@ -97,8 +102,11 @@ class AgentTools:
         if not db:
             return {"error": "No database session provided"}
             
-        plan_msg = db.query(Chat).filter(Chat.session_id == session_id, Chat.msg_type == "plan")\
-            .order_by(Chat.timestamp.desc()).first()
+        result = await db.execute(
+            select(Chat).filter(Chat.session_id == session_id, Chat.msg_type == "plan")
+            .order_by(Chat.timestamp.desc())
+        )
+        plan_msg = result.scalars().first()
             
         if not plan_msg or not plan_msg.content:
             return {"error": "No plan found for this session"}
@@ -118,22 +126,22 @@ class AgentTools:
             "topic": topic
         }
 
-    async def schedule_learning_session(self, title: str, start_time_str: str, duration_minutes: int, goal_id: int = None, db=None) -> Dict:
+    async def schedule_learning_session(self, title: str, start_time_str: str, duration_minutes: int, goal_id: int = None, user_id: int = None, db=None) -> Dict:
         """
         Schedule a specific learning session or task in the user's calendar.
         start_time_str should be in ISO format (e.g., 2024-05-01T10:00:00)
         """
-        from backend.database.models import CalendarEvent, User
+        from backend.database.models import CalendarEvent
         from datetime import datetime, timedelta
         if not db:
             return {"error": "No database session provided"}
+        if user_id is None:
+            return {"error": "No user provided"}
         
         try:
             start_time = datetime.fromisoformat(start_time_str)
             end_time = start_time + timedelta(minutes=duration_minutes)
             
-            user_id = db.query(User).first().id 
-            
             new_event = CalendarEvent(
                 user_id=user_id,
                 goal_id=goal_id,
@@ -142,22 +150,30 @@ class AgentTools:
                 end_time=end_time
             )
             db.add(new_event)
-            db.commit()
+            await db.commit()
             return {"success": True, "event_id": new_event.id, "scheduled": title, "at": start_time_str}
         except Exception as e:
             return {"error": str(e)}
 
-    async def get_user_schedule(self, date_str: str = None, db=None) -> List[Dict]:
+    async def get_user_schedule(self, date_str: str = None, user_id: int = None, db=None) -> List[Dict]:
         """
         Retrieve the user's scheduled tasks and sessions for a specific date.
         """
         from backend.database.models import CalendarEvent
+        from datetime import datetime, timedelta
         if not db:
             return {"error": "No database session provided"}
+        if user_id is None:
+            return {"error": "No user provided"}
         
-        query = db.query(CalendarEvent)
-        # Add date filtering if provided
-        events = query.all()
+        query = select(CalendarEvent).filter(CalendarEvent.user_id == user_id)
+        if date_str:
+            try:
+                day = datetime.fromisoformat(date_str).replace(hour=0, minute=0, second=0, microsecond=0)
+            except ValueError:
+                return {"error": f"Invalid date: {date_str}"}
+            query = query.filter(CalendarEvent.start_time >= day, CalendarEvent.start_time < day + timedelta(days=1))
+        events = (await db.execute(query.order_by(CalendarEvent.start_time))).scalars().all()
         return [
             {
                 "id": e.id,
@@ -168,27 +184,34 @@ class AgentTools:
             } for e in events
         ]
 
-    async def create_notification(self, title: str, message: str, type: str = "reminder", scheduled_for: str = None, db=None) -> Dict:
+    async def create_notification(self, title: str, message: str, type: str = "reminder", scheduled_for: str = None, user_id: int = None, db=None) -> Dict:
         """
         Create a notification or alert for the user that will appear in the dashboard.
         """
-        from backend.database.models import Notification, User
+        from backend.database.models import Notification
+        from backend.realtime.dispatcher import notification_dispatcher
         from datetime import datetime
         if not db:
             return {"error": "No database session provided"}
+        if user_id is None:
+            return {"error": "No user provided"}
         
-        user_id = db.query(User).first().id # Placeholder
-        
-        sched_time = datetime.fromisoformat(scheduled_for) if scheduled_for else datetime.now(timezone.utc)
+        # Naive local time, the same clock the dispatcher compares against
+        now = datetime.now()
+        sched_time = datetime.fromisoformat(scheduled_for) if scheduled_for else now
+        if sched_time.tzinfo:
+            sched_time = sched_time.astimezone().replace(tzinfo=None)
         
         new_note = Notification(
             user_id=user_id,
             title=title,
             message=message,
             type=type,
-            scheduled_for=sched_time
+            scheduled_for=sched_time,
+            delivered_at=now if sched_time <= now else None
         )
         db.add(new_note)
-        db.commit()
+        await db.commit()
+        notification_dispatcher.submit(new_note)
         return {"success": True, "notification_id": new_note.id}
 
@@ -0,0 +1,151 @@
+import asyncio
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Below this many vectors every search is an exact scan
+INDEX_EXACT_BELOW = int(os.getenv("MEMORY_INDEX_EXACT_BELOW", "8192"))
+# Inverted lists scanned per search once the index is partitioned
+INDEX_NPROBE = int(os.getenv("MEMORY_INDEX_NPROBE", "8"))
+# The partition is rebuilt once the unpartitioned tail is this fraction of the partitioned part
+INDEX_RETRAIN_RATIO = 0.25
+KMEANS_ITERATIONS = 4
+KMEANS_SAMPLE_PER_LIST = 40
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if len(scores) > k:
+        best = np.argpartition(-scores, k)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best])]
+
+
+def _partition(vectors: np.ndarray, ids: np.ndarray, capacity: int, seed: int = 0):
+    """
+    Spherical k-means over unit vectors, with 2*sqrt(n) lists. Returns new
+    vector and id buffers of `capacity` rows whose first n rows are grouped
+    by list, the centroids, and the list offsets. CPU heavy; run it off the
+    event loop.
+    """
+    n = len(vectors)
+    nlist = max(1, min(2048, int(2 * np.sqrt(n))))
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(n, min(n, nlist * KMEANS_SAMPLE_PER_LIST), replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Lists that lost every point keep their old centroid
+        sums[empty] = centroids[empty]
+        norms[empty] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+    assign = np.empty(n, dtype=np.int32)
+    for start in range(0, n, 8192):
+        assign[start:start + 8192] = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+    vector_buffer = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+    id_buffer = np.empty(capacity, dtype=np.int64)
+    np.take(vectors, order, axis=0, out=vector_buffer[:n])
+    np.take(ids, order, out=id_buffer[:n])
+    return vector_buffer, id_buffer, centroids, offsets
+
+
+class VectorIndex:
+    """
+    Top-k cosine search over unit vectors with integer ids.
+
+    Small indexes are scanned exactly. Past INDEX_EXACT_BELOW vectors, the
+    rows are partitioned with k-means into inverted lists stored contiguously,
+    and a search scans only the INDEX_NPROBE lists whose centroids are
+    closest to the query, plus the tail of rows added since the last
+    partition. Partitioning runs in a worker thread; searches and adds keep
+    using the previous layout until it is swapped in.
+    """
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self._vectors = np.empty((1024, dimensions), dtype=np.float32)
+        self._ids = np.empty(1024, dtype=np.int64)
+        self.size = 0
+        # Rows [0, _partitioned) are grouped by list; the rest is the tail
+        self._partitioned = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._training: Optional[asyncio.Future] = None
+
+    def add(self, ids, vectors: np.ndarray):
+        count = len(vectors)
+        if self.size + count > len(self._vectors):
+            capacity = max(len(self._vectors) * 2, self.size + count)
+            self._vectors = np.resize(self._vectors, (capacity, self.dimensions))
+            self._ids = np.resize(self._ids, capacity)
+        self._vectors[self.size:self.size + count] = vectors
+        self._ids[self.size:self.size + count] = ids
+        self.size += count
+        self._maybe_partition()
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if self.size == 0:
+            return []
+        if self._centroids is None:
+            scores = self._vectors[:self.size] @ query
+            best = _top_k(scores, k)
+            return [(int(self._ids[i]), float(scores[i])) for i in best]
+
+        probe = _top_k(self._centroids @ query, INDEX_NPROBE)
+        # Lists are contiguous, so each is scored in place without gathering rows
+        spans = [(self._offsets[p], self._offsets[p + 1]) for p in probe]
+        spans.append((self._partitioned, self.size))
+        scores = np.concatenate([self._vectors[start:end] @ query for start, end in spans])
+        ids = np.concatenate([self._ids[start:end] for start, end in spans])
+        best = _top_k(scores, k)
+        return [(int(ids[i]), float(scores[i])) for i in best]
+
+    def _maybe_partition(self):
+        if self._training is not None or self.size < INDEX_EXACT_BELOW:
+            return
+        if self._centroids is not None and self.size - self._partitioned < INDEX_RETRAIN_RATIO * self._partitioned:
+            return
+        n = self.size
+        # Rows below n are never written again (growing allocates new
+        # buffers), so the worker can read them without a copy
+        args = (self._vectors[:n], self._ids[:n], len(self._vectors))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._apply(n, *_partition(*args))
+            return
+        self._training = loop.run_in_executor(None, _partition, *args)
+        self._training.add_done_callback(lambda f: self._trained(n, f))
+
+    def _trained(self, n: int, future: asyncio.Future):
+        self._training = None
+        if future.cancelled() or future.exception() is not None:
+            print(f"Vector index partitioning failed: {future.exception() if not future.cancelled() else 'cancelled'}")
+            return
+        self._apply(n, *future.result())
+        self._maybe_partition()
+
+    def _apply(self, n: int, vectors: np.ndarray, ids: np.ndarray, centroids: np.ndarray, offsets: np.ndarray):
+        if len(vectors) < len(self._vectors):
+            vectors = np.resize(vectors, self._vectors.shape)
+            ids = np.resize(ids, self._ids.shape)
+        # Rows added while the worker ran stay in the tail
+        vectors[n:self.size] = self._vectors[n:self.size]
+        ids[n:self.size] = self._ids[n:self.size]
+        self._vectors, self._ids = vectors, ids
+        self._centroids = centroids
+        self._offsets = offsets
+        self._partitioned = n
+
+    async def wait_partitioned(self):
+        """Waits for a partition build in progress (benchmarks, warm-up)."""
+        while self._training is not None:
+            await asyncio.sleep(0.01)
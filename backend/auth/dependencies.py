@@ -1,28 +1,69 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from backend.database.database import get_db
-from backend.database.models import User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database.database import AsyncSessionLocal, get_db
+from backend.database.models import RevokedToken, User
 from backend.auth.security import SECRET_KEY, ALGORITHM
+from backend.auth.token_cache import UserSnapshot, token_cache, token_digest
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def _authenticate(token: str, db: Optional[AsyncSession]) -> UserSnapshot:
+    if token_cache.is_revoked(token):
+        raise _credentials_exception()
+
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-        
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        raise _credentials_exception()
+
+    # The revocation check rides on the user query: a logout on another worker
+    # is only visible in the shared table
+    query = (
+        select(User, RevokedToken.token_hash)
+        .outerjoin(RevokedToken, RevokedToken.token_hash == token_digest(token))
+        .filter(User.email == email)
+    )
+    if db is None:
+        async with AsyncSessionLocal() as own_db:
+            row = (await own_db.execute(query)).first()
+    else:
+        row = (await db.execute(query)).first()
+    if row is None:
+        raise _credentials_exception()
+    user, revoked = row
+    if revoked is not None:
+        token_cache.revoke(token, payload.get("exp"))
+        raise _credentials_exception()
+
+    snapshot = UserSnapshot.from_user(user)
+    token_cache.put(token, snapshot, payload.get("exp"))
+    return snapshot
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> UserSnapshot:
+    return await _authenticate(token, db)
+
+async def get_stream_user(token: str = Depends(oauth2_scheme)) -> UserSnapshot:
+    """
+    For long-lived streaming responses: a request-scoped session would keep
+    its pooled connection until the stream ends, so look the user up in a
+    session that is closed straight away.
+    """
+    return await _authenticate(token, None)
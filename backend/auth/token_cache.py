@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    Read-only copy of the authenticated user's columns. Safe to share between
+    requests, unlike an ORM instance bound to one request's session.
+    """
+    id: int
+    name: Optional[str]
+    email: str
+    username: Optional[str] = None
+    bio: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            name=user.name,
+            email=user.email,
+            username=user.username,
+            bio=user.bio,
+            avatar_url=user.avatar_url,
+        )
+
+
+class TokenCache:
+    """
+    Bounded TTL cache from bearer token to UserSnapshot, so authenticated
+    requests skip both the JWT decode and the user query. An entry never
+    outlives the token's own `exp`.
+
+    The cache is per worker process. Logouts are stored in the shared
+    revoked_tokens table and checked on every cache miss, but a token cached
+    by another worker keeps working there until its entry expires: the
+    `ttl_seconds` (AUTH_CACHE_TTL_SECONDS) is the window in which a
+    logged-out token may still be accepted.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, UserSnapshot]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        # Logged-out tokens -> their exp, kept until they would have expired anyway
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    self._drop(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, user: UserSnapshot, token_exp: Optional[float] = None):
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[token] = (expires_at, user)
+            self._entries.move_to_end(token)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def invalidate_user(self, user_id: int):
+        """Drops every cached token of a user, e.g. after a profile update."""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._drop(token)
+
+    def revoke(self, token: str, token_exp: Optional[float] = None):
+        """Rejects the token in this worker; other workers learn it from revoked_tokens."""
+        now = time.time()
+        with self._lock:
+            if token in self._entries:
+                self._drop(token)
+            self._revoked = {t: exp for t, exp in self._revoked.items() if exp > now}
+            self._revoked[token] = token_exp if token_exp is not None else now + self.ttl_seconds
+
+    def is_revoked(self, token: str) -> bool:
+        with self._lock:
+            return token in self._revoked
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "revoked": len(self._revoked),
+            }
+
+    def _drop(self, token: str):
+        _, user = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.id]
+
+
+def token_digest(token: str) -> str:
+    """Key of a token in the revoked_tokens table."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+token_cache = TokenCache(
+    max_entries=int(os.getenv("AUTH_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60")),
+)
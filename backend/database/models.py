@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
-from sqlalchemy.orm import relationship
+from collections import defaultdict
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, LargeBinary, Index, event, insert, inspect, select, update
+from sqlalchemy.orm import Session, relationship
 from .database import Base
 from datetime import datetime, timezone
 
@@ -29,6 +30,11 @@ class ChatSession(Base):
     
     user = relationship("User", back_populates="chat_sessions")
     messages = relationship("Chat", back_populates="session", cascade="all, delete-orphan")
+    summary = relationship("SessionSummary", uselist=False, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_chat_sessions_user_created", "user_id", "created_at"),
+    )
 
 class Chat(Base):
     __tablename__ = "chats"
@@ -39,16 +45,39 @@ class Chat(Base):
     role = Column(String)  # 'user' or 'agent'
     msg_type = Column(String, default="chat") # 'chat', 'plan', 'resources', 'error'
     content = Column(Text, nullable=True) # JSON string for extra content
+    truncated = Column(Boolean, default=False) # Reply cut short by a client disconnect
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     user = relationship("User", back_populates="chats")
     session = relationship("ChatSession", back_populates="messages")
 
+    __table_args__ = (
+        # Session history (get_chat_history, agent context)
+        Index("ix_chats_session_timestamp", "session_id", "timestamp"),
+        # Per-user history filtered by session
+        Index("ix_chats_user_session_timestamp", "user_id", "session_id", "timestamp"),
+    )
+
+class SessionSummary(Base):
+    """
+    Rolling summary of a chat session's older messages, the ones that no
+    longer reach the agent prompt verbatim. `summarized_until` is the id of
+    the newest message folded in; later ones are summarized in the
+    background as they fall out of the prompt window.
+    """
+    __tablename__ = "session_summaries"
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    summary = Column(Text, nullable=False, default="")
+    summarized_until = Column(Integer, default=0, nullable=False)
+    message_count = Column(Integer, default=0, nullable=False)  # messages folded in so far
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
 class Goal(Base):
     __tablename__ = "goals"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=True, index=True)
     text = Column(String)
     deadline = Column(String)
     status = Column(String, default="active")
@@ -68,6 +97,51 @@ class Plan(Base):
     
     user = relationship("User", back_populates="plans")
 
+class Memory(Base):
+    """
+    One piece of the agent's long-term memory of a user (a roadmap, a past
+    exchange), with its embedding as float32 bytes for the in-process index.
+    """
+    __tablename__ = "memories"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    text = Column(Text, nullable=False)
+    kind = Column(String, default="note")  # 'roadmap', 'exchange', ...
+    meta = Column(JSON, default=dict)
+    content_hash = Column(String(64), nullable=False)  # sha256 of the text; duplicates per embedder are skipped
+    embedder = Column(String, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Per embedder, so a text can be stored again after EMBEDDER changes
+        Index("ix_memories_user_embedder_hash", "user_id", "embedder", "content_hash", unique=True),
+        Index("ix_memories_user_embedder_id", "user_id", "embedder", "id"),
+    )
+
+class PlanCacheEntry(Base):
+    """
+    A generated study plan, shared by every request that normalizes to the
+    same (goal, timeframe, weak_topics). The plan prompt carries nothing
+    user-specific, so entries are not scoped to a user.
+    """
+    __tablename__ = "plan_cache"
+    key = Column(String(64), primary_key=True)  # sha256 of the normalized request
+    goal = Column(Text, nullable=False)  # normalized
+    timeframe = Column(String, nullable=False)
+    weak_topics = Column(JSON, default=list)
+    plan_json = Column(Text, nullable=False)
+    embedder = Column(String, nullable=True)  # which embedder produced `embedding`
+    embedding = Column(JSON, nullable=True)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_used_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Oldest-first pruning and warm-up of the most recently used entries
+        Index("ix_plan_cache_last_used", "last_used_at"),
+    )
+
 class Preference(Base):
     __tablename__ = "preferences"
     id = Column(Integer, primary_key=True, index=True)
@@ -87,10 +161,17 @@ class CalendarEvent(Base):
     start_time = Column(DateTime)
     end_time = Column(DateTime)
     is_completed = Column(Boolean, default=False)
+    # User's "calendar" sync version at this row's last write
+    version = Column(Integer, default=0, nullable=False)
     
     user = relationship("User")
     goal = relationship("Goal")
 
+    __table_args__ = (
+        Index("ix_calendar_events_user_start", "user_id", "start_time"),
+        Index("ix_calendar_events_user_version", "user_id", "version"),
+    )
+
 class Notification(Base):
     __tablename__ = "notifications"
     id = Column(Integer, primary_key=True, index=True)
@@ -101,5 +182,149 @@ class Notification(Base):
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     scheduled_for = Column(DateTime, nullable=True)
+    # Set by the dispatcher once scheduled_for has passed; only delivered rows are listed
+    delivered_at = Column(DateTime, nullable=True)
+    # User's "notifications" sync version at this row's last write
+    version = Column(Integer, default=0, nullable=False)
     
     user = relationship("User")
+
+    __table_args__ = (
+        Index("ix_notifications_user_scheduled_created", "user_id", "scheduled_for", "created_at"),
+        # Newest-first listing
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+        Index("ix_notifications_user_version", "user_id", "version"),
+        # Delivered-and-unread listing
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        # Dispatcher startup scan of undelivered rows
+        Index("ix_notifications_delivered_scheduled", "delivered_at", "scheduled_for"),
+    )
+
+class UserStats(Base):
+    """
+    Materialized per-user dashboard counters (GET /profile/stats). Created
+    lazily from an aggregate query on first read, then kept current by
+    _track_user_stats on every ORM flush that touches goals or sessions.
+    Writes the listener cannot see (Core update()/delete(), a goal committed
+    while the row was being backfilled) are repaired by recomputing the row
+    once `reconciled_at` is older than USER_STATS_RECONCILE_SECONDS.
+    """
+    __tablename__ = "user_stats"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_goals = Column(Integer, default=0, nullable=False)
+    active_goals = Column(Integer, default=0, nullable=False)
+    completed_goals = Column(Integer, default=0, nullable=False)
+    progress_sum = Column(Integer, default=0, nullable=False)
+    total_sessions = Column(Integer, default=0, nullable=False)
+    reconciled_at = Column(DateTime, nullable=True)
+
+def _goal_counts(status, progress, sign):
+    status = status or "active"
+    return {
+        "total_goals": sign,
+        "active_goals": sign if status == "active" else 0,
+        "completed_goals": sign if status == "completed" else 0,
+        "progress_sum": sign * (progress or 0),
+    }
+
+def _old_value(obj, attr):
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, attr)
+
+@event.listens_for(Session, "after_flush")
+def _track_user_stats(session, flush_context):
+    """Applies goal/session inserts, updates and deletes to user_stats as deltas."""
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    def add(user_id, counts):
+        for key, value in counts.items():
+            deltas[user_id][key] += value
+
+    for obj in session.new:
+        if isinstance(obj, Goal):
+            add(obj.user_id, _goal_counts(obj.status, obj.progress, 1))
+        elif isinstance(obj, ChatSession):
+            add(obj.user_id, {"total_sessions": 1})
+    for obj in session.deleted:
+        if isinstance(obj, Goal):
+            add(obj.user_id, _goal_counts(_old_value(obj, "status"), _old_value(obj, "progress"), -1))
+        elif isinstance(obj, ChatSession):
+            add(obj.user_id, {"total_sessions": -1})
+    for obj in session.dirty:
+        if isinstance(obj, Goal) and session.is_modified(obj):
+            if not (inspect(obj).attrs.status.history.has_changes()
+                    or inspect(obj).attrs.progress.history.has_changes()):
+                continue
+            add(obj.user_id, _goal_counts(_old_value(obj, "status"), _old_value(obj, "progress"), -1))
+            add(obj.user_id, _goal_counts(obj.status, obj.progress, 1))
+
+    connection = None
+    for user_id, counts in deltas.items():
+        counts = {key: value for key, value in counts.items() if value}
+        if user_id is None or not counts:
+            continue
+        connection = connection or session.connection()
+        # No row yet means nobody has read the stats; the first read backfills
+        connection.execute(
+            update(UserStats)
+            .where(UserStats.user_id == user_id)
+            .values({key: getattr(UserStats, key) + value for key, value in counts.items()})
+        )
+
+class RevokedToken(Base):
+    """
+    Logged-out bearer tokens, shared by every worker. Keyed by a SHA-256 of
+    the token so the credential itself is never stored; rows past
+    `expires_at` are pruned on the next logout.
+    """
+    __tablename__ = "revoked_tokens"
+    token_hash = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class SyncVersion(Base):
+    """
+    Per-user change counter for one synced collection. `version` goes up on
+    every flush that writes a row of that collection; `reset_version` records
+    the last delete, since deltas carry no tombstones.
+    """
+    __tablename__ = "sync_versions"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    kind = Column(String, primary_key=True)  # 'notifications', 'calendar'
+    version = Column(Integer, default=0, nullable=False)
+    reset_version = Column(Integer, default=0, nullable=False)
+
+SYNC_KINDS = {Notification: "notifications", CalendarEvent: "calendar"}
+
+@event.listens_for(Session, "before_flush")
+def _bump_sync_versions(session, flush_context, instances):
+    """Gives each (user, kind) touched by this flush a new version and stamps the rows with it."""
+    touched = defaultdict(list)
+    deleted = set()
+    for obj in list(session.new) + [o for o in session.dirty if session.is_modified(o)]:
+        kind = SYNC_KINDS.get(type(obj))
+        if kind and obj.user_id is not None:
+            touched[(obj.user_id, kind)].append(obj)
+    for obj in session.deleted:
+        kind = SYNC_KINDS.get(type(obj))
+        if kind and obj.user_id is not None:
+            touched[(obj.user_id, kind)]
+            deleted.add((obj.user_id, kind))
+    if not touched:
+        return
+
+    connection = session.connection()
+    for (user_id, kind), rows in touched.items():
+        key = (SyncVersion.user_id == user_id) & (SyncVersion.kind == kind)
+        values = {"version": SyncVersion.version + 1}
+        if (user_id, kind) in deleted:
+            values["reset_version"] = SyncVersion.version + 1
+        if connection.execute(update(SyncVersion).where(key).values(values)).rowcount == 0:
+            connection.execute(insert(SyncVersion).values(
+                user_id=user_id, kind=kind, version=1,
+                reset_version=1 if (user_id, kind) in deleted else 0,
+            ))
+        version = connection.execute(select(SyncVersion.version).where(key)).scalar_one()
+        for obj in rows:
+            obj.version = version
@@ -0,0 +1,57 @@
+import base64
+import json
+import os
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+def encode_cursor(*values) -> str:
+    """Opaque, URL-safe cursor for the keyset values of the last row of a page."""
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Decodes a cursor made by encode_cursor; `types` are datetime/int/str per position."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(raw) != len(types):
+            raise ValueError("wrong cursor length")
+        return tuple(
+            None if value is None else datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for value, kind in zip(raw, types)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(columns, values, descending: bool = False):
+    """
+    Rows strictly after `values` in ORDER BY `columns` (all ASC or all DESC).
+    Written as OR/AND instead of a row-value comparison so every backend can
+    use the (…, column) composite indexes.
+    """
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        step = column < value if descending else column > value
+        equal_prefix = [c == v for c, v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, step) if equal_prefix else step)
+    return or_(*clauses)
+
+async def paginate(db, query, key_columns, cursor, limit, response, descending: bool = False):
+    """
+    Runs `query` (a select of one model) as one keyset page ordered by
+    `key_columns`, the last of which must be unique (usually the id).
+    Sets X-Next-Cursor on `response` when another page exists.
+    """
+    if cursor:
+        types = tuple(column.type.python_type for column in key_columns)
+        query = query.filter(keyset_filter(key_columns, decode_cursor(cursor, *types), descending))
+    order = [column.desc() if descending else column for column in key_columns]
+    rows = (await db.execute(query.order_by(*order).limit(limit + 1))).scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(*(getattr(rows[-1], c.key) for c in key_columns))
+    return rows
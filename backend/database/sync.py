@@ -0,0 +1,49 @@
+from typing import Optional, Tuple
+from fastapi import Request, Response
+from sqlalchemy import select
+from backend.database.models import SyncVersion
+from backend.database.pagination import decode_cursor, encode_cursor
+
+# Listings are private to the bearer token and must be revalidated every time
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+async def read_versions(db, user_id: int, kind: str) -> Tuple[int, int]:
+    """(version, reset_version) of one user's collection; (0, 0) before its first write."""
+    row = (await db.execute(
+        select(SyncVersion.version, SyncVersion.reset_version)
+        .filter(SyncVersion.user_id == user_id, SyncVersion.kind == kind)
+    )).first()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response when the client's If-None-Match already names `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+    return None
+
+
+def encode_sync_token(version: int) -> str:
+    """Opaque X-Sync-Token for a collection version; deltas are versions, never timestamps."""
+    return encode_cursor(version)
+
+
+def decode_sync_token(token: str) -> int:
+    (version,) = decode_cursor(token, int)
+    return version
+
+
+def set_sync_headers(response: Response, etag: str, token: str, mode: str):
+    response.headers["ETag"] = etag
+    response.headers["X-Sync-Token"] = token
+    response.headers["X-Sync-Mode"] = mode
+    response.headers.update(CACHE_HEADERS)
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -14,7 +15,32 @@ from backend.database import models  # registers models
 # Create tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Autonomous Choice Learning Agent")
+from backend.realtime.dispatcher import notification_dispatcher
+from backend.realtime.relay import notification_relay
+from backend.agent.llm import mistral_client
+from backend.agent.plan_cache import plan_cache
+from backend.agent.memory import memory_ingest, memory_store
+from backend.agent.summary import session_summarizer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Scheduled notifications are delivered in the background while the app runs
+    await notification_dispatcher.start()
+    # Notifications delivered by other workers reach this worker's streams
+    notification_relay.start()
+    # Pooled keep-alive connections to the Mistral API for the app's lifetime
+    await mistral_client.start()
+    await plan_cache.load()
+    memory_ingest.start()
+    yield
+    # Store queued memories and summaries while the Mistral client is still open
+    await memory_ingest.stop()
+    await session_summarizer.stop()
+    await mistral_client.stop()
+    await notification_relay.stop()
+    await notification_dispatcher.stop()
+
+app = FastAPI(title="Autonomous Choice Learning Agent", lifespan=lifespan)
 
 # CORS Setup (OK for local dev)
 origins = [
@@ -29,10 +55,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors and sync tokens are returned in headers so list bodies stay unchanged
+    expose_headers=["X-Before-Cursor", "X-After-Cursor", "X-Next-Cursor", "ETag", "X-Sync-Token", "X-Sync-Mode"],
 )
 
 # Routers
 from backend.routers import auth, chat, goals, calendar, notifications, profile
+from backend.agent.context import context_cache
+from backend.auth.token_cache import token_cache
+from backend.auth.security import password_hasher
+from backend.realtime.hub import notification_hub
+from backend.agent.streaming import stream_stats
+from backend.agent.tool_registry import tool_stats
+from backend.agent.agent_loop import agent_loop_stats
+from backend.agent.prompt import prefix_stats, prompt_stats
 
 app.include_router(auth.router, prefix="/auth")
 app.include_router(chat.router, prefix="/chat")
@@ -48,3 +84,24 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "context_cache": context_cache.stats(),
+        "auth_cache": token_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "notification_hub": notification_hub.stats(),
+        "notification_dispatcher": notification_dispatcher.stats(),
+        "notification_relay": notification_relay.stats(),
+        "chat_stream": stream_stats.stats(),
+        "llm": mistral_client.stats(),
+        "plan_cache": plan_cache.stats(),
+        "memory": memory_store.stats(),
+        "memory_ingest": memory_ingest.stats(),
+        "tools": tool_stats.stats(),
+        "agent_loop": agent_loop_stats.stats(),
+        "prompt": prompt_stats.stats(),
+        "prompt_prefix": prefix_stats.stats(),
+        "session_summary": session_summarizer.stats(),
+    }
@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import os
+from collections import deque
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import Notification
+from backend.realtime.hub import notification_hub, seconds_until
+
+# Notifications marked delivered per transaction
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "200"))
+# Upper bound on one sleep, so wall-clock jumps are noticed
+DISPATCH_MAX_SLEEP_SECONDS = float(os.getenv("DISPATCH_MAX_SLEEP_SECONDS", "30"))
+DISPATCH_RETRY_SECONDS = 5.0
+
+
+class NotificationDispatcher:
+    """
+    Delivers scheduled notifications when they fall due. Undelivered rows
+    are loaded into a min-heap keyed by scheduled_for once at startup, and
+    new ones are pushed as they are created. A single task sleeps until the
+    earliest entry, then sets delivered_at in one transaction per batch and
+    publishes each notification to the hub.
+
+    Every worker runs one. A row is claimed by whichever dispatcher commits
+    its delivered_at first: the select locks it (FOR UPDATE SKIP LOCKED on
+    Postgres) and SQLite serializes the writers, so the loser sees it
+    delivered on retry. Streams on the other workers receive it through
+    NotificationRelay.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self._heap: List[Tuple[datetime, int]] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._latencies = deque(maxlen=1000)
+        self.loaded = 0
+        self.delivered = 0
+        self.failures = 0
+
+    async def start(self):
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Notification.scheduled_for, Notification.id)
+                .filter(Notification.delivered_at == None)
+            )).all()
+        self._heap = [(scheduled_for or datetime.min, note_id) for scheduled_for, note_id in rows]
+        heapq.heapify(self._heap)
+        self.loaded = len(self._heap)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def submit(self, note: Notification):
+        """Publishes an already delivered notification, or queues it for its due time."""
+        if note.delivered_at is not None:
+            notification_hub.publish_notification(note)
+            return
+        heapq.heappush(self._heap, (note.scheduled_for or datetime.min, note.id))
+        if self._heap[0][1] == note.id:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            delay = seconds_until(self._heap[0][0])
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=min(delay, DISPATCH_MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            batch = []
+            while self._heap and len(batch) < self.batch_size and seconds_until(self._heap[0][0]) <= 0:
+                batch.append(heapq.heappop(self._heap))
+            try:
+                await self._deliver([note_id for _, note_id in batch])
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Notification dispatch failed: {e}")
+                # Put the batch back a little later rather than spinning on it
+                retry_at = datetime.now().timestamp() + DISPATCH_RETRY_SECONDS
+                for _, note_id in batch:
+                    heapq.heappush(self._heap, (datetime.fromtimestamp(retry_at), note_id))
+
+    async def _deliver(self, note_ids: List[int]):
+        async with AsyncSessionLocal() as db:
+            # Rows deleted, or delivered elsewhere, since they were queued are skipped
+            notes = (await db.execute(
+                select(Notification)
+                .filter(Notification.id.in_(note_ids), Notification.delivered_at == None)
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+            now = datetime.now()
+            for note in notes:
+                note.delivered_at = now
+            await db.commit()
+
+        for note in notes:
+            if note.scheduled_for is not None:
+                self._latencies.append(max(0.0, -seconds_until(note.scheduled_for)))
+            notification_hub.publish_notification(note)
+        self.delivered += len(notes)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        overdue = sum(1 for due, _ in self._heap if seconds_until(due) <= 0)
+        return {
+            "backlog": len(self._heap),
+            "overdue": overdue,
+            "next_due_in_seconds": round(seconds_until(self._heap[0][0]), 3) if self._heap else None,
+            "loaded_at_startup": self.loaded,
+            "delivered": self.delivered,
+            "failures": self.failures,
+            "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "latency_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+notification_dispatcher = NotificationDispatcher(DISPATCH_BATCH_SIZE)
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+# Events buffered per connection before it is told to resync instead
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "100"))
+# Notification ids remembered so one published by this worker and seen again
+# by the cross-worker relay is not sent twice
+PUBLISHED_IDS_KEPT = int(os.getenv("NOTIFY_PUBLISHED_IDS_KEPT", "10000"))
+# Seconds between SSE comment frames on an idle connection
+KEEPALIVE_SECONDS = float(os.getenv("NOTIFY_KEEPALIVE_SECONDS", "25"))
+
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+
+
+def sse_frame(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+def notification_payload(note) -> dict:
+    """Same shape as NotificationResponse so clients can merge it into their list."""
+    return {
+        "id": note.id,
+        "title": note.title,
+        "message": note.message,
+        "type": note.type,
+        "is_read": bool(note.is_read),
+        "created_at": note.created_at.isoformat() if note.created_at else None,
+        "scheduled_for": note.scheduled_for.isoformat() if note.scheduled_for else None,
+    }
+
+
+class NotificationHub:
+    """
+    In-process pub/sub for server-pushed notifications. Each open stream
+    owns a bounded queue of pre-serialized SSE frames; publishing formats
+    the frame once and hands it to every connection of that user.
+
+    Only connections on this worker process are reached; notifications
+    delivered by another worker arrive through NotificationRelay, and
+    publish_notification drops the ones this hub already sent.
+    """
+
+    def __init__(self, queue_size: int, published_ids_kept: int = PUBLISHED_IDS_KEPT):
+        self.queue_size = queue_size
+        self.published_ids_kept = published_ids_kept
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._published_ids: "OrderedDict[int, None]" = OrderedDict()
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def user_ids(self) -> List[int]:
+        """Users with an open stream on this worker."""
+        return list(self._subscribers)
+
+    def publish_notification(self, note) -> bool:
+        """Publishes a delivered notification once per worker; False if it was already sent."""
+        if note.id in self._published_ids:
+            return False
+        self._published_ids[note.id] = None
+        while len(self._published_ids) > self.published_ids_kept:
+            self._published_ids.popitem(last=False)
+        self.publish(note.user_id, "notification", notification_payload(note))
+        return True
+
+    def publish(self, user_id: int, event: str, payload: dict):
+        self.published += 1
+        queues = self._subscribers.get(user_id)
+        if not queues:
+            return
+        frame = sse_frame(event, payload)
+        for queue in queues:
+            try:
+                queue.put_nowait(frame)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # The client fell behind; drop what it has and make it refetch
+                self.overflows += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_FRAME)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
+
+
+def seconds_until(when: Optional[datetime]) -> float:
+    if when is None:
+        return 0.0
+    # Naive values are local wall-clock times, as create_notification stores them
+    now = datetime.now(timezone.utc) if when.tzinfo else datetime.now()
+    return (when - now).total_seconds()
+
+
+notification_hub = NotificationHub(SUBSCRIBER_QUEUE_SIZE)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select
+
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import Notification
+from backend.realtime.hub import notification_hub
+
+# Seconds between polls for notifications delivered by other workers; 0 turns
+# the relay off (a single worker needs none)
+NOTIFY_RELAY_SECONDS = float(os.getenv("NOTIFY_RELAY_SECONDS", "2"))
+# How far each poll looks back before the previous one, so a delivery that
+# committed late is still picked up; repeats are dropped by the hub
+NOTIFY_RELAY_OVERLAP_SECONDS = float(os.getenv("NOTIFY_RELAY_OVERLAP_SECONDS", "10"))
+
+
+class NotificationRelay:
+    """
+    Cross-worker fan-out for the in-process hub. Each worker polls for
+    notifications delivered since its last poll (delivered_at, on the
+    ix_notifications_delivered_scheduled index) for the users with a stream
+    open on it, and publishes them locally. A notification delivered on
+    worker A thus reaches streams on worker B within one poll interval.
+    """
+
+    def __init__(self, interval: float, overlap: float):
+        self.interval = interval
+        self.overlap = timedelta(seconds=overlap)
+        self._since: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.polls = 0
+        self.relayed = 0
+        self.failures = 0
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        # Naive local time, the clock delivered_at is written with
+        self._since = datetime.now()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Notification relay poll failed: {e}")
+
+    async def poll(self):
+        """Publishes notifications delivered since the last poll to this worker's streams."""
+        now = datetime.now()
+        since, self._since = self._since or now, now
+        user_ids = notification_hub.user_ids()
+        if not user_ids:
+            return
+        self.polls += 1
+        async with AsyncSessionLocal() as db:
+            notes = (await db.execute(
+                select(Notification)
+                .filter(Notification.delivered_at > since - self.overlap, Notification.user_id.in_(user_ids))
+                .order_by(Notification.delivered_at, Notification.id)
+            )).scalars().all()
+        for note in notes:
+            if notification_hub.publish_notification(note):
+                self.relayed += 1
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "polls": self.polls,
+            "relayed": self.relayed,
+            "failures": self.failures,
+        }
+
+
+notification_relay = NotificationRelay(NOTIFY_RELAY_SECONDS, NOTIFY_RELAY_OVERLAP_SECONDS)
@@ -1,9 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from jose import JWTError, jwt
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.database.database import get_db
-from backend.database.models import User
-from backend.auth.security import get_password_hash, verify_password, create_access_token
+from backend.database.models import RevokedToken, User
+from backend.auth.security import (
+    create_access_token, needs_rehash, password_hasher, HashingPoolSaturated, SECRET_KEY, ALGORITHM
+)
+from backend.auth.dependencies import oauth2_scheme
+from backend.auth.token_cache import token_cache, token_digest
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -17,29 +24,78 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+def hashing_unavailable():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts in progress, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(User).filter(User.email == user.email))
+    db_user = result.scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    # Return the pooled connection while bcrypt runs
+    await db.commit()
     
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except HashingPoolSaturated:
+        raise hashing_unavailable()
     new_user = User(email=user.email, password_hash=hashed_password, name=user.name)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     access_token = create_access_token(data={"sub": new_user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(User).filter(User.email == form_data.username))
+    user = result.scalars().first()
+    # Return the pooled connection while bcrypt runs
+    await db.commit()
+    try:
+        valid = bool(user) and await password_hasher.verify(form_data.password, user.password_hash)
+    except HashingPoolSaturated:
+        raise hashing_unavailable()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if needs_rehash(user.password_hash):
+        # Cost factor changed since this hash was made; upgrade it transparently
+        try:
+            user.password_hash = await password_hasher.hash(form_data.password)
+            await db.commit()
+        except HashingPoolSaturated:
+            pass  # Retried on a later login
     access_token = create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    # Recorded for every worker (checked on their cache misses) and dropped
+    # from this worker's cache; see TokenCache for the window on other workers
+    now = datetime.now(timezone.utc)
+    exp = payload.get("exp")
+    if exp is not None:
+        expires_at = datetime.fromtimestamp(exp, timezone.utc)
+    else:
+        expires_at = now + timedelta(seconds=token_cache.ttl_seconds)
+    digest = token_digest(token)
+    await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+    if await db.get(RevokedToken, digest) is None:
+        db.add(RevokedToken(token_hash=digest, expires_at=expires_at))
+    await db.commit()
+    token_cache.revoke(token, exp)
+    return {"message": "Logged out"}
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from backend.database.database import get_db
 from backend.database.models import User, CalendarEvent
+from backend.database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from backend.database.sync import decode_sync_token, encode_sync_token, make_etag, not_modified, read_versions, set_sync_headers
 from backend.auth.dependencies import get_current_user
 from pydantic import BaseModel
 from datetime import datetime
@@ -21,14 +24,61 @@ class EventResponse(BaseModel):
         from_attributes = True
 
 @router.get("/", response_model=List[EventResponse])
-def get_calendar(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(CalendarEvent).filter(CalendarEvent.user_id == current_user.id).order_by(CalendarEvent.start_time).all()
+async def get_calendar(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Events ordered by start time. Unchanged polls get a 304 from the
+    user's calendar version alone. With `since` (an earlier X-Sync-Token)
+    only events written since then are returned, ignoring start/end so an
+    event moved out of the range is still reported; a delete since the
+    token, or more than `limit` changes, falls back to the full listing.
+    """
+    version, reset_version = await read_versions(db, current_user.id, "calendar")
+    etag = make_etag(current_user.id, version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    token = encode_sync_token(version)
+
+    if since:
+        since_version = decode_sync_token(since)
+        if reset_version <= since_version <= version:
+            changed = (await db.execute(
+                select(CalendarEvent)
+                .filter(CalendarEvent.user_id == current_user.id, CalendarEvent.version > since_version)
+                .order_by(CalendarEvent.start_time, CalendarEvent.id)
+                .limit(limit + 1)
+            )).scalars().all()
+            if len(changed) <= limit:
+                set_sync_headers(response, etag, token, "delta")
+                return changed
+
+    set_sync_headers(response, etag, token, "full")
+    # Events starting in [start, end)
+    query = select(CalendarEvent).filter(CalendarEvent.user_id == current_user.id)
+    if start:
+        query = query.filter(CalendarEvent.start_time >= start)
+    if end:
+        query = query.filter(CalendarEvent.start_time < end)
+    return await paginate(db, query, (CalendarEvent.start_time, CalendarEvent.id), cursor, limit, response)
 
 @router.patch("/{event_id}/complete")
-def complete_event(event_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    event = db.query(CalendarEvent).filter(CalendarEvent.id == event_id, CalendarEvent.user_id == current_user.id).first()
+async def complete_event(event_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(CalendarEvent).filter(CalendarEvent.id == event_id, CalendarEvent.user_id == current_user.id)
+    )
+    event = result.scalars().first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     event.is_completed = True
-    db.commit()
+    await db.commit()
     return {"message": "Event marked as completed"}
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.database.database import get_db, SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database.database import get_db, AsyncSessionLocal
 from backend.database.models import User, Chat, ChatSession, Goal
+from backend.database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, keyset_filter, paginate
 from backend.auth.dependencies import get_current_user
 from backend.agent.brain import AgentBrain
+from backend.agent.context import context_cache, goal_summary
+from backend.agent.events import ReplyRecorder
+from backend.agent.streaming import ReplyStream
+from backend.agent.summary import session_summarizer
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -30,74 +36,91 @@ class ChatRequest(BaseModel):
     message: str
     session_id: int
 
+class ChatMessageResponse(BaseModel):
+    id: int
+    session_id: Optional[int] = None
+    user_id: Optional[int] = None
+    role: str
+    message: Optional[str] = None
+    msg_type: Optional[str] = None
+    content: Optional[str] = None  # Omitted when include_content=false
+    truncated: Optional[bool] = False
+    timestamp: datetime
+
 @router.post("/sessions", response_model=ChatSessionResponse)
-def create_session(session: ChatSessionCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_session(session: ChatSessionCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     db_session = ChatSession(user_id=current_user.id, title=session.title)
     db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
+    await db.commit()
+    await db.refresh(db_session)
     return db_session
 
 @router.get("/sessions", response_model=List[ChatSessionResponse])
-def get_sessions(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(ChatSession).filter(ChatSession.user_id == current_user.id).order_by(ChatSession.created_at.desc()).all()
+async def get_sessions(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    query = select(ChatSession).filter(ChatSession.user_id == current_user.id)
+    return await paginate(db, query, (ChatSession.created_at, ChatSession.id), cursor, limit, response, descending=True)
 
 from fastapi.responses import StreamingResponse
 import json
 
 @router.post("/message")
-def chat_message(request: ChatRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def chat_message(request: ChatRequest, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     # Verify session belongs to user
-    session = db.query(ChatSession).filter(ChatSession.id == request.session_id, ChatSession.user_id == current_user.id).first()
+    result = await db.execute(
+        select(ChatSession).filter(ChatSession.id == request.session_id, ChatSession.user_id == current_user.id)
+    )
+    session = result.scalars().first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     # 1. Save user message
     user_msg = Chat(user_id=current_user.id, session_id=session.id, message=request.message, role="user")
     db.add(user_msg)
-    db.commit()
+    await db.commit()
+    context_cache.append_message(current_user.id, session.id, user_msg.id, "user", request.message)
+
+    # The request-scoped session is closed before the body streams,
+    # so only plain values are carried into the generator.
+    session_id = session.id
+    needs_title = session.title == "New Chat"
     
-    async def event_generator():
-        # Create a fresh DB session for the background generator
-        # This ensures the session stays open throughout the stream
-        gen_db = SessionLocal()
-        try:
-            # Re-fetch objects to ensure they are bound to the new session
-            gen_session = gen_db.query(ChatSession).filter(ChatSession.id == session.id).first()
-            gen_user = gen_db.query(User).filter(User.id == current_user.id).first()
-            
-            full_agent_text = ""
-            last_type = "chat"
-            last_content = None
-            
-            async for chunk_str in agent_brain.process_message_stream(request.message, gen_user, gen_db, gen_session.id):
-                chunk = json.loads(chunk_str.strip())
-                
-                if chunk["type"] == "chat_chunk":
-                    full_agent_text += chunk["text"]
-                elif chunk["type"] in ["plan", "resources"]:
-                    last_type = chunk["type"]
-                    last_content = json.dumps(chunk["content"]) if isinstance(chunk["content"], (dict, list)) else chunk["content"]
-                elif chunk["type"] == "chat_end" and "full_text" in chunk:
-                    full_agent_text = chunk["full_text"]
-                    
-                yield chunk_str
+    async def reply_events():
+        # The brain reads context with its own session and releases the
+        # connection before the LLM reply starts.
+        async with AsyncSessionLocal() as ctx_db:
+            async for event in agent_brain.process_message_events(request.message, current_user, ctx_db, session_id):
+                yield event
 
-            # After stream finishes, save agent response to DB
-            agent_msg = Chat(
-                user_id=gen_user.id, 
-                session_id=gen_session.id, 
+    async def persist_reply(recorder: ReplyRecorder):
+        # The whole reply is stored in one transaction once the stream ends,
+        # including what was generated before a client disconnect
+        full_agent_text = recorder.text
+        if recorder.truncated and not full_agent_text and recorder.content is None:
+            return
+        gen_db = AsyncSessionLocal()
+        try:
+            reply = Chat(
+                user_id=current_user.id, 
+                session_id=session_id, 
                 message=full_agent_text, 
                 role="agent",
-                msg_type=last_type,
-                content=last_content
+                msg_type=recorder.msg_type,
+                content=recorder.content,
+                truncated=recorder.truncated
             )
-            gen_db.add(agent_msg)
+            gen_db.add(reply)
+            saved_goal = None
             
             # If it was a plan, also create/update a Goal
-            if last_type == "plan" and last_content:
+            if recorder.msg_type == "plan" and recorder.content:
                 try:
-                    plan_data = json.loads(last_content)
+                    plan_data = json.loads(recorder.content)
                     goal_text = plan_data.get("overview", request.message)
                     if len(goal_text) > 150: goal_text = goal_text[:147] + "..."
                     
@@ -117,17 +140,19 @@ def chat_message(request: ChatRequest, current_user: User = Depends(get_current_
                         deadline_text = f"{weeks} weeks"
 
                     # Check if a goal already exists for this session
-                    existing_goal = gen_db.query(Goal).filter(Goal.session_id == gen_session.id).first()
+                    result = await gen_db.execute(select(Goal).filter(Goal.session_id == session_id))
+                    existing_goal = result.scalars().first()
                     
                     if existing_goal:
                         existing_goal.text = goal_text
                         existing_goal.total_tasks = total_tasks
                         existing_goal.deadline = deadline_text
                         # Keep current progress/completed tasks unless reset is desired
+                        saved_goal = existing_goal
                     else:
                         new_goal = Goal(
-                            user_id=gen_user.id,
-                            session_id=gen_session.id,
+                            user_id=current_user.id,
+                            session_id=session_id,
                             text=goal_text,
                             deadline=deadline_text, 
                             status="active",
@@ -136,47 +161,120 @@ def chat_message(request: ChatRequest, current_user: User = Depends(get_current_
                             progress=0
                         )
                         gen_db.add(new_goal)
+                        saved_goal = new_goal
                 except Exception as e:
                     print(f"Error saving goal: {e}")
             
-            if gen_session.title == "New Chat":
-                new_title = " ".join(request.message.split()[:5])
-                gen_session.title = new_title
+            if needs_title:
+                # Conditional so a rename made while the reply streamed is kept
+                await gen_db.execute(
+                    update(ChatSession)
+                    .where(ChatSession.id == session_id, ChatSession.title == "New Chat")
+                    .values(title=" ".join(request.message.split()[:5]))
+                )
                 
-            gen_db.commit()
+            await gen_db.commit()
+
+            # Write-through so the next message in this session skips the DB
+            context_cache.append_message(current_user.id, session_id, reply.id, "agent", full_agent_text)
+            # Older turns leave the prompt window; fold them into the session summary
+            session_summarizer.schedule(current_user.id, session_id)
+            if saved_goal is not None:
+                context_cache.upsert_goal(current_user.id, goal_summary(saved_goal))
         except Exception as e:
-            print(f"Error in event_generator: {e}")
-            gen_db.rollback()
+            print(f"Error saving agent reply: {e}")
+            await gen_db.rollback()
         finally:
-            gen_db.close()
+            await gen_db.close()
 
-    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+    stream = ReplyStream(reply_events(), persist_reply)
+    return StreamingResponse(
+        stream.body(),
+        media_type="application/x-ndjson",
+        # Frames are already coalesced; proxies should pass them straight through
+        headers={"X-Accel-Buffering": "no"},
+    )
 
-@router.get("/history/{session_id}")
-def get_chat_history(session_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    session = db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id).first()
-    if not session:
+@router.get("/history/{session_id}", response_model=List[ChatMessageResponse])
+async def get_chat_history(
+    session_id: int,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_content: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Keyset-paginated on (timestamp, id), always returned oldest first.
+    Without a cursor this is the latest page; `before` walks back to older
+    messages and `after` fetches newer ones. X-Before-Cursor / X-After-Cursor
+    are set when more messages exist in that direction.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+
+    result = await db.execute(
+        select(ChatSession.id).filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id)
+    )
+    if result.first() is None:
         raise HTTPException(status_code=404, detail="Session not found")
-        
-    return db.query(Chat).filter(Chat.session_id == session_id).order_by(Chat.timestamp).all()
+
+    columns = [Chat.id, Chat.session_id, Chat.user_id, Chat.role, Chat.message, Chat.msg_type, Chat.truncated, Chat.timestamp]
+    if include_content:
+        columns.append(Chat.content)
+    key = (Chat.timestamp, Chat.id)
+    query = select(*columns).filter(Chat.session_id == session_id)
+
+    if after:
+        query = query.filter(keyset_filter(key, decode_cursor(after, datetime, int)))
+        query = query.order_by(Chat.timestamp, Chat.id)
+    else:
+        if before:
+            query = query.filter(keyset_filter(key, decode_cursor(before, datetime, int), descending=True))
+        query = query.order_by(Chat.timestamp.desc(), Chat.id.desc())
+
+    # One extra row tells us whether another page exists
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+
+    if rows:
+        first, last = rows[0], rows[-1]
+        if (has_more and not after) or after:
+            response.headers["X-Before-Cursor"] = encode_cursor(first.timestamp, first.id)
+        if (has_more and after) or before:
+            response.headers["X-After-Cursor"] = encode_cursor(last.timestamp, last.id)
+
+    return [dict(row._mapping) for row in rows]
 
 @router.patch("/sessions/{session_id}", response_model=ChatSessionResponse)
-def update_session(session_id: int, update_data: ChatSessionUpdate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    db_session = db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id).first()
+async def update_session(session_id: int, update_data: ChatSessionUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id)
+    )
+    db_session = result.scalars().first()
     if not db_session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     db_session.title = update_data.title
-    db.commit()
-    db.refresh(db_session)
+    await db.commit()
+    await db.refresh(db_session)
     return db_session
 
 @router.delete("/sessions/{session_id}")
-def delete_session(session_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    db_session = db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id).first()
+async def delete_session(session_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id)
+    )
+    db_session = result.scalars().first()
     if not db_session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    db.delete(db_session)
-    db.commit()
+    await db.delete(db_session)
+    await db.commit()
+    context_cache.invalidate(current_user.id, session_id)
     return {"message": "Session deleted successfully"}
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from backend.database.database import get_db
 from backend.database.models import User, Goal
+from backend.database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
 from backend.auth.dependencies import get_current_user
+from backend.agent.context import context_cache, goal_summary
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/goals", tags=["goals"])
@@ -26,13 +29,28 @@ class GoalResponse(BaseModel):
         from_attributes = True
 
 @router.post("/", response_model=GoalResponse)
-def create_goal(goal: GoalCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_goal(goal: GoalCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     db_goal = Goal(text=goal.text, deadline=goal.deadline, user_id=current_user.id)
     db.add(db_goal)
-    db.commit()
-    db.refresh(db_goal)
+    await db.commit()
+    await db.refresh(db_goal)
+    context_cache.upsert_goal(current_user.id, goal_summary(db_goal))
     return db_goal
 
 @router.get("/", response_model=List[GoalResponse])
-def get_goals(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return current_user.goals
+async def get_goals(
+    response: Response,
+    status: Optional[str] = None,
+    session_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    query = select(Goal).filter(Goal.user_id == current_user.id)
+    if status:
+        query = query.filter(Goal.status == status)
+    if session_id is not None:
+        query = query.filter(Goal.session_id == session_id)
+    # Newest first, so the first page always holds the goals just created
+    return await paginate(db, query, (Goal.id,), cursor, limit, response, descending=True)
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from backend.database.database import get_db
 from backend.database.models import User, Notification
-from backend.auth.dependencies import get_current_user
+from backend.database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from backend.database.sync import decode_sync_token, encode_sync_token, make_etag, not_modified, read_versions, set_sync_headers
+from backend.auth.dependencies import get_current_user, get_stream_user
+from backend.realtime.hub import KEEPALIVE_SECONDS, notification_hub
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -22,28 +28,109 @@ class NotificationResponse(BaseModel):
         from_attributes = True
 
 @router.get("/", response_model=List[NotificationResponse])
-def get_notifications(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Fetch notifications that are either past their scheduled time or have no scheduled time
-    now = datetime.now()
-    return db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        (Notification.scheduled_for == None) | (Notification.scheduled_for <= now)
-    ).order_by(Notification.created_at.desc()).all()
+async def get_notifications(
+    request: Request,
+    response: Response,
+    unread_only: bool = False,
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Newest-first page of delivered notifications.
+
+    Delivery by the dispatcher is a write, so the user's notifications
+    version alone makes the ETag and an unchanged poll gets a 304 before
+    the listing query runs. Passing an earlier X-Sync-Token as `since`
+    returns only rows written or delivered since then (X-Sync-Mode: delta);
+    unread_only is not applied to deltas so rows that were read still reach
+    the client. A delete since the token, or more than `limit` changes,
+    falls back to the full listing.
+    """
+    # Scheduled notifications appear once the dispatcher has delivered them
+    delivered = Notification.delivered_at != None
+
+    version, reset_version = await read_versions(db, current_user.id, "notifications")
+    etag = make_etag(current_user.id, version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    token = encode_sync_token(version)
+
+    if since:
+        since_version = decode_sync_token(since)
+        if reset_version <= since_version <= version:
+            changed = (await db.execute(
+                select(Notification)
+                .filter(
+                    Notification.user_id == current_user.id,
+                    delivered,
+                    Notification.version > since_version,
+                )
+                .order_by(Notification.created_at.desc(), Notification.id.desc())
+                .limit(limit + 1)
+            )).scalars().all()
+            if len(changed) <= limit:
+                set_sync_headers(response, etag, token, "delta")
+                return changed
+
+    set_sync_headers(response, etag, token, "full")
+    query = select(Notification).filter(Notification.user_id == current_user.id, delivered)
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+    return await paginate(db, query, (Notification.created_at, Notification.id), cursor, limit, response, descending=True)
+
+@router.get("/stream")
+async def stream_notifications(request: Request, current_user: User = Depends(get_stream_user)):
+    """
+    Server-Sent Events feed of this user's notifications as they become due.
+    Clients load the list once, then apply `notification` events; a `resync`
+    event means events were dropped and the list should be refetched.
+    """
+    user_id = current_user.id
+    queue = notification_hub.subscribe(user_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+        finally:
+            notification_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.patch("/{notification_id}/read")
-def mark_read(notification_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    note = db.query(Notification).filter(Notification.id == notification_id, Notification.user_id == current_user.id).first()
+async def mark_read(notification_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(Notification).filter(Notification.id == notification_id, Notification.user_id == current_user.id)
+    )
+    note = result.scalars().first()
     if not note:
         raise HTTPException(status_code=404, detail="Notification not found")
     note.is_read = True
-    db.commit()
+    await db.commit()
     return {"message": "Notification marked as read"}
 
 @router.delete("/{notification_id}")
-def delete_notification(notification_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    note = db.query(Notification).filter(Notification.id == notification_id, Notification.user_id == current_user.id).first()
+async def delete_notification(notification_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(Notification).filter(Notification.id == notification_id, Notification.user_id == current_user.id)
+    )
+    note = result.scalars().first()
     if not note:
         raise HTTPException(status_code=404, detail="Notification not found")
-    db.delete(note)
-    db.commit()
+    await db.delete(note)
+    await db.commit()
     return {"message": "Notification deleted"}
@@ -1,13 +1,27 @@
+import os
+from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.database.database import get_db
-from backend.database.models import User, Goal, ChatSession
+from backend.database.models import User, Goal, ChatSession, UserStats
 from backend.auth.dependencies import get_current_user
+from backend.auth.token_cache import token_cache
 from pydantic import BaseModel
 from typing import Optional
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
+# Serve /stats from the user_stats row instead of aggregating on every request
+USER_STATS_MATERIALIZED = os.getenv("USER_STATS_MATERIALIZED", "true").lower() == "true"
+# Age after which a read recomputes the row, repairing writes the flush listener missed
+USER_STATS_RECONCILE_SECONDS = int(os.getenv("USER_STATS_RECONCILE_SECONDS", "600"))
+
+STATS_COLUMNS = ("total_goals", "active_goals", "completed_goals", "progress_sum", "total_sessions")
+
 class ProfileResponse(BaseModel):
     id: int
     name: str
@@ -32,52 +46,117 @@ class StatsResponse(BaseModel):
     total_progress: int  # Average progress across all goals
 
 @router.get("/me", response_model=ProfileResponse)
-def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.patch("/me", response_model=ProfileResponse)
-def update_profile(
+async def update_profile(
     update: ProfileUpdate, 
     current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    # current_user is a cached read-only snapshot; edit the row itself
+    user = await db.get(User, current_user.id)
+
     if update.username is not None:
         # Check if username is already taken by another user
-        existing = db.query(User).filter(
-            User.username == update.username, 
-            User.id != current_user.id
-        ).first()
+        result = await db.execute(
+            select(User).filter(
+                User.username == update.username, 
+                User.id != current_user.id
+            )
+        )
+        existing = result.scalars().first()
         if existing:
             raise HTTPException(status_code=400, detail="Username already taken")
-        current_user.username = update.username
+        user.username = update.username
     
     if update.bio is not None:
-        current_user.bio = update.bio
+        user.bio = update.bio
     
     if update.avatar_url is not None:
-        current_user.avatar_url = update.avatar_url
+        user.avatar_url = update.avatar_url
     
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    await db.commit()
+    await db.refresh(user)
+    token_cache.invalidate_user(user.id)
+    return user
 
-@router.get("/stats", response_model=StatsResponse)
-def get_stats(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    goals = db.query(Goal).filter(Goal.user_id == current_user.id).all()
-    sessions = db.query(ChatSession).filter(ChatSession.user_id == current_user.id).count()
-    
-    total_goals = len(goals)
-    active_goals = len([g for g in goals if g.status == "active"])
-    completed_goals = len([g for g in goals if g.status == "completed"])
-    
-    avg_progress = 0
-    if total_goals > 0:
-        avg_progress = sum(g.progress for g in goals) // total_goals
-    
+def stats_aggregate_query(user_id: int):
+    """All dashboard counters for one user in a single statement over the goals index."""
+    sessions = (
+        select(func.count(ChatSession.id))
+        .filter(ChatSession.user_id == user_id)
+        .scalar_subquery()
+    )
+    return select(
+        func.count(Goal.id).label("total_goals"),
+        # A NULL status counts as active, as in the user_stats listener (_goal_counts)
+        func.coalesce(func.sum(case((func.coalesce(Goal.status, "active") == "active", 1), else_=0)), 0).label("active_goals"),
+        func.coalesce(func.sum(case((Goal.status == "completed", 1), else_=0)), 0).label("completed_goals"),
+        func.coalesce(func.sum(Goal.progress), 0).label("progress_sum"),
+        sessions.label("total_sessions"),
+    ).filter(Goal.user_id == user_id)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+async def backfill_user_stats(db: AsyncSession, user_id: int):
+    """
+    Creates the user_stats row as one INSERT ... SELECT ... ON CONFLICT DO
+    NOTHING, so the aggregate and the insert see the same snapshot and a
+    concurrent first read simply loses the race.
+    """
+    dialect = db.get_bind().dialect.name
+    insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+    rows = stats_aggregate_query(user_id).add_columns(literal(user_id), literal(_utcnow(), UserStats.reconciled_at.type))
+    await db.execute(
+        insert(UserStats)
+        .from_select([*STATS_COLUMNS, "user_id", "reconciled_at"], rows)
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+
+async def reconcile_user_stats(db: AsyncSession, user_id: int):
+    """Overwrites the row with a fresh aggregate in a single UPDATE ... FROM, joined on user_id."""
+    fresh = stats_aggregate_query(user_id).add_columns(literal(user_id).label("user_id")).subquery()
+    await db.execute(
+        update(UserStats)
+        .where(UserStats.user_id == fresh.c.user_id)
+        .values({**{column: fresh.c[column] for column in STATS_COLUMNS}, "reconciled_at": _utcnow()})
+    )
+
+def _is_stale(stats: UserStats) -> bool:
+    if stats.reconciled_at is None:
+        return True
+    return _utcnow() - stats.reconciled_at > timedelta(seconds=USER_STATS_RECONCILE_SECONDS)
+
+def stats_response(total_goals, active_goals, completed_goals, progress_sum, total_sessions) -> dict:
     return {
         "total_goals": total_goals,
         "active_goals": active_goals,
         "completed_goals": completed_goals,
-        "total_sessions": sessions,
-        "total_progress": avg_progress
+        "total_sessions": total_sessions,
+        "total_progress": progress_sum // total_goals if total_goals else 0,
     }
+
+@router.get("/stats", response_model=StatsResponse)
+async def get_stats(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if USER_STATS_MATERIALIZED:
+        stats = await db.get(UserStats, current_user.id)
+        if stats is None or _is_stale(stats):
+            try:
+                if stats is None:
+                    await backfill_user_stats(db, current_user.id)
+                else:
+                    await reconcile_user_stats(db, current_user.id)
+                await db.commit()
+                stats = await db.get(UserStats, current_user.id, populate_existing=True)
+            except (IntegrityError, DBAPIError):
+                # e.g. SQLite busy; answer from the aggregate and retry on a later read
+                await db.rollback()
+                stats = None
+        if stats:
+            return stats_response(*(getattr(stats, column) for column in STATS_COLUMNS))
+
+    row = (await db.execute(stats_aggregate_query(current_user.id))).one()
+    return stats_response(*row)
@@ -0,0 +1,99 @@
+"""
+A request that needs two dependent tool rounds: look at the schedule,
+then book a session into a free slot.
+
+1. One tool round per reply (how the brain worked before the agent loop:
+   tools once, then a final answer), so the user has to send a second
+   message to get the booking made.
+2. The agent loop: both rounds and the answer in a single reply.
+3. The loop again with a 1-step and a tiny token budget, to show it
+   still ends with an answer.
+
+Each completion streams REPLY_TOKENS tokens, TOKEN_DELAY seconds apart.
+
+Usage: python benchmarks/bench_agent_loop.py [runs]
+"""
+import asyncio
+import json
+import sys
+import time
+from functools import partial
+
+from common import FakeMistral, seed_user_with_sessions, use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import func, select  # noqa: E402
+from backend.database.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import CalendarEvent, User  # noqa: E402
+from backend.agent import brain as brain_module  # noqa: E402
+from backend.agent.agent_loop import StepBudget, agent_loop_stats  # noqa: E402
+from backend.agent.brain import AgentBrain  # noqa: E402
+
+REPLY_TOKENS = 30
+TOKEN_DELAY = 0.01
+
+LOOK = [("get_user_schedule", {"date_str": "2026-03-02"})]
+BOOK = [("schedule_learning_session", {"title": "Rust ownership", "start_time_str": "2026-03-02T18:00:00",
+                                       "duration_minutes": 60})]
+
+
+async def reply(brain, user, session_id, message, rounds, max_steps=None, max_tokens=None):
+    """Runs one reply; returns (seconds, completions, events seen)."""
+    limits = {k: v for k, v in {"max_steps": max_steps, "max_tokens": max_tokens}.items() if v is not None}
+    brain_module.StepBudget = partial(StepBudget, **limits)
+    brain.client = FakeMistral(reply_tokens=REPLY_TOKENS, token_delay=TOKEN_DELAY, tool_rounds=rounds)
+    kinds = []
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        async for line in brain.process_message_stream(message, user, db, session_id):
+            event = json.loads(line)
+            kinds.append(event["type"] if event["type"] != "status" else f"status:{event['text']}")
+            if event["type"] == "error":
+                raise RuntimeError(event["text"])
+    return time.perf_counter() - start, brain.client.chat.calls, kinds
+
+
+async def booked(user_id):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(CalendarEvent)
+                                 .filter(CalendarEvent.user_id == user_id))).scalar()
+
+
+async def main(runs):
+    Base.metadata.create_all(bind=engine)
+    user_id, session_ids = seed_user_with_sessions(SessionLocal, sessions=1, chats_per_session=10, goals=1)
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+    brain = AgentBrain()
+    session_id = session_ids[0]
+
+    single, loop = [], []
+    for _ in range(runs):
+        first = await reply(brain, user, session_id, "Find me an evening slot and book Rust", [LOOK], max_steps=2)
+        second = await reply(brain, user, session_id, "Yes, book 18:00", [BOOK], max_steps=2)
+        single.append((first[0] + second[0], first[1] + second[1]))
+        seconds, calls, _ = await reply(brain, user, session_id, "Find me an evening slot and book Rust", [LOOK, BOOK])
+        loop.append((seconds, calls))
+
+    def summary(samples):
+        seconds = sorted(s for s, _ in samples)
+        return f"p50 {seconds[len(seconds) // 2]:5.2f} s, {samples[0][1]} completions"
+
+    print(f"{runs} runs, {REPLY_TOKENS} tokens per completion at {TOKEN_DELAY * 1000:.0f} ms")
+    print(f"  one tool round per reply  2 HTTP requests  {summary(single)}")
+    print(f"  agent loop                1 HTTP request   {summary(loop)}")
+    print(f"  sessions booked: {await booked(user_id)} (expected {2 * runs})")
+
+    agent_loop_stats.__init__()
+    _, calls, kinds = await reply(brain, user, session_id, "book it", [LOOK, BOOK], max_steps=1)
+    print(f"  max_steps=1: {calls} completion, ends with {kinds[-1]}, stopped by {agent_loop_stats.stats()['budget_stops']}")
+    agent_loop_stats.__init__()
+    _, calls, kinds = await reply(brain, user, session_id, "book it", [LOOK, BOOK], max_tokens=50)
+    statuses = [k for k in kinds if k.startswith("status:")]
+    print(f"  token budget 50: {calls} completions, statuses {statuses}, "
+          f"stopped by {agent_loop_stats.stats()['budget_stops']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
@@ -0,0 +1,74 @@
+"""
+Concurrent chat-stream throughput: blocking SessionLocal queries inside the
+async generator (the old behaviour) versus the AsyncSession path.
+
+Usage: python benchmarks/bench_async_db.py [concurrent_streams] [history_rows]
+"""
+import asyncio
+import sys
+import time
+
+from common import FakeMistral, LoopLagProbe, seed_user_with_sessions, use_temp_database
+
+use_temp_database()
+
+from backend.database.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import Chat, Goal, User  # noqa: E402
+from backend.agent.brain import AgentBrain  # noqa: E402
+
+
+async def legacy_stream(user_id, session_id, client):
+    """The pre-async context fetch: sync ORM queries run directly on the event loop."""
+    db = SessionLocal()
+    try:
+        db.query(Chat).filter(Chat.user_id == user_id, Chat.session_id != session_id)\
+            .order_by(Chat.timestamp.desc()).limit(20).all()
+        db.query(Goal).filter(Goal.user_id == user_id, Goal.session_id != session_id).all()
+        db.query(Goal).filter(Goal.session_id == session_id).first()
+        db.query(Chat).filter(Chat.session_id == session_id)\
+            .order_by(Chat.timestamp.desc()).limit(10).all()
+        # Returned early so the sync pool cannot deadlock the loop at high concurrency
+        db.close()
+        stream = await client.chat.stream_async(model="bench", messages=[{"role": "user", "content": "hi"}])
+        async for _ in stream:
+            pass
+    finally:
+        db.close()
+
+
+async def async_stream(brain, user, session_id):
+    async with AsyncSessionLocal() as db:
+        async for _ in brain.process_message_stream("hi", user, db, session_id):
+            pass
+
+
+async def run(label, make_coro, streams):
+    probe = LoopLagProbe()
+    probe.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[make_coro(i) for i in range(streams)])
+    elapsed = time.perf_counter() - start
+    await probe.stop()
+    print(f"{label:<22} {streams / elapsed:8.1f} streams/s  ({elapsed:.2f}s)  {probe.report()}")
+
+
+async def main(streams, history_rows):
+    Base.metadata.create_all(bind=engine)
+    sessions = max(1, history_rows // 200)
+    user_id, session_ids = seed_user_with_sessions(SessionLocal, sessions=sessions, chats_per_session=200)
+
+    client = FakeMistral(reply_tokens=20, token_delay=0.002)
+    brain = AgentBrain()
+    brain.client = client
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+
+    print(f"{streams} concurrent streams, {sessions * 200} chat rows")
+    await run("sync SessionLocal", lambda i: legacy_stream(user_id, session_ids[i % len(session_ids)], client), streams)
+    await run("AsyncSession", lambda i: async_stream(brain, user, session_ids[i % len(session_ids)]), streams)
+
+
+if __name__ == "__main__":
+    streams = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    history_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    asyncio.run(main(streams, history_rows))
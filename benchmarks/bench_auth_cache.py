@@ -0,0 +1,56 @@
+"""
+Requests/sec on GET /profile/me with and without the token cache.
+
+Usage: python benchmarks/bench_auth_cache.py [requests] [concurrency]
+"""
+import asyncio
+import sys
+import time
+
+from common import use_temp_database
+
+use_temp_database()
+
+import httpx  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.auth.token_cache import token_cache  # noqa: E402
+
+
+async def hammer(client, headers, total, concurrency):
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.get("/profile/profile/me", headers=headers)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return total / (time.perf_counter() - start)
+
+
+async def main(total, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        r = await client.post("/auth/auth/register", json={"email": "bench@example.com", "password": "pw", "name": "Bench"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        ttl = token_cache.ttl_seconds
+        token_cache.ttl_seconds = 0  # put() becomes a no-op
+        await hammer(client, headers, 50, concurrency)  # warm-up
+        uncached = await hammer(client, headers, total, concurrency)
+
+        token_cache.ttl_seconds = ttl
+        await hammer(client, headers, 50, concurrency)
+        cached = await hammer(client, headers, total, concurrency)
+
+    print(f"{total} requests, concurrency {concurrency}")
+    print(f"  without token cache  {uncached:8.1f} req/s")
+    print(f"  with token cache     {cached:8.1f} req/s  ({cached / uncached:.2f}x)")
+    print(f"  {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(main(total, concurrency))
@@ -0,0 +1,86 @@
+"""
+Time-to-first-byte of the agent stream: how long process_message_stream
+takes to reach `chat_start` (the first LLM token), comparing the old
+four-query context fetch with build_context.
+
+Usage: python benchmarks/bench_context_ttfb.py [sessions] [messages_per_session]
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from common import FakeMistral, seed_user_with_sessions, use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import select  # noqa: E402
+from backend.database.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import Chat, Goal, User  # noqa: E402
+from backend.agent.brain import AgentBrain  # noqa: E402
+from backend.agent.context import build_context  # noqa: E402
+
+REPEATS = 200
+
+
+async def legacy_context(db, user_id, session_id):
+    """The previous fetch: four full-entity queries, one of them never used."""
+    (await db.execute(select(Chat).filter(Chat.user_id == user_id, Chat.session_id != session_id)
+                      .order_by(Chat.timestamp.desc()).limit(20))).scalars().all()
+    (await db.execute(select(Goal).filter(Goal.user_id == user_id, Goal.session_id != session_id))).scalars().all()
+    (await db.execute(select(Goal).filter(Goal.session_id == session_id))).scalars().first()
+    (await db.execute(select(Chat).filter(Chat.session_id == session_id)
+                      .order_by(Chat.timestamp.desc()).limit(10))).scalars().all()
+
+
+async def time_fetch(fetch, user_id, session_id):
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            await fetch(db, user_id, session_id)
+            samples.append(time.perf_counter() - start)
+            await db.commit()
+    return samples
+
+
+async def time_ttfb(brain, user, session_id):
+    samples = []
+    for _ in range(REPEATS):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            async for chunk in brain.process_message_stream("hi", user, db, session_id):
+                if json.loads(chunk)["type"] == "chat_start":
+                    samples.append(time.perf_counter() - start)
+                    break
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"  {label:<28} p50 {statistics.median(samples) * 1000:7.3f} ms   p95 {p95 * 1000:7.3f} ms")
+
+
+async def main(sessions, per_session):
+    Base.metadata.create_all(bind=engine)
+    user_id, session_ids = seed_user_with_sessions(
+        SessionLocal, sessions=sessions, chats_per_session=per_session, goals=sessions
+    )
+    session_id = session_ids[-1]
+    brain = AgentBrain()
+    brain.client = FakeMistral(reply_tokens=1)
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+
+    print(f"{sessions} sessions x {per_session} messages, {REPEATS} runs each")
+    report("legacy context (4 queries)", await time_fetch(legacy_context, user_id, session_id))
+    report("build_context (2 queries)", await time_fetch(build_context, user_id, session_id))
+    report("stream TTFB (chat_start)", await time_ttfb(brain, user, session_id))
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    per_session = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(main(sessions, per_session))
@@ -0,0 +1,91 @@
+"""
+Query latency of get_chat_history and the process_message_stream context
+fetches on a large chats table, before and after the composite indexes.
+
+Usage: python benchmarks/bench_indexes.py [chat_rows]   (default 1,000,000)
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import ROOT, use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import select  # noqa: E402
+from backend.database.database import Base, engine  # noqa: E402
+from backend.database.models import Chat, Goal  # noqa: E402
+
+USERS = 1000
+MESSAGES_PER_SESSION = 100
+REPEATS = 50
+NEW_INDEXES = [
+    "ix_chats_session_timestamp", "ix_chats_user_session_timestamp", "ix_goals_session_id",
+    "ix_goals_user_id", "ix_calendar_events_user_start", "ix_notifications_user_scheduled_created",
+]
+
+
+def seed(chat_rows):
+    sessions = max(1, chat_rows // MESSAGES_PER_SESSION)
+    Base.metadata.create_all(bind=engine)
+    conn = sqlite3.connect("app.db")
+    # Start from a bare table so the "before" numbers reflect the old schema
+    for name in NEW_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.executemany("INSERT INTO users (id, name, email) VALUES (?, ?, ?)",
+                     ((u, f"user{u}", f"user{u}@example.com") for u in range(1, USERS + 1)))
+    conn.executemany("INSERT INTO chat_sessions (id, user_id, title) VALUES (?, ?, ?)",
+                     ((s, s % USERS + 1, f"session {s}") for s in range(1, sessions + 1)))
+    conn.executemany("INSERT INTO goals (user_id, session_id, text, status, progress) VALUES (?, ?, ?, 'active', 0)",
+                     ((s % USERS + 1, s, f"goal {s}") for s in range(1, sessions + 1, 10)))
+    base = datetime(2026, 1, 1)
+    rows = (
+        (s, s % USERS + 1, f"message {i}", "user" if i % 2 else "agent",
+         (base + timedelta(seconds=s * MESSAGES_PER_SESSION + i)).isoformat(sep=" "))
+        for s in range(1, sessions + 1) for i in range(MESSAGES_PER_SESSION)
+    )
+    conn.executemany("INSERT INTO chats (session_id, user_id, message, role, timestamp) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return sessions
+
+
+def queries(session_id, user_id):
+    return {
+        "get_chat_history": select(Chat).filter(Chat.session_id == session_id).order_by(Chat.timestamp),
+        "context: session chats": select(Chat).filter(Chat.session_id == session_id)
+                                              .order_by(Chat.timestamp.desc()).limit(10),
+        "context: user chats": select(Chat).filter(Chat.user_id == user_id, Chat.session_id == session_id)
+                                           .order_by(Chat.timestamp.desc()).limit(20),
+        "context: current goal": select(Goal).filter(Goal.session_id == session_id),
+        "context: other goals": select(Goal).filter(Goal.user_id == user_id, Goal.session_id != session_id),
+    }
+
+
+def measure(label, sessions):
+    print(f"\n{label}")
+    session_id = sessions // 2
+    user_id = session_id % USERS + 1
+    with engine.connect() as conn:
+        for name, stmt in queries(session_id, user_id).items():
+            conn.execute(stmt).all()  # warm the page cache
+            start = time.perf_counter()
+            for _ in range(REPEATS):
+                conn.execute(stmt).all()
+            elapsed = (time.perf_counter() - start) / REPEATS
+            print(f"  {name:<26} {elapsed * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    chat_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    start = time.perf_counter()
+    sessions = seed(chat_rows)
+    print(f"Seeded {sessions * MESSAGES_PER_SESSION} chat rows in {time.perf_counter() - start:.1f}s")
+
+    measure("Without composite indexes", sessions)
+    engine.dispose()
+    subprocess.run([sys.executable, os.path.join(ROOT, "migrate_v4_indexes.py"), "app.db"], check=True)
+    measure("With composite indexes", sessions)
@@ -0,0 +1,113 @@
+"""
+A burst of users hitting an upstream that only serves so many concurrent
+calls and answers the rest with 429.
+
+1. Unmanaged: every call goes straight upstream (the previous behaviour);
+   rejected calls are errors for the user.
+2. ManagedMistral sized to the upstream capacity: calls queue for a slot.
+3. ManagedMistral sized above capacity: the overflow is rate limited and
+   retried with jittered backoff.
+
+Usage: python benchmarks/bench_llm_burst.py [users] [upstream_capacity]
+"""
+import asyncio
+import sys
+import time
+
+from common import FakeMistral, use_temp_database
+
+use_temp_database()
+
+from backend.agent.llm import ManagedMistral, llm_user  # noqa: E402
+
+TOKENS = 50
+TOKEN_DELAY = 0.002
+
+
+class RateLimited(Exception):
+    status_code = 429
+    headers = {}
+
+
+class CappedUpstream:
+    """FakeMistral whose streams fail with 429 beyond `capacity` concurrent ones."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.active = 0
+        self.rejected = 0
+        self._fake = FakeMistral(reply_tokens=TOKENS, token_delay=TOKEN_DELAY)
+        self.chat = self
+
+    async def stream_async(self, **kwargs):
+        if self.active >= self.capacity:
+            self.rejected += 1
+            raise RateLimited()
+        self.active += 1
+        stream = await self._fake.chat.stream_async(**kwargs)
+        upstream = self
+
+        class Stream:
+            def __aiter__(self):
+                return stream.__aiter__()
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                upstream.active -= 1
+
+        return Stream()
+
+
+async def one_user(client, user_id, latencies):
+    llm_user.set(user_id)
+    started = time.perf_counter()
+    try:
+        stream = await client.chat.stream_async(model="m", messages=[{"role": "user", "content": "hi"}])
+        async with stream:
+            async for _ in stream:
+                pass
+    except Exception:
+        return False
+    latencies.append(time.perf_counter() - started)
+    return True
+
+
+async def burst(label, client, upstream, users):
+    latencies = []
+    started = time.perf_counter()
+    ok = await asyncio.gather(*[one_user(client, u, latencies) for u in range(users)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(f"  {label:<28} {sum(ok):>4}/{users} ok  {upstream.rejected:>5} upstream 429s  "
+          f"p50 {p50:6.0f} ms  p99 {p99:6.0f} ms  burst {elapsed:5.2f} s")
+    if isinstance(client, ManagedMistral):
+        stats = client.stats()
+        print(f"  {'':<28} retries {stats['retries']}, queue wait p50 {stats['queue_wait_p50_ms']} ms "
+              f"p99 {stats['queue_wait_p99_ms']} ms")
+
+
+async def main(users, capacity):
+    print(f"{users} users at once, upstream serves {capacity} streams of {TOKENS} tokens")
+
+    upstream = CappedUpstream(capacity)
+    await burst("unmanaged", upstream, upstream, users)
+
+    upstream = CappedUpstream(capacity)
+    managed = ManagedMistral(max_concurrency=capacity, per_user=3)
+    managed.sdk = upstream
+    await burst(f"managed, {capacity} slots", managed, upstream, users)
+
+    upstream = CappedUpstream(capacity)
+    managed = ManagedMistral(max_concurrency=capacity * 4, per_user=3)
+    managed.sdk = upstream
+    await burst(f"managed, {capacity * 4} slots + retry", managed, upstream, users)
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    asyncio.run(main(users, capacity))
@@ -0,0 +1,56 @@
+"""
+Concurrent logins per second through POST /auth/token, plus how many were
+turned away with 503 once the bcrypt pool's queue limit was reached.
+
+Usage: BCRYPT_ROUNDS=12 python benchmarks/bench_logins.py [logins] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from common import LoopLagProbe, use_temp_database
+
+use_temp_database()
+
+import httpx  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.auth.security import password_hasher  # noqa: E402
+
+
+async def main(total, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/auth/register", json={"email": "bench@example.com", "password": "pw", "name": "Bench"})
+        form = {"username": "bench@example.com", "password": "pw"}
+        latencies, statuses = [], []
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.post("/auth/auth/token", data=form)
+                latencies.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+
+        probe = LoopLagProbe()
+        probe.start()
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+        await probe.stop()
+
+    ok = statuses.count(200)
+    latencies.sort()
+    print(f"{total} logins, concurrency {concurrency}, {password_hasher.workers} bcrypt workers, "
+          f"queue limit {password_hasher.queue_limit}, rounds {password_hasher.stats()['rounds']}")
+    print(f"  {ok / elapsed:8.1f} successful logins/s   ({statuses.count(503)} rejected with 503)")
+    print(f"  latency p50 {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+    print(f"  {probe.report()}")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(total, concurrency))
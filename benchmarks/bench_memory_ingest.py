@@ -0,0 +1,119 @@
+"""
+Cost of storing agent memories when many replies finish at once.
+
+Each of N users ends a reply and stores the exchange as a memory. The fake
+embeddings endpoint takes EMBED_DELAY seconds per call.
+
+1. Inline: the reply awaits its own embedding call and insert (what
+   add_memory did before the ingestion queue).
+2. Queued: the reply only calls submit(); the worker embeds micro-batches.
+3. The same texts again (all deduplicated), and a batch whose first
+   embedding call fails (retried).
+
+Usage: python benchmarks/bench_memory_ingest.py [users]
+"""
+import asyncio
+import sys
+import time
+
+from common import FakeMistral, use_temp_database
+
+use_temp_database()
+
+from backend.database.database import Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import User  # noqa: E402
+from backend.agent.embeddings import MistralEmbedder  # noqa: E402
+from backend.agent.llm import ManagedMistral  # noqa: E402
+from backend.agent.memory import MemoryIngestQueue, MemoryItem, MemoryStore, content_hash  # noqa: E402
+
+EMBED_DELAY = 0.08
+
+
+def seed_users(count):
+    db = SessionLocal()
+    try:
+        users = [User(name=f"u{i}", email=f"u{i}@example.com", password_hash="x") for i in range(count)]
+        db.add_all(users)
+        db.commit()
+        return [u.id for u in users]
+    finally:
+        db.close()
+
+
+def exchange(user_id, turn):
+    return f"User: question {turn} from {user_id}\nAgent: answer {turn} for {user_id}"
+
+
+def make_store():
+    fake = FakeMistral(embed_delay=EMBED_DELAY)
+    client = ManagedMistral(max_concurrency=32, per_user=3)
+    client.sdk = fake
+    return MemoryStore(embedder=MistralEmbedder(client)), fake
+
+
+def ms(values):
+    values = sorted(values)
+    return f"p50 {values[len(values) // 2] * 1000:7.2f} ms  max {values[-1] * 1000:7.2f} ms"
+
+
+async def inline(user_ids):
+    store, fake = make_store()
+
+    async def reply_end(user_id):
+        text = exchange(user_id, 1)
+        started = time.perf_counter()
+        await store.add_batch([MemoryItem(user_id, text, "exchange", {}, content_hash(text))])
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    waits = await asyncio.gather(*[reply_end(u) for u in user_ids])
+    print(f"  inline   reply waits {ms(waits)}  embedding calls {fake.embeddings.calls:>4}  "
+          f"all stored after {time.perf_counter() - started:5.2f} s")
+
+
+async def queued(user_ids):
+    store, fake = make_store()
+    queue = MemoryIngestQueue(store, max_size=10000, batch_size=64, linger=0.05, retries=3)
+
+    async def reply_end(user_id, turn):
+        started = time.perf_counter()
+        queue.submit(user_id, exchange(user_id, turn), "exchange")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    waits = await asyncio.gather(*[reply_end(u, 2) for u in user_ids])
+    depth = queue.stats()["depth"]
+    await queue._queue.join()
+    print(f"  queued   reply waits {ms(waits)}  embedding calls {fake.embeddings.calls:>4}  "
+          f"all stored after {time.perf_counter() - started:5.2f} s  (depth after the burst {depth})")
+
+    calls = fake.embeddings.calls
+    await asyncio.gather(*[reply_end(u, 2) for u in user_ids])
+    await queue._queue.join()
+    print(f"  resubmitted: {fake.embeddings.calls - calls} embedding calls, {store.duplicates} duplicates skipped")
+
+    failing = fake.embeddings.create_async
+
+    async def fail_once(*args, **kwargs):
+        fake.embeddings.create_async = failing
+        raise RuntimeError("embedding endpoint unavailable")
+
+    fake.embeddings.create_async = fail_once
+    await asyncio.gather(*[reply_end(u, 3) for u in user_ids[:10]])
+    await queue._queue.join()
+    stats = queue.stats()
+    print(f"  after a failed call: stored {stats['stored']}, retried {stats['retried']}, failed {stats['failed']}")
+    print(f"  {stats}")
+    await queue.stop()
+
+
+async def main(users):
+    Base.metadata.create_all(bind=engine)
+    user_ids = seed_users(users)
+    print(f"{users} replies finishing at once, {EMBED_DELAY * 1000:.0f} ms per embedding call")
+    await inline(user_ids)
+    await queued(user_ids)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
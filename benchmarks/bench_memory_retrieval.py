@@ -0,0 +1,147 @@
+"""
+Memory retrieval latency for one user with many memories.
+
+Seeds the memories table with N generated exchanges embedded by the local
+hashing embedder, loads them through MemoryStore, then times top-k
+searches against the index alone and AgentMemory.retrieve_memory as a
+whole (query embedding, index, text lookup). Recall is measured against an
+exact scan of the same vectors. Finally the query embedding is slowed to
+a remote round trip (SLOW_EMBED_SECONDS) to show that a reply waits at
+most MEMORY_RETRIEVAL_TIMEOUT for memories.
+
+Usage: python benchmarks/bench_memory_retrieval.py [memories] [dimensions]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from common import use_temp_database
+
+use_temp_database()
+
+import numpy as np  # noqa: E402
+from backend.database.database import Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import Memory, User  # noqa: E402
+from backend.agent.embeddings import HashingEmbedder  # noqa: E402
+from backend.agent.memory import MEMORY_RETRIEVAL_TIMEOUT, AgentMemory, MemoryStore, content_hash  # noqa: E402
+
+K = 5
+QUERIES = 300
+SLOW_EMBED_SECONDS = 1.0
+
+SUBJECTS = ["python", "react", "sql", "rust", "docker", "calculus", "spanish", "guitar", "statistics",
+            "kubernetes", "typescript", "graphs", "linear algebra", "networking", "pandas", "css"]
+ASPECTS = ["basics", "performance", "testing", "debugging", "interview prep", "project ideas",
+           "best practices", "exercises", "history", "tooling", "common mistakes", "advanced tricks"]
+VERBS = ["learn", "practice", "review", "understand", "improve at", "get started with", "master"]
+
+
+def memory_text(rng):
+    subject, aspect, verb = rng.choice(SUBJECTS), rng.choice(ASPECTS), rng.choice(VERBS)
+    day = rng.randint(1, 28)
+    return (f"User: I want to {verb} {subject} {aspect} (note {rng.randint(0, 10**9)})\n"
+            f"Agent: For {subject} {aspect}, block time on day {day} and track progress.")
+
+
+def seed(user_id, count, embedder):
+    rng = random.Random(3)
+    db = SessionLocal()
+    try:
+        for start in range(0, count, 5000):
+            texts = [memory_text(rng) for _ in range(min(5000, count - start))]
+            vectors = embedder.embed_sync(texts)
+            db.bulk_insert_mappings(Memory, [
+                {"user_id": user_id, "text": text, "kind": "exchange", "meta": {}, "content_hash": content_hash(text),
+                 "embedder": embedder.name, "embedding": vector.tobytes()}
+                for text, vector in zip(texts, vectors)
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+
+class SlowEmbedder:
+    """The same vectors, after a remote-embedding-like delay."""
+
+    def __init__(self, embedder, delay):
+        self.embedder = embedder
+        self.delay = delay
+        self.name = embedder.name
+
+    async def embed(self, texts):
+        await asyncio.sleep(self.delay)
+        return self.embedder.embed_sync(texts)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+async def main(count, dimensions):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(name="Bench", email="bench@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    embedder = HashingEmbedder(dimensions=dimensions)
+    started = time.perf_counter()
+    seed(user_id, count, embedder)
+    print(f"{count} memories, {dimensions} dimensions (seeded in {time.perf_counter() - started:.1f} s)")
+
+    store = MemoryStore(embedder=embedder)
+    memory = AgentMemory(store)
+    started = time.perf_counter()
+    memories = await store._user(user_id)
+    loaded = time.perf_counter() - started
+    await memories.index.wait_partitioned()
+    print(f"  index load {loaded:.2f} s, partitioned after {time.perf_counter() - started:.2f} s")
+
+    index = memories.index
+    vectors, ids = index._vectors[:index.size], index._ids[:index.size]
+    rng = random.Random(11)
+    queries = [f"how do I {rng.choice(VERBS)} {rng.choice(SUBJECTS)} {rng.choice(ASPECTS)}" for _ in range(QUERIES)]
+    query_vectors = embedder.embed_sync(queries)
+
+    search_times, exact_times, recall = [], [], 0.0
+    for vector in query_vectors:
+        t0 = time.perf_counter()
+        hits = index.search(vector, K)
+        search_times.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        scores = vectors @ vector
+        exact = ids[np.argsort(-scores)[:K]]
+        exact_times.append(time.perf_counter() - t0)
+        # Ties are common with lexical vectors; count a hit when its score reaches the exact k-th score
+        kth = np.sort(scores)[-K]
+        recall += sum(1 for _, score in hits if score >= kth - 1e-6) / K
+
+    retrieve_times = []
+    for query in queries[:100]:
+        t0 = time.perf_counter()
+        await memory.retrieve_memory(user_id, query)
+        retrieve_times.append(time.perf_counter() - t0)
+
+    print(f"  exact scan               p50 {percentile(exact_times, 0.5):6.2f} ms  p99 {percentile(exact_times, 0.99):6.2f} ms")
+    print(f"  index search             p50 {percentile(search_times, 0.5):6.2f} ms  p99 {percentile(search_times, 0.99):6.2f} ms  "
+          f"recall@{K} {recall / len(query_vectors):.3f}")
+    print(f"  retrieve_memory (total)  p50 {percentile(retrieve_times, 0.5):6.2f} ms  p99 {percentile(retrieve_times, 0.99):6.2f} ms")
+
+    store._embedder = SlowEmbedder(embedder, SLOW_EMBED_SECONDS)
+    slow_times, found = [], 0
+    for query in queries[:5]:
+        t0 = time.perf_counter()
+        found += len(await memory.retrieve_memory(user_id, query))
+        slow_times.append(time.perf_counter() - t0)
+    print(f"  {SLOW_EMBED_SECONDS:.1f} s query embedding: retrieve_memory max {max(slow_times) * 1000:6.1f} ms "
+          f"(timeout {MEMORY_RETRIEVAL_TIMEOUT * 1000:.0f} ms), {found} memories, {store.retrieval_timeouts} timeouts")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    asyncio.run(main(count, dimensions))
@@ -0,0 +1,147 @@
+"""
+Thousands of clients holding GET /notifications/stream open on a real
+uvicorn server, compared with the 10-second polling it replaces.
+
+Reports connect time, idle CPU and memory while every stream is held,
+fan-out latency for one notification per user, and the CPU the same
+clients would burn polling GET /notifications every 10 seconds.
+Server and clients share one process, so CPU and RSS include both sides.
+
+Usage: python benchmarks/bench_notification_fanout.py [clients] [idle_seconds]
+"""
+import asyncio
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import use_temp_database
+
+use_temp_database()
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.auth.security import create_access_token  # noqa: E402
+from backend.database.database import SessionLocal  # noqa: E402
+from backend.database.models import Notification, User  # noqa: E402
+from backend.realtime.hub import notification_hub  # noqa: E402
+
+PORT = 8765
+BASE = f"http://127.0.0.1:{PORT}"
+POLL_INTERVAL = 10
+
+
+def seed(clients):
+    with SessionLocal() as db:
+        users = [User(email=f"user{i}@bench", name=f"User {i}", password_hash="-") for i in range(clients)]
+        db.add_all(users)
+        db.flush()
+        db.add_all(
+            Notification(user_id=u.id, title="Seed", message="m", type="system", delivered_at=datetime.now())
+            for u in users
+        )
+        db.commit()
+        return [(u.id, create_access_token({"sub": u.email}, timedelta(hours=1))) for u in users]
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def listen(client, token, gate, connected, received):
+    headers = {"Authorization": f"Bearer {token}"}
+    # Bound concurrent handshakes so the connect burst does not overflow the accept queue
+    await gate.acquire()
+    async with client.stream("GET", "/notifications/notifications/stream", headers=headers) as response:
+        gate.release()
+        response.raise_for_status()
+        connected()
+        buffer = ""
+        async for text in response.aiter_text():
+            buffer += text
+            if "event: notification" in buffer:
+                received(time.perf_counter())
+                return
+
+
+async def main(clients, idle_seconds):
+    users = seed(clients)
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning", backlog=clients))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=clients + 10, max_keepalive_connections=clients + 10)
+    async with httpx.AsyncClient(base_url=BASE, limits=limits, timeout=None) as client:
+        # Warm the token cache and measure what one poll costs
+        for _, token in users:
+            await client.get("/notifications/notifications/", headers={"Authorization": f"Bearer {token}"})
+        polls = min(clients, 500)
+        cpu = time.process_time()
+        await asyncio.gather(*[
+            client.get("/notifications/notifications/", headers={"Authorization": f"Bearer {token}"})
+            for _, token in users[:polls]
+        ])
+        cpu_per_poll = (time.process_time() - cpu) / polls
+
+        rss_before = rss_mb()
+        ready = asyncio.Event()
+        open_count = 0
+        arrivals = {}
+
+        def make_callbacks(user_id):
+            def connected():
+                nonlocal open_count
+                open_count += 1
+                if open_count == clients:
+                    ready.set()
+
+            def received(at):
+                arrivals[user_id] = at
+            return connected, received
+
+        gate = asyncio.Semaphore(100)
+        start = time.perf_counter()
+        listeners = [
+            asyncio.create_task(listen(client, token, gate, *make_callbacks(user_id)))
+            for user_id, token in users
+        ]
+        await ready.wait()
+        connect_seconds = time.perf_counter() - start
+        while notification_hub.stats()["connections"] < clients:
+            await asyncio.sleep(0.01)
+
+        cpu = time.process_time()
+        await asyncio.sleep(idle_seconds)
+        idle_cpu = (time.process_time() - cpu) / idle_seconds
+        rss_after = rss_mb()
+
+        sent = time.perf_counter()
+        for user_id, _ in users:
+            notification_hub.publish(user_id, "notification", {"id": 0, "title": "Due", "message": "now"})
+        await asyncio.gather(*listeners)
+        latencies = sorted(arrivals[user_id] - sent for user_id, _ in users)
+
+    server.should_exit = True
+    await server_task
+
+    polling_cpu = cpu_per_poll * clients / POLL_INTERVAL
+    print(f"{clients} clients")
+    print(f"  connected all streams in {connect_seconds:.2f}s, "
+          f"peak RSS {rss_before:.0f} -> {rss_after:.0f} MB "
+          f"(~{(rss_after - rss_before) * 1024 / clients:.1f} KB per connection, both ends)")
+    print(f"  idle streams          {idle_cpu * 100:6.2f}% of a core")
+    print(f"  10 s polling instead  {polling_cpu * 100:6.2f}% of a core "
+          f"({clients / POLL_INTERVAL:.0f} req/s at {cpu_per_poll * 1000:.2f} ms CPU each)")
+    print(f"  fan-out to every user: p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms, "
+          f"last {latencies[-1] * 1000:.1f} ms")
+    print(f"  {notification_hub.stats()}")
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    idle_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(main(clients, idle_seconds))
@@ -0,0 +1,132 @@
+"""
+Hit rate and latency of the study plan cache on replayed plan requests.
+
+The trace is JSON lines of {"goal", "timeframe", "weak_topics"}: either a
+file given on the command line or a generated one, where popular subjects
+recur under different wordings, casing, timeframe spellings and topic
+orders. Each request goes through Planner.generate_plan with a fake
+upstream that takes PLAN_DELAY seconds per plan.
+
+1. Keyed by the raw request (what an unnormalized cache would get).
+2. Normalized key, exact matches only.
+3. Normalized key plus the similarity fallback (local hashing embedder).
+4. A fresh process on the same database (plans come back from the table).
+
+Usage: python benchmarks/bench_plan_cache.py [requests | trace.jsonl]
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from common import FakeMistral, use_temp_database
+
+use_temp_database()
+
+from backend.database.database import Base, engine  # noqa: E402
+from backend.agent.embeddings import HashingEmbedder  # noqa: E402
+from backend.agent.llm import ManagedMistral  # noqa: E402
+from backend.agent.plan_cache import PlanCache  # noqa: E402
+from backend.agent.planner import Planner  # noqa: E402
+
+PLAN_DELAY = 0.05
+# Hashing embedder scores: reworded same subject >= 0.75, different subjects <= 0.6
+SIMILARITY = 0.7
+
+SUBJECTS = {
+    "Python": ["decorators", "async", "generators"],
+    "React": ["hooks", "state management", "routing"],
+    "Machine Learning": ["linear algebra", "statistics", "overfitting"],
+    "SQL": ["joins", "indexes", "window functions"],
+    "Rust": ["ownership", "lifetimes", "traits"],
+    "Spanish": ["verbs", "pronunciation", "listening"],
+    "Data Structures": ["graphs", "trees", "dynamic programming"],
+    "Docker": ["networking", "volumes", "compose"],
+    "Calculus": ["limits", "integrals", "series"],
+    "Guitar": ["chords", "rhythm", "scales"],
+    "TypeScript": ["generics", "types", "tooling"],
+    "System Design": ["caching", "queues", "consistency"],
+}
+WORDINGS = ["Learn {}", "learn {}", "Learn {}!", "I want to learn {}", "{} basics", "Master {}", "learn  {} "]
+TIMEFRAMES = ["2 weeks", "2 Weeks", "two weeks", "4 weeks", "4 weeks ", "1 month", "a month"]
+
+
+def generated_trace(count, seed=7):
+    rng = random.Random(seed)
+    subjects = list(SUBJECTS)
+    weights = [1 / (rank + 1) for rank in range(len(subjects))]  # Zipf-like popularity
+    for _ in range(count):
+        subject = rng.choices(subjects, weights)[0]
+        wording = rng.choices(WORDINGS, [6, 3, 1, 1, 1, 1, 1])[0]
+        topics = rng.sample(SUBJECTS[subject], rng.choice([0, 0, 1, 2]))
+        yield {
+            "goal": wording.format(subject),
+            "timeframe": rng.choices(TIMEFRAMES, [4, 1, 1, 3, 1, 1, 1])[0],
+            "weak_topics": [t.upper() if rng.random() < 0.2 else t for t in topics],
+        }
+
+
+def load_trace(arg):
+    if arg and arg.endswith(".jsonl"):
+        with open(arg) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    return list(generated_trace(int(arg) if arg else 2000))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else 0.0
+
+
+async def replay(label, trace, cache):
+    fake = FakeMistral(plan_delay=PLAN_DELAY)
+    client = ManagedMistral(max_concurrency=8, per_user=8)
+    client.sdk = fake
+    planner = Planner(cache=cache)
+
+    hit_latencies, miss_latencies = [], []
+    started = time.perf_counter()
+    for request in trace:
+        calls = fake.chat.calls
+        t0 = time.perf_counter()
+        await planner.generate_plan(request["goal"], request["timeframe"], request["weak_topics"], client=client)
+        (miss_latencies if fake.chat.calls > calls else hit_latencies).append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    stats = cache.stats()
+    print(f"  {label:<34} hit rate {stats['hit_ratio'] * 100:5.1f}%  upstream calls {fake.chat.calls:>5}  "
+          f"hit p50 {percentile(hit_latencies, 0.5):6.2f} ms p99 {percentile(hit_latencies, 0.99):6.2f} ms  "
+          f"miss p50 {percentile(miss_latencies, 0.5):6.1f} ms  total {elapsed:6.2f} s")
+    print(f"  {'':<34} memory {stats['hits']}, table {stats['db_hits']}, similar {stats['similar_hits']}, "
+          f"misses {stats['misses']}")
+
+
+def fresh_cache(similarity):
+    return PlanCache(max_entries=512, db_size=10000, ttl_seconds=3600, similarity=similarity,
+                     embedder=HashingEmbedder())
+
+
+async def main(trace):
+    Base.metadata.create_all(bind=engine)
+    raw_keys = {json.dumps([r["goal"], r["timeframe"], r["weak_topics"]]) for r in trace}
+    print(f"{len(trace)} plan requests, {PLAN_DELAY * 1000:.0f} ms per upstream plan")
+    print(f"  {'raw request as key':<34} hit rate {(1 - len(raw_keys) / len(trace)) * 100:5.1f}%  "
+          f"upstream calls {len(raw_keys):>5}")
+
+    await replay("normalized key", trace, fresh_cache(similarity=0))
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    await replay(f"normalized + similarity >= {SIMILARITY}", trace, fresh_cache(similarity=SIMILARITY))
+
+    cache = fresh_cache(similarity=SIMILARITY)
+    await replay("restarted, cold memory (table)", trace, cache)
+
+    cache = fresh_cache(similarity=SIMILARITY)
+    await cache.load()
+    await replay("restarted, warmed from the table", trace, cache)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(load_trace(sys.argv[1] if len(sys.argv) > 1 else None)))
@@ -0,0 +1,117 @@
+"""
+System prompt size for growing users, unbounded vs the budgeted builder,
+and the rolling session summary that keeps older turns in the prompt.
+
+For each size, one user gets a session of N long messages, N/10 other
+missions and long memories matching the question. The system message the
+brain sends upstream is measured (estimated tokens, about 4 chars each):
+
+1. Unbounded: the builder with no effective budget (every section in full,
+   as the prompt was assembled before).
+2. Budgeted: the default PROMPT_TOKEN_BUDGET.
+
+Then the session is summarized by SessionSummarizer (fake LLM) and the
+budgeted prompt is shown to carry the summary.
+
+Usage: python benchmarks/bench_prompt_budget.py [sizes, comma separated]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from common import FakeMistral, use_temp_database
+
+use_temp_database()
+
+from backend.database.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import Chat, ChatSession, Goal, User  # noqa: E402
+from backend.agent.brain import AgentBrain  # noqa: E402
+from backend.agent.context import context_cache  # noqa: E402
+from backend.agent.llm import ManagedMistral  # noqa: E402
+from backend.agent.memory import MemoryItem, content_hash  # noqa: E402
+from backend.agent.prompt import PROMPT_TOKEN_BUDGET, PromptBuilder, PromptStats, estimate_tokens  # noqa: E402
+from backend.agent.summary import SessionSummarizer  # noqa: E402
+
+QUESTION = "How should I practice Rust ownership and borrowing this week?"
+WORDS = "rust ownership borrowing lifetimes traits practice review project exercise week plan goal".split()
+
+
+def text(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high) // 7))
+
+
+def seed(size, rng):
+    db = SessionLocal()
+    try:
+        user = User(name="Power", email=f"power{size}@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        session = ChatSession(user_id=user.id, title="Rust")
+        db.add(session)
+        db.commit()
+        db.add_all([Chat(user_id=user.id, session_id=session.id, role="user" if i % 2 == 0 else "agent",
+                         message=text(rng, 200, 2000)) for i in range(size)])
+        others = []
+        for g in range(max(1, size // 10)):
+            other = ChatSession(user_id=user.id, title=f"Other {g}")
+            db.add(other)
+            others.append(other)
+        db.commit()
+        db.add_all([Goal(user_id=user.id, session_id=other.id, text=text(rng, 80, 300), deadline="4 weeks")
+                    for other in others])
+        db.commit()
+        return user.id, session.id
+    finally:
+        db.close()
+
+
+async def system_prompt(brain, user, session_id):
+    brain.client = FakeMistral(reply_tokens=1)
+    async with AsyncSessionLocal() as db:
+        async for _ in brain.process_message_stream(QUESTION, user, db, session_id):
+            pass
+    return brain.client.chat.last_messages[0]["content"]
+
+
+async def main(sizes):
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(5)
+    brain = AgentBrain()
+    print(f"prompt budget {PROMPT_TOKEN_BUDGET} tokens")
+    for size in sizes:
+        user_id, session_id = seed(size, rng)
+        async with AsyncSessionLocal() as db:
+            user = await db.get(User, user_id)
+        memories = [text(rng, 1500, 4000) for _ in range(20)]
+        await brain.memory.store.add_batch([MemoryItem(user_id, t, "exchange", {}, content_hash(t)) for t in memories])
+
+        brain.prompt_builder = PromptBuilder(budget_tokens=10 ** 9, stats=PromptStats())
+        unbounded = await system_prompt(brain, user, session_id)
+        stats = PromptStats()
+        brain.prompt_builder = PromptBuilder(stats=stats)
+        started = time.perf_counter()
+        budgeted = await system_prompt(brain, user, session_id)
+        elapsed = time.perf_counter() - started
+        print(f"  {size:>5} messages, {max(1, size // 10):>3} other missions: unbounded {estimate_tokens(unbounded):>6} tokens  "
+              f"budgeted {estimate_tokens(budgeted):>5} tokens  (dropped {stats.dropped}, turn {elapsed * 1000:.1f} ms)")
+
+    fake = FakeMistral(plan_delay=0.05)
+    client = ManagedMistral(max_concurrency=4, per_user=2)
+    client.sdk = fake
+    summarizer = SessionSummarizer(client=client, enabled=True)
+    started = time.perf_counter()
+    folded = await summarizer.refresh(user_id, session_id)
+    print(f"summarized {folded} older messages of session {session_id} in {fake.chat.calls} LLM calls "
+          f"({time.perf_counter() - started:.2f} s); again: {await summarizer.refresh(user_id, session_id)} folded")
+    context_cache.invalidate(user_id, session_id)
+    brain.prompt_builder = PromptBuilder(stats=PromptStats())
+    prompt = await system_prompt(brain, user, session_id)
+    start = prompt.index("--- EARLIER IN THIS SESSION")
+    print("prompt now carries: " + prompt[start:prompt.index("--- END OF SUMMARY ---")].strip().replace("\n", " | "))
+    print(f"summarizer stats: {summarizer.stats()}")
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10, 100, 1000]
+    asyncio.run(main(sizes))
@@ -0,0 +1,121 @@
+"""
+How much of each chat request a provider-side prompt cache could reuse.
+
+USERS users each hold a TURNS-turn conversation (interleaved, a few
+minutes apart on a simulated clock; every third turn runs a tool round).
+Each upstream request is compared with the same user's previous one by
+PrefixStats: the shared prefix (tool schemas, then the messages), and a
+hit when it covers all the static text (tool schemas, identity and
+guidelines).
+
+1. Legacy layout: identity, then date/time, then per-session data, then
+   the guidelines; the follow-up after a tool round was sent without the
+   tool schemas (the prompt and loop before this layout).
+2. Stable layout: tool schemas, identity and guidelines first; date and
+   per-session data after them; every step sends the same schemas.
+
+Usage: python benchmarks/bench_prompt_prefix.py [users] [turns]
+"""
+import asyncio
+import datetime as datetime_module
+import itertools
+import sys
+
+from common import FakeMistral, seed_user_with_sessions, use_temp_database
+
+use_temp_database()
+
+from backend.database.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import User  # noqa: E402
+from backend.agent import brain as brain_module  # noqa: E402
+from backend.agent.brain import AgentBrain  # noqa: E402
+from backend.agent.context import context_cache  # noqa: E402
+from backend.agent.prompt import PrefixStats  # noqa: E402
+
+IDENTITY = """You are a PURE AUTONOMOUS AI LEARNING AGENT.
+Your core identity is to be PROACTIVE and GOAL-ORIENTED. Don't wait for instructions to be helpful.
+"""
+GUIDELINES = brain_module.SYSTEM_PROMPT_PREFIX[len(IDENTITY):].replace("shown below", "shown above")
+LEGACY_TEMPLATE = IDENTITY + brain_module.SYSTEM_PROMPT_CONTEXT + GUIDELINES
+
+STATIC_CHARS = len(brain_module.TOOLS_JSON) + len(IDENTITY) + len(GUIDELINES)
+
+
+class LayoutStats(PrefixStats):
+    """PrefixStats with hits counted against the same static text for both layouts."""
+
+    def __init__(self, legacy):
+        super().__init__()
+        self.legacy = legacy
+        self.static_hits = 0
+
+    def record(self, user_id, tools_json, messages, static_prefix=""):
+        if self.legacy and messages[-1]["role"] == "tool":
+            tools_json = ""
+        compared = self.compared
+        shared = super().record(user_id, tools_json, messages, static_prefix)
+        if self.compared > compared and shared >= STATIC_CHARS:
+            self.static_hits += 1
+        return shared
+
+
+class SimulatedClock(datetime_module.datetime):
+    """datetime whose now() moves three minutes per call."""
+    current = datetime_module.datetime(2026, 3, 2, 9, 0, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.current += datetime_module.timedelta(minutes=3, seconds=7)
+        return cls.current
+
+
+async def conversation(brain, users, turns):
+    # Messages are not stored; ids above the seeded rows keep them after any summary
+    chat_ids = itertools.count(10 ** 6)
+    real_datetime = datetime_module.datetime
+    datetime_module.datetime = SimulatedClock
+    try:
+        for turn in range(turns):
+            for user, session_id in users:
+                message = f"Turn {turn}: what should I study next?"
+                context_cache.append_message(user.id, session_id, next(chat_ids), "user", message)
+                rounds = [[("conduct_quiz", {"topic": "Rust ownership"})]] if turn % 3 == 2 else None
+                brain.client = FakeMistral(reply_tokens=20, tool_rounds=rounds)
+                reply = []
+                async with AsyncSessionLocal() as db:
+                    async for event in brain.process_message_events(message, user, db, session_id):
+                        if event["type"] == "chat_end":
+                            reply.append(event["full_text"])
+                context_cache.append_message(user.id, session_id, next(chat_ids), "agent", "".join(reply))
+    finally:
+        datetime_module.datetime = real_datetime
+
+
+async def run(label, prefix, template, users, turns):
+    brain_module.SYSTEM_PROMPT_PREFIX = prefix
+    brain_module.SYSTEM_PROMPT_CONTEXT = template
+    stats = LayoutStats(legacy=label == "legacy")
+    brain_module.prefix_stats = stats
+    await conversation(AgentBrain(), users, turns)
+    s = stats.stats()
+    print(f"  {label:<8} requests {s['requests']:>4}  static prefix hits {stats.static_hits / stats.compared:.3f}  "
+          f"shared {stats.shared_chars // stats.compared:>5} chars per request "
+          f"({s['shared_prefix_ratio']:.3f} of it)")
+
+
+async def main(user_count, turns):
+    Base.metadata.create_all(bind=engine)
+    users = []
+    for _ in range(user_count):
+        user_id, session_ids = seed_user_with_sessions(SessionLocal, sessions=3, chats_per_session=6, goals=3)
+        async with AsyncSessionLocal() as db:
+            users.append((await db.get(User, user_id), session_ids[0]))
+
+    stable = (brain_module.SYSTEM_PROMPT_PREFIX, brain_module.SYSTEM_PROMPT_CONTEXT)
+    print(f"{user_count} users x {turns} turns, static text {STATIC_CHARS} chars")
+    await run("legacy", "", LEGACY_TEMPLATE, users, turns)
+    await run("stable", *stable, users, turns)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20, int(sys.argv[2]) if len(sys.argv) > 2 else 6))
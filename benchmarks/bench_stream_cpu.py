@@ -0,0 +1,97 @@
+"""
+CPU time per streamed token of an agent reply.
+
+First the router's per-event work alone: the previous pipeline (brain
+json.dumps each chunk, router json.loads it back, text grown by string
+concatenation, full text re-sent in chat_end) against ReplyRecorder
+(events stay dicts, each serialized once, text kept as a list of parts).
+Then the whole POST /chat/message path with a fake Mistral client that
+streams without delay.
+
+Usage: python benchmarks/bench_stream_cpu.py [tokens_per_reply] [replies]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from common import FakeMistral, use_temp_database
+
+use_temp_database()
+
+import httpx  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.routers import chat as chat_router  # noqa: E402
+from backend.agent.events import ReplyRecorder  # noqa: E402
+
+
+def token_events(tokens):
+    yield {"type": "status", "text": "Analyzing your goal..."}
+    yield {"type": "chat_start", "role": "agent"}
+    for i in range(tokens):
+        yield {"type": "chat_chunk", "text": f"tok{i} "}
+    yield {"type": "chat_end", "full_text": "".join(f"tok{i} " for i in range(tokens))}
+
+
+def legacy_pipeline(tokens):
+    full_agent_text = ""
+    wire = 0
+    for event in token_events(tokens):
+        chunk_str = json.dumps(event) + "\n"  # brain
+        chunk = json.loads(chunk_str.strip())  # router
+        if chunk["type"] == "chat_chunk":
+            full_agent_text += chunk["text"]
+        elif chunk["type"] == "chat_end" and "full_text" in chunk:
+            full_agent_text = chunk["full_text"]
+        wire += len(chunk_str)
+    return full_agent_text, wire
+
+
+def recorder_pipeline(tokens):
+    recorder = ReplyRecorder()
+    wire = 0
+    for event in token_events(tokens):
+        wire += len(recorder.encode(event))
+    return recorder.text, wire
+
+
+def cpu_per_token(pipeline, tokens, replies):
+    start = time.process_time()
+    for _ in range(replies):
+        text, wire = pipeline(tokens)
+    return (time.process_time() - start) / (tokens * replies), wire
+
+
+async def end_to_end(tokens, replies):
+    chat_router.agent_brain.client = FakeMistral(reply_tokens=tokens)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        r = await client.post("/auth/auth/register", json={"email": "bench@example.com", "password": "pw", "name": "Bench"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        session_id = (await client.post("/chat/chat/sessions", json={}, headers=headers)).json()["id"]
+        body = {"message": "hi", "session_id": session_id}
+        await client.post("/chat/chat/message", json=body, headers=headers)  # warm-up
+
+        start = time.process_time()
+        wire = 0
+        for _ in range(replies):
+            response = await client.post("/chat/chat/message", json=body, headers=headers)
+            wire += len(response.content)
+        return (time.process_time() - start) / (tokens * replies), wire // replies
+
+
+def main(tokens, replies):
+    legacy, legacy_wire = cpu_per_token(legacy_pipeline, tokens, replies * 10)
+    recorded, recorded_wire = cpu_per_token(recorder_pipeline, tokens, replies * 10)
+    print(f"{tokens} tokens per reply")
+    print(f"  router work, previous pipeline  {legacy * 1e6:6.2f} us/token   {legacy_wire} bytes/reply")
+    print(f"  router work, ReplyRecorder      {recorded * 1e6:6.2f} us/token   {recorded_wire} bytes/reply "
+          f"({legacy / recorded:.1f}x less CPU)")
+    total, wire = asyncio.run(end_to_end(tokens, replies))
+    print(f"  POST /chat/message end to end   {total * 1e6:6.2f} us/token   {wire} bytes/reply")
+
+
+if __name__ == "__main__":
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    replies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(tokens, replies)
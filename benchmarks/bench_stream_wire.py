@@ -0,0 +1,115 @@
+"""
+The chat stream as a client sees it, on a real uvicorn server.
+
+1. Bytes, frames and process CPU per reply with one frame per token
+   (STREAM_FLUSH_INTERVAL_MS=0) against the default coalescing.
+2. Disconnect: how many tokens the (fake) LLM still produces after the
+   client hangs up mid-reply, and whether the partial reply is stored
+   with its truncated marker.
+3. Backpressure: how far the LLM runs ahead of a client that stops reading.
+
+Usage: python benchmarks/bench_stream_wire.py [tokens_per_reply] [replies]
+"""
+import asyncio
+import sys
+import time
+
+from common import FakeMistral, use_temp_database
+
+use_temp_database()
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from backend.database.database import AsyncSessionLocal  # noqa: E402
+from backend.database.models import Chat  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.agent import streaming  # noqa: E402
+from backend.agent.streaming import stream_stats  # noqa: E402
+from backend.routers import chat as chat_router  # noqa: E402
+
+PORT = 8766
+TOKEN_DELAY = 0.002
+
+
+async def open_session(client):
+    r = await client.post("/auth/auth/register", json={"email": "bench@example.com", "password": "pw", "name": "Bench"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    session_id = (await client.post("/chat/chat/sessions", json={}, headers=headers)).json()["id"]
+    return headers, {"message": "hi", "session_id": session_id}
+
+
+async def replies_cost(client, headers, body, tokens, replies, flush_ms):
+    streaming.STREAM_FLUSH_INTERVAL = flush_ms / 1000
+    chat_router.agent_brain.client = FakeMistral(reply_tokens=tokens, token_delay=TOKEN_DELAY)
+    wire = frames = 0
+    cpu = time.process_time()
+    for _ in range(replies):
+        async with client.stream("POST", "/chat/chat/message", json=body, headers=headers) as response:
+            async for raw in response.aiter_raw():
+                wire += len(raw)
+                frames += raw.count(b"\n")
+    cpu = time.process_time() - cpu
+    print(f"  flush {flush_ms:>3} ms  {wire / replies:8.0f} bytes/reply  {frames / replies:6.1f} frames/reply  "
+          f"{cpu / replies * 1000:6.2f} ms CPU/reply")
+
+
+async def disconnect(client, headers, body, tokens):
+    fake = FakeMistral(reply_tokens=tokens, token_delay=TOKEN_DELAY)
+    chat_router.agent_brain.client = fake
+    cancelled = stream_stats.cancelled_upstream
+    async with client.stream("POST", "/chat/chat/message", json=body, headers=headers) as response:
+        async for line in response.aiter_lines():
+            if fake.chat.chunks_streamed >= 50:
+                break
+    at_hangup = fake.chat.chunks_streamed
+    await asyncio.sleep(0.5)
+    print(f"  disconnect after {at_hangup} of {tokens} tokens: LLM produced "
+          f"{fake.chat.chunks_streamed - at_hangup} more, upstream cancelled: "
+          f"{stream_stats.cancelled_upstream - cancelled == 1}, LLM stream closed: {fake.chat.streams_closed == 1}")
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(Chat).where(Chat.session_id == body["session_id"]).order_by(Chat.id.desc()).limit(1)
+        )).scalars().first()
+    print(f"  stored partial reply: role={row.role} truncated={row.truncated} "
+          f"{len(row.message.split())} tokens")
+
+
+async def stalled_reader(client, headers, body, tokens):
+    fake = FakeMistral(reply_tokens=tokens)
+    chat_router.agent_brain.client = fake
+    async with client.stream("POST", "/chat/chat/message", json=body, headers=headers) as response:
+        stream = response.aiter_raw()
+        await stream.__anext__()
+        await asyncio.sleep(1.0)
+        ahead = fake.chat.chunks_streamed
+        async for _ in stream:
+            pass
+    print(f"  client paused 1 s: LLM ran {ahead} of {tokens} tokens ahead "
+          f"(queue {streaming.STREAM_QUEUE_SIZE} events + socket buffers), "
+          f"{stream_stats.backpressure_waits} producer waits")
+
+
+async def main(tokens, replies):
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=None) as client:
+        headers, body = await open_session(client)
+        print(f"{tokens} tokens per reply, {TOKEN_DELAY * 1000:.0f} ms apart, {replies} replies")
+        await replies_cost(client, headers, body, tokens, replies, flush_ms=0)
+        await replies_cost(client, headers, body, tokens, replies, flush_ms=50)
+        await disconnect(client, headers, body, tokens=2000)
+        await stalled_reader(client, headers, body, tokens=1_000_000)
+
+    server.should_exit = True
+    await server_task
+    print(f"  {stream_stats.stats()}")
+
+
+if __name__ == "__main__":
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    replies = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(main(tokens, replies))
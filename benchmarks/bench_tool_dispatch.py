@@ -0,0 +1,96 @@
+"""
+Time-to-plan when the model asks for several tools in one streamed reply.
+
+The fake model streams REPLY_TOKENS text tokens, then three tool calls
+(generate_study_plan first), each call's arguments split into TOOL_CHUNKS
+pieces, TOKEN_DELAY seconds apart. Generating the plan takes PLAN_DELAY.
+
+1. Buffered: every tool starts after the stream ends (the assembler never
+   reports a call early, which is how the brain used to collect them).
+2. Incremental: each tool starts as soon as its arguments are complete.
+
+Reports when the `plan` event reaches the client and when the reply ends.
+
+Usage: python benchmarks/bench_tool_dispatch.py [runs]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from common import FakeMistral, seed_user_with_sessions, use_temp_database
+
+use_temp_database()
+
+from backend.database.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import User  # noqa: E402
+from backend.agent import brain as brain_module  # noqa: E402
+from backend.agent.brain import AgentBrain  # noqa: E402
+from backend.agent.tool_calls import ToolCallAssembler  # noqa: E402
+
+REPLY_TOKENS = 20
+TOOL_CHUNKS = 30
+TOKEN_DELAY = 0.02
+PLAN_DELAY = 1.0
+
+
+class BufferingAssembler(ToolCallAssembler):
+    """Only hands calls out from finish(), after the whole stream."""
+
+    def _parse(self, position, final=False):
+        return super()._parse(position, final) if final else None
+
+
+def tool_calls(run):
+    return [
+        ("generate_study_plan", {"goal": f"Learn Rust, attempt {run}", "timeframe": "4 weeks",
+                                 "weak_topics": ["ownership", "lifetimes", "traits", "async"]}),
+        ("search_web_resources", {"topic": "Rust ownership and borrowing for beginners"}),
+        ("conduct_quiz", {"topic": "Rust ownership", "difficulty": "beginner"}),
+    ]
+
+
+async def one_reply(brain, user, session_id):
+    start = time.perf_counter()
+    plan_at = None
+    async with AsyncSessionLocal() as db:
+        async for line in brain.process_message_stream("Plan my Rust month", user, db, session_id):
+            kind = json.loads(line)["type"]
+            if kind == "plan":
+                plan_at = time.perf_counter() - start
+            elif kind == "error":
+                raise RuntimeError(line)
+    return plan_at, time.perf_counter() - start
+
+
+async def measure(label, assembler_class, user, session_id, runs):
+    brain_module.ToolCallAssembler = assembler_class
+    brain = AgentBrain()
+    plans, totals = [], []
+    for run in range(runs):
+        brain.client = FakeMistral(reply_tokens=REPLY_TOKENS, token_delay=TOKEN_DELAY,
+                                   tool_calls=tool_calls(f"{label}-{run}"), plan_delay=PLAN_DELAY,
+                                   tool_chunks=TOOL_CHUNKS)
+        plan_at, total = await one_reply(brain, user, session_id)
+        plans.append(plan_at)
+        totals.append(total)
+    plans.sort()
+    totals.sort()
+    print(f"  {label:<12} time to plan p50 {plans[len(plans) // 2]:5.2f} s   "
+          f"reply done p50 {totals[len(totals) // 2]:5.2f} s")
+
+
+async def main(runs):
+    Base.metadata.create_all(bind=engine)
+    user_id, session_ids = seed_user_with_sessions(SessionLocal, sessions=1, chats_per_session=10, goals=1)
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+
+    stream_seconds = (REPLY_TOKENS + 3 * TOOL_CHUNKS) * TOKEN_DELAY
+    print(f"{runs} replies: {stream_seconds:.1f} s of streamed tokens, 3 tool calls, {PLAN_DELAY:.1f} s per plan")
+    await measure("buffered", BufferingAssembler, user, session_ids[0], runs)
+    await measure("incremental", ToolCallAssembler, user, session_ids[0], runs)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
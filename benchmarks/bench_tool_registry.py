@@ -0,0 +1,133 @@
+"""
+The brain's tool registry: isolation, parallel rounds, CPU work and timeouts.
+
+1. get_user_schedule for two users with their own events (each must see
+   only its own; the old tool returned every user's events).
+2. A round of DB tools, awaited one after another on one shared session
+   (the only safe way before) vs gathered through the registry, where
+   each call opens its own session.
+3. A CPU-bound tool run inline on the loop vs as a "cpu" tool on the
+   thread pool, with the event loop lag seen meanwhile.
+4. A tool that overruns its timeout.
+
+Usage: python benchmarks/bench_tool_registry.py [rounds]
+"""
+import asyncio
+import hashlib
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import LoopLagProbe, seed_user_with_sessions, use_temp_database
+
+use_temp_database()
+
+from backend.database.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from backend.database.models import CalendarEvent  # noqa: E402
+from backend.agent.brain import AgentBrain  # noqa: E402
+from backend.agent.tool_registry import ToolContext, ToolHandler, ToolRegistry, ToolStats  # noqa: E402
+
+EVENTS_PER_USER = 200
+
+
+def seed_events(user_id, count):
+    db = SessionLocal()
+    try:
+        start = datetime(2026, 1, 1, 9)
+        db.add_all([
+            CalendarEvent(user_id=user_id, title=f"Session {i}", start_time=start + timedelta(hours=i),
+                          end_time=start + timedelta(hours=i, minutes=45))
+            for i in range(count)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def definition(name):
+    return {"type": "function", "function": {"name": name, "description": name,
+                                             "parameters": {"type": "object", "properties": {}}}}
+
+
+def hash_work(args, ctx):
+    digest = b"seed"
+    for _ in range(args["rounds"]):
+        digest = hashlib.sha256(digest).digest()
+    return {"digest": digest.hex()[:16]}
+
+
+async def hash_work_inline(args, ctx):
+    return hash_work(args, ctx)
+
+
+async def too_slow(args, ctx):
+    await asyncio.sleep(5)
+
+
+ROUND = [
+    ("get_user_schedule", {}),
+    ("get_user_schedule", {"date_str": "2026-01-02"}),
+    ("retrieve_current_plan", {}),
+    ("update_goal_progress", {"completed_tasks": 1, "total_tasks": 4}),
+]
+
+
+async def main(rounds):
+    Base.metadata.create_all(bind=engine)
+    user_a, sessions_a = seed_user_with_sessions(SessionLocal, sessions=1, chats_per_session=10, goals=1)
+    user_b, _ = seed_user_with_sessions(SessionLocal, sessions=1, chats_per_session=10, goals=1)
+    seed_events(user_a, EVENTS_PER_USER)
+    seed_events(user_b, EVENTS_PER_USER)
+
+    brain = AgentBrain()
+    registry = brain.registry
+    ctx = ToolContext(user_a, sessions_a[0])
+
+    schedule_a = await registry.run("get_user_schedule", {}, ctx)
+    schedule_b = await registry.run("get_user_schedule", {}, ToolContext(user_b, 0))
+    ids_a, ids_b = {e["id"] for e in schedule_a}, {e["id"] for e in schedule_b}
+    print(f"schedules: user A {len(ids_a)} events, user B {len(ids_b)} events, shared {len(ids_a & ids_b)}")
+
+    handlers = brain._tool_handlers()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        async with AsyncSessionLocal() as shared:
+            for name, args in ROUND:
+                await handlers[name].fn(args, ctx, db=shared)
+    sequential = (time.perf_counter() - started) / rounds
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*[registry.run(name, args, ctx) for name, args in ROUND])
+    parallel = (time.perf_counter() - started) / rounds
+    print(f"round of {len(ROUND)} DB tools: shared session, sequential {sequential * 1000:6.2f} ms  "
+          f"own sessions, gathered {parallel * 1000:6.2f} ms")
+
+    cpu = ToolRegistry(
+        [definition("hash_inline"), definition("hash_pool"), definition("too_slow")],
+        {
+            "hash_inline": ToolHandler("io", hash_work_inline),
+            "hash_pool": ToolHandler("cpu", hash_work),
+            "too_slow": ToolHandler("io", too_slow, timeout=0.2),
+        },
+        stats=ToolStats(),
+    )
+    for name in ("hash_inline", "hash_pool"):
+        probe = LoopLagProbe()
+        probe.start()
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        await cpu.run(name, {"rounds": 300_000}, ctx)
+        elapsed = time.perf_counter() - started
+        # Let the probe wake up and see how late it is
+        await asyncio.sleep(0.02)
+        await probe.stop()
+        print(f"  {name:<12} {elapsed * 1000:6.1f} ms, {probe.report()}")
+
+    print(f"  too_slow -> {await cpu.run('too_slow', {}, ctx)}")
+    print(f"registry stats: {registry.stats.stats()}")
+    print(f"test registry stats: {cpu.stats.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
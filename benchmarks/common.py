@@ -0,0 +1,208 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark runs against a throwaway SQLite file and a fake Mistral
+client, so no API key or running server is needed.
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_temp_database():
+    """
+    Switches to a fresh temp directory and points the app at its ./app.db,
+    overriding any DATABASE_URL / ASYNC_DATABASE_URL from the environment so
+    a benchmark never touches a real database. Also makes the backend package
+    importable. Must run before importing anything from backend.
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    os.chdir(workdir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'app.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault("MOCK_AGENT_MODE", "false")
+    return workdir
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=delta)]))
+
+
+def _tool_delta(index, call_id, name, arguments):
+    return SimpleNamespace(
+        index=index,
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=arguments),
+    )
+
+
+class _FakeStream:
+    def __init__(self, chunks, token_delay, owner=None):
+        self._chunks = chunks
+        self._token_delay = token_delay
+        self._owner = owner
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._owner is not None:
+            self._owner.streams_closed += 1
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            if self._token_delay:
+                await asyncio.sleep(self._token_delay)
+            if self._owner is not None:
+                self._owner.chunks_streamed += 1
+            yield chunk
+
+
+class _FakeChat:
+    def __init__(self, reply_tokens, token_delay, tool_calls, plan_delay, tool_chunks=2, tool_rounds=None):
+        self.reply_tokens = reply_tokens
+        self.token_delay = token_delay
+        # One list of (name, args) per completion that asks for tools
+        self.tool_rounds = tool_rounds or ([tool_calls] if tool_calls else [])
+        self.tool_chunks = tool_chunks
+        self.plan_delay = plan_delay
+        self.calls = 0
+        self.last_messages = None
+        self.chunks_streamed = 0
+        self.streams_closed = 0
+
+    async def stream_async(self, model, messages, tools=None, tool_choice=None, **kwargs):
+        self.calls += 1
+        self.last_messages = messages
+        chunks = [_chunk(content=f"tok{i} ") for i in range(self.reply_tokens)]
+        # Completions that offer tools ask for the next round not answered yet
+        answered = sum(1 for m in messages if m["role"] == "assistant" and m.get("tool_calls"))
+        if tools and tool_choice != "none" and answered < len(self.tool_rounds):
+            for index, (name, args) in enumerate(self.tool_rounds[answered]):
+                # Arguments arrive in tool_chunks pieces, like streamed tokens
+                raw = json.dumps(args)
+                step = -(-len(raw) // self.tool_chunks)
+                for start in range(0, len(raw), step):
+                    call_id = f"call_{answered}_{index}" if start == 0 else None
+                    chunks.append(_chunk(tool_calls=[_tool_delta(index, call_id, name, raw[start:start + step])]))
+        return _FakeStream(chunks, self.token_delay, owner=self)
+
+    async def complete_async(self, model, messages, response_format=None, **kwargs):
+        self.calls += 1
+        self.last_messages = messages
+        await asyncio.sleep(self.plan_delay)
+        if response_format is None:
+            # Session summaries are plain text
+            folded = messages[-1]["content"].count("\n")
+            message = SimpleNamespace(content=f"Summary covering {folded} more lines of the conversation.")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        plan = {
+            "overview": "Benchmark plan",
+            "duration": "2 weeks",
+            "weekly_schedule": [{"week": 1, "topics": ["Basics"], "activities": ["Read", "Practice"]}],
+            "tips": ["Practice daily"],
+        }
+        message = SimpleNamespace(content=json.dumps(plan))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class _FakeEmbeddings:
+    """Deterministic 1024-dimensional vectors (hashed words), one request per call."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+        self.inputs = 0
+
+    async def create_async(self, model, inputs, **kwargs):
+        from backend.agent.embeddings import HashingEmbedder
+
+        self.calls += 1
+        self.inputs += len(inputs)
+        await asyncio.sleep(self.delay)
+        vectors = HashingEmbedder(dimensions=1024).embed_sync(inputs)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=v.tolist()) for v in vectors])
+
+
+class FakeMistral:
+    """Stand-in for mistralai.Mistral exposing the chat and embedding calls the agent uses."""
+
+    def __init__(self, reply_tokens=40, token_delay=0.0, tool_calls=None, plan_delay=0.0, embed_delay=0.0,
+                 tool_chunks=2, tool_rounds=None):
+        self.chat = _FakeChat(reply_tokens, token_delay, tool_calls, plan_delay, tool_chunks, tool_rounds)
+        self.embeddings = _FakeEmbeddings(embed_delay)
+
+
+def seed_user_with_sessions(SessionLocal, sessions=1, chats_per_session=20, goals=5):
+    """Creates one user with chat sessions, messages and goals. Returns (user_id, [session ids])."""
+    from backend.database.models import User, ChatSession, Chat, Goal
+
+    db = SessionLocal()
+    try:
+        user = User(name="Bench", email=f"bench_{time.time_ns()}@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        session_ids = []
+        for s in range(sessions):
+            chat_session = ChatSession(user_id=user.id, title=f"Bench {s}")
+            db.add(chat_session)
+            db.commit()
+            session_ids.append(chat_session.id)
+            db.add_all([
+                Chat(user_id=user.id, session_id=chat_session.id, role="user" if i % 2 == 0 else "agent",
+                     message=f"message {i} in session {s}")
+                for i in range(chats_per_session)
+            ])
+            if s < goals:
+                db.add(Goal(user_id=user.id, session_id=chat_session.id, text=f"Goal {s}", deadline="2 weeks"))
+        db.commit()
+        return user.id, session_ids
+    finally:
+        db.close()
+
+
+class LoopLagProbe:
+    """Measures how late a periodic timer fires, i.e. how long the event loop was blocked."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.ticks = 0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - start - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += max(lag, 0.0)
+            self.ticks += 1
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def report(self):
+        mean = (self.total_lag / self.ticks) if self.ticks else 0.0
+        return f"loop lag mean {mean * 1000:.2f} ms, max {self.max_lag * 1000:.2f} ms"
@@ -2,12 +2,19 @@ import { Link, useNavigate } from 'react-router-dom';
 import { LogOut, BookOpen, User as UserIcon, MessageSquare, Calendar as CalendarIcon } from 'lucide-react';
 
 import NotificationCenter from './NotificationCenter';
+import api from '../services/api';
 
 const Navbar = () => {
     const navigate = useNavigate();
     const token = localStorage.getItem('token');
 
-    const handleLogout = () => {
+    const handleLogout = async () => {
+        try {
+            // Lets the backend drop its cached session for this token
+            await api.post('/auth/logout');
+        } catch (error) {
+            // Token may already be expired; logging out locally is enough
+        }
         localStorage.removeItem('token');
         navigate('/login');
     };
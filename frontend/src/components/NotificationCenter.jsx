@@ -1,33 +1,36 @@
 import { useState, useEffect } from 'react';
 import { Bell, X, Check, Calendar, Zap, Info } from 'lucide-react';
 import api from '../services/api';
+import { subscribeNotifications } from '../services/notificationStream';
 
 const NotificationCenter = () => {
     const [notifications, setNotifications] = useState([]);
     const [showDropdown, setShowDropdown] = useState(false);
-    const [unreadCount, setUnreadCount] = useState(0);
 
     useEffect(() => {
         const fetchNotifications = async () => {
             try {
                 const response = await api.get('/notifications/');
                 setNotifications(response.data);
-                setUnreadCount(response.data.filter(n => !n.is_read).length);
             } catch (err) {
                 console.error("Failed to fetch notifications");
             }
         };
 
-        fetchNotifications();
-        const interval = setInterval(fetchNotifications, 10000); // Poll every 10 seconds
-        return () => clearInterval(interval);
+        // Pushed by the server as notifications become due; no polling
+        return subscribeNotifications((event, note) => {
+            if (event === 'open' || event === 'resync') {
+                fetchNotifications();
+            } else if (event === 'notification') {
+                setNotifications(prev => prev.some(n => n.id === note.id) ? prev : [note, ...prev]);
+            }
+        });
     }, []);
 
     const markAsRead = async (id) => {
         try {
             await api.patch(`/notifications/${id}/read`);
             setNotifications(prev => prev.map(n => n.id === id ? { ...n, is_read: true } : n));
-            setUnreadCount(prev => Math.max(0, prev - 1));
         } catch (err) {
             console.error("Failed to mark notification as read");
         }
@@ -38,14 +41,13 @@ const NotificationCenter = () => {
         try {
             await api.delete(`/notifications/${id}`);
             setNotifications(prev => prev.filter(n => n.id !== id));
-            if (!notifications.find(n => n.id === id).is_read) {
-                setUnreadCount(prev => Math.max(0, prev - 1));
-            }
         } catch (err) {
             console.error("Failed to delete notification");
         }
     };
 
+    const unreadCount = notifications.filter(n => !n.is_read).length;
+
     const getTypeIcon = (type) => {
         switch (type) {
             case 'daily_task': return <Calendar className="w-4 h-4 text-emerald-400" />;
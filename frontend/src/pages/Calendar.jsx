@@ -10,12 +10,24 @@ const Calendar = () => {
 
     useEffect(() => {
         fetchEvents();
-    }, []);
+    }, [currentDate]);
+
+    const shiftMonth = (delta) => {
+        setCurrentDate(prev => new Date(prev.getFullYear(), prev.getMonth() + delta, 1));
+    };
+
+    // Naive local ISO string, matching how event times are stored
+    const toLocalIso = (date) => new Date(date.getTime() - date.getTimezoneOffset() * 60000).toISOString().slice(0, 19);
 
     const fetchEvents = async () => {
         setLoading(true);
         try {
-            const response = await api.get('/calendar/');
+            // Only the month on screen is loaded
+            const monthStart = new Date(currentDate.getFullYear(), currentDate.getMonth(), 1);
+            const nextMonth = new Date(currentDate.getFullYear(), currentDate.getMonth() + 1, 1);
+            const response = await api.get('/calendar/', {
+                params: { start: toLocalIso(monthStart), end: toLocalIso(nextMonth), limit: 200 }
+            });
             setEvents(response.data);
         } catch (err) {
             console.error("Failed to fetch calendar events");
@@ -59,13 +71,13 @@ const Calendar = () => {
                     <p className="text-slate-400 mt-2 font-medium">Autonomous planning synchronized with your goals.</p>
                 </div>
                 <div className="flex items-center space-x-4 bg-white/5 p-2 rounded-2xl border border-white/5">
-                    <button className="p-2 hover:bg-white/5 rounded-xl text-slate-400">
+                    <button onClick={() => shiftMonth(-1)} className="p-2 hover:bg-white/5 rounded-xl text-slate-400">
                         <ArrowLeft className="w-5 h-5" />
                     </button>
                     <span className="text-sm font-bold text-white px-4">
                         {currentDate.toLocaleDateString([], { month: 'long', year: 'numeric' })}
                     </span>
-                    <button className="p-2 hover:bg-white/5 rounded-xl text-slate-400">
+                    <button onClick={() => shiftMonth(1)} className="p-2 hover:bg-white/5 rounded-xl text-slate-400">
                         <ArrowRight className="w-5 h-5" />
                     </button>
                 </div>
@@ -17,6 +17,11 @@ const Chat = () => {
     const [status, setStatus] = useState('');
     const [searchParams] = useSearchParams();
     const [currentGoal, setCurrentGoal] = useState(null);
+    const [olderCursor, setOlderCursor] = useState(null);
+    const [loadingOlder, setLoadingOlder] = useState(false);
+    const [sessionsCursor, setSessionsCursor] = useState(null);
+    const [loadingSessions, setLoadingSessions] = useState(false);
+    const skipScrollRef = useRef(false);
 
     useEffect(() => {
         const handleClickOutside = (event) => {
@@ -41,15 +46,34 @@ const Chat = () => {
         try {
             const response = await api.get('/chat/sessions');
             setSessions(response.data);
+            setSessionsCursor(response.headers['x-next-cursor'] || null);
             // Auto-selection removed: starts with a fresh chat state (null) by default
         } catch (err) {
             console.error("Failed to fetch sessions");
         }
     };
 
+    const loadMoreSessions = async () => {
+        if (!sessionsCursor || loadingSessions) return;
+        setLoadingSessions(true);
+        try {
+            const response = await api.get('/chat/sessions', { params: { cursor: sessionsCursor } });
+            setSessions(prev => {
+                const known = new Set(prev.map(s => s.id));
+                return [...prev, ...response.data.filter(s => !known.has(s.id))];
+            });
+            setSessionsCursor(response.headers['x-next-cursor'] || null);
+        } catch (err) {
+            console.error("Failed to fetch older sessions");
+        } finally {
+            setLoadingSessions(false);
+        }
+    };
+
     const resetToNewChat = () => {
         setActiveSessionId(null);
         setMessages([]);
+        setOlderCursor(null);
         setActiveMenuId(null);
     };
 
@@ -70,6 +94,7 @@ const Chat = () => {
                 } else {
                     setActiveSessionId(null);
                     setMessages([]);
+                    setOlderCursor(null);
                 }
             }
             setActiveMenuId(null);
@@ -109,9 +134,8 @@ const Chat = () => {
 
     const fetchCurrentGoal = async (sessionId) => {
         try {
-            const response = await api.get('/goals/');
-            const goal = response.data.find(g => g.session_id === sessionId);
-            setCurrentGoal(goal || null);
+            const response = await api.get('/goals/', { params: { session_id: sessionId, limit: 1 } });
+            setCurrentGoal(response.data[0] || null);
         } catch (err) {
             console.error("Failed to fetch goal for session");
         }
@@ -120,8 +144,10 @@ const Chat = () => {
     const fetchHistory = async (sessionId) => {
         setLoading(true);
         try {
+            // Latest page only; older messages are loaded on demand
             const response = await api.get(`/chat/history/${sessionId}`);
             setMessages(response.data);
+            setOlderCursor(response.headers['x-before-cursor'] || null);
         } catch (err) {
             console.error("Failed to fetch history");
         } finally {
@@ -129,7 +155,29 @@ const Chat = () => {
         }
     };
 
+    const loadOlderMessages = async () => {
+        if (!olderCursor || loadingOlder) return;
+        setLoadingOlder(true);
+        try {
+            const response = await api.get(`/chat/history/${activeSessionId}`, {
+                params: { before: olderCursor }
+            });
+            skipScrollRef.current = true;
+            setMessages(prev => [...response.data, ...prev]);
+            setOlderCursor(response.headers['x-before-cursor'] || null);
+        } catch (err) {
+            console.error("Failed to fetch older messages");
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     useEffect(() => {
+        if (skipScrollRef.current) {
+            // Prepending older messages should not jump to the bottom
+            skipScrollRef.current = false;
+            return;
+        }
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
     }, [messages]);
 
@@ -178,13 +226,16 @@ const Chat = () => {
             const decoder = new TextDecoder();
             let accumulatedText = "";
             let agentMsgAdded = false;
+            // A read can end mid-line; the tail waits for the next read
+            let buffered = "";
 
             while (true) {
                 const { done, value } = await reader.read();
                 if (done) break;
 
-                const chunk = decoder.decode(value, { stream: true });
-                const lines = chunk.split('\n');
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n');
+                buffered = lines.pop();
 
                 for (const line of lines) {
                     if (!line.trim()) continue;
@@ -368,6 +419,15 @@ const Chat = () => {
                             )}
                         </div>
                     ))}
+                    {sessionsCursor && (
+                        <button
+                            onClick={loadMoreSessions}
+                            disabled={loadingSessions}
+                            className="w-full px-3 py-2 text-sm text-indigo-600 hover:text-indigo-800 disabled:text-gray-400"
+                        >
+                            {loadingSessions ? 'Loading...' : 'Load older chats'}
+                        </button>
+                    )}
                 </div>
             </div>
 
@@ -404,11 +464,25 @@ const Chat = () => {
                             <p>Start a new conversation</p>
                         </div>
                     )}
+                    {olderCursor && (
+                        <div className="flex justify-center">
+                            <button
+                                onClick={loadOlderMessages}
+                                disabled={loadingOlder}
+                                className="text-sm text-indigo-600 hover:text-indigo-800 disabled:text-gray-400"
+                            >
+                                {loadingOlder ? 'Loading...' : 'Load earlier messages'}
+                            </button>
+                        </div>
+                    )}
                     {messages.map((msg, idx) => (
                         <div key={idx} className={`flex ${msg.role === 'user' ? 'justify-end' : 'justify-start'}`}>
                             <div className={`max-w-[80%] rounded-2xl p-4 ${msg.role === 'user' ? 'bg-indigo-600 text-white rounded-br-none' : 'bg-white text-gray-800 border border-gray-200 rounded-bl-none shadow-sm'}`}>
                                 <p className="whitespace-pre-wrap leading-relaxed">{msg.message}</p>
                                 {renderContent(msg)}
+                                {msg.truncated && (
+                                    <p className="mt-2 text-xs italic text-gray-400">Reply interrupted</p>
+                                )}
                             </div>
                         </div>
                     ))}
@@ -1,7 +1,8 @@
 import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import { useToast } from '../components/ToastProvider';
-import api from '../services/api';
+import api, { fetchAllPages } from '../services/api';
+import { subscribeNotifications } from '../services/notificationStream';
 import { PlusCircle, Target, Clock, Zap, ArrowRight, BookOpen, Star, RefreshCw, CheckCircle } from 'lucide-react';
 
 const Dashboard = () => {
@@ -17,28 +18,28 @@ const Dashboard = () => {
     useEffect(() => {
         fetchGoals();
         fetchTodayAgenda();
-        const pollNotifications = setInterval(async () => {
+        // Autonomous interjections are pushed over the shared notification stream
+        return subscribeNotifications(async (event, note) => {
+            if (event !== 'notification' || note.is_read) return;
+            addToast(note.title, note.message, note.type === 'daily_task' ? 'alert' : 'info');
             try {
-                const response = await api.get('/notifications/');
-                const unread = response.data.filter(n => !n.is_read);
-                if (unread.length > 0) {
-                    const latest = unread[0];
-                    addToast(latest.title, latest.message, latest.type === 'daily_task' ? 'alert' : 'info');
-                    // Mark as read immediately to avoid double toasts in polling
-                    await api.patch(`/notifications/${latest.id}/read`);
-                }
+                // Mark as read immediately so the toast is not repeated
+                await api.patch(`/notifications/${note.id}/read`);
             } catch (err) { }
-        }, 30000); // Poll for autonomous interjections every 30s
-        return () => clearInterval(pollNotifications);
+        });
     }, []);
 
     const fetchTodayAgenda = async () => {
         try {
-            const response = await api.get('/calendar/');
-            // Filter for today
-            const today = new Date().toLocaleDateString();
-            const filtered = response.data.filter(e => new Date(e.start_time).toLocaleDateString() === today);
-            setTodayEvents(filtered);
+            // Today's range is filtered server-side (naive local times, as stored)
+            const toLocalIso = (date) => new Date(date.getTime() - date.getTimezoneOffset() * 60000).toISOString().slice(0, 19);
+            const now = new Date();
+            const start = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+            const end = new Date(now.getFullYear(), now.getMonth(), now.getDate() + 1);
+            const response = await api.get('/calendar/', {
+                params: { start: toLocalIso(start), end: toLocalIso(end) }
+            });
+            setTodayEvents(response.data);
         } catch (err) {
             console.error("Failed to fetch agenda");
         }
@@ -47,8 +48,8 @@ const Dashboard = () => {
     const fetchGoals = async () => {
         setLoading(true);
         try {
-            const response = await api.get('/goals/');
-            setGoals(response.data);
+            // Newest first; every page, since the stats cover all goals
+            setGoals(await fetchAllPages('/goals/'));
         } catch (err) {
             console.error("Failed to fetch goals");
         } finally {
@@ -83,15 +84,15 @@ const Dashboard = () => {
             setGoalInput('');
             setIsModalOpen(false);
 
-            // Poll for the new goal - increased time for agent to process
+            // Poll for the goal of the new session - increased time for agent to process
             let attempts = 0;
             const poll = setInterval(async () => {
                 attempts++;
-                const response = await api.get('/goals/');
-                if (response.data.length > goals.length || attempts > 20) {
-                    setGoals(response.data);
-                    setIsPlanning(false);
+                const response = await api.get('/goals/', { params: { session_id: sessionId, limit: 1 } });
+                if (response.data.length > 0 || attempts > 20) {
                     clearInterval(poll);
+                    setIsPlanning(false);
+                    fetchGoals();
                 }
             }, 3000); // Poll every 3 seconds for up to 60 seconds
 
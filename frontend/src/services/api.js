@@ -17,4 +17,16 @@ api.interceptors.request.use(
     (error) => Promise.reject(error)
 );
 
+// Follows X-Next-Cursor until the last page of a keyset-paginated list
+export const fetchAllPages = async (url, params = {}) => {
+    const items = [];
+    let cursor = null;
+    do {
+        const response = await api.get(url, { params: { ...params, ...(cursor ? { cursor } : {}) } });
+        items.push(...response.data);
+        cursor = response.headers['x-next-cursor'] || null;
+    } while (cursor);
+    return items;
+};
+
 export default api;
@@ -0,0 +1,115 @@
+import api from './api';
+
+// One server-sent event stream per tab, shared by every component that
+// wants notifications. fetch() is used instead of EventSource so the token
+// travels in the Authorization header like every other API call.
+//
+// The stream only carries what the worker holding it publishes. With
+// several server workers a notification created or delivered on another
+// one never arrives here, so a since-token delta sync runs on every
+// (re)connect and every SYNC_INTERVAL_MS while subscribed.
+
+const SYNC_INTERVAL_MS = 60000;
+
+const listeners = new Set();
+// Notification ids already handed to listeners, so the stream and a delta sync never repeat one
+const seen = new Set();
+let controller = null;
+let syncTimer = null;
+let syncToken = null;
+let retryMs = 5000;
+
+const dispatch = (event, data) => {
+    if (event === 'notification') {
+        if (seen.has(data.id)) return;
+        seen.add(data.id);
+    }
+    listeners.forEach(listener => listener(event, data));
+};
+
+const sync = async () => {
+    try {
+        // Without a token this only fetches one (first-page) token; listeners load the full list on 'open'
+        const response = await api.get('/notifications/', {
+            params: syncToken ? { since: syncToken } : { limit: 1 }
+        });
+        const hadToken = syncToken !== null;
+        syncToken = response.headers['x-sync-token'] || syncToken;
+        if (!hadToken) return;
+        if (response.headers['x-sync-mode'] === 'delta') {
+            response.data.forEach(note => dispatch('notification', note));
+        } else {
+            dispatch('resync', {});
+        }
+    } catch (err) {
+        console.error("Notification sync failed", err);
+    }
+};
+
+const parseFrame = (frame) => {
+    let event = 'message';
+    const data = [];
+    frame.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+        else if (line.startsWith('retry:')) retryMs = parseInt(line.slice(6), 10) || retryMs;
+    });
+    if (data.length === 0) return;
+    try {
+        dispatch(event, JSON.parse(data.join('\n')));
+    } catch (err) {
+        console.error("Bad notification frame", err);
+    }
+};
+
+const connect = async () => {
+    controller = new AbortController();
+    const { signal } = controller;
+    while (!signal.aborted) {
+        try {
+            const response = await fetch(`${api.defaults.baseURL}/notifications/stream`, {
+                headers: { 'Authorization': `Bearer ${localStorage.getItem('token')}` },
+                signal
+            });
+            if (!response.ok) throw new Error(`stream status ${response.status}`);
+
+            // Anything published while we were disconnected is picked up by a refetch
+            syncToken = null;
+            await sync();
+            dispatch('open', {});
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const frames = buffer.split('\n\n');
+                buffer = frames.pop();
+                frames.forEach(parseFrame);
+            }
+        } catch (err) {
+            if (signal.aborted) return;
+        }
+        await new Promise(resolve => setTimeout(resolve, retryMs));
+    }
+};
+
+// listener(event, data) receives 'open', 'notification' and 'resync' events
+export const subscribeNotifications = (listener) => {
+    listeners.add(listener);
+    if (!controller) {
+        connect();
+        syncTimer = setInterval(sync, SYNC_INTERVAL_MS);
+    }
+    return () => {
+        listeners.delete(listener);
+        if (listeners.size === 0 && controller) {
+            controller.abort();
+            controller = null;
+            clearInterval(syncTimer);
+            syncTimer = null;
+            syncToken = null;
+        }
+    };
+};
@@ -0,0 +1,30 @@
+import sqlite3
+import os
+import sys
+
+db_path = sys.argv[1] if len(sys.argv) > 1 else "app.db"
+
+if not os.path.exists(db_path):
+    print(f"Error: {db_path} not found.")
+    exit(1)
+
+connection = sqlite3.connect(db_path)
+cursor = connection.cursor()
+
+try:
+    cursor.execute("PRAGMA table_info(memories)")
+    if cursor.fetchall():
+        # Memory duplicates are now per embedder, so texts can be re-embedded after EMBEDDER changes
+        print("Replacing ix_memories_user_hash with ix_memories_user_embedder_hash...")
+        cursor.execute("DROP INDEX IF EXISTS ix_memories_user_hash")
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_memories_user_embedder_hash "
+            "ON memories (user_id, embedder, content_hash)"
+        )
+    connection.commit()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
+    connection.rollback()
+finally:
+    connection.close()
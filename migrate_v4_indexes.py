@@ -0,0 +1,40 @@
+import sqlite3
+import os
+import sys
+
+db_path = sys.argv[1] if len(sys.argv) > 1 else "app.db"
+
+if not os.path.exists(db_path):
+    print(f"Error: {db_path} not found.")
+    exit(1)
+
+# Must match the Index(...) / index=True declarations in backend/database/models.py
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_chats_session_timestamp ON chats (session_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_chats_user_session_timestamp ON chats (user_id, session_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_goals_session_id ON goals (session_id)",
+    "CREATE INDEX IF NOT EXISTS ix_goals_user_id ON goals (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_calendar_events_user_start ON calendar_events (user_id, start_time)",
+    "CREATE INDEX IF NOT EXISTS ix_notifications_user_scheduled_created ON notifications (user_id, scheduled_for, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_notifications_user_created ON notifications (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_created ON chat_sessions (user_id, created_at)",
+]
+
+connection = sqlite3.connect(db_path)
+cursor = connection.cursor()
+
+try:
+    print("Creating composite indexes...")
+    for statement in INDEXES:
+        cursor.execute(statement)
+        print(f"  {statement.split(' ON ')[0].replace('CREATE INDEX IF NOT EXISTS ', '')}")
+
+    # Refresh planner statistics so the new indexes get used
+    cursor.execute("ANALYZE")
+    connection.commit()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
+    connection.rollback()
+finally:
+    connection.close()
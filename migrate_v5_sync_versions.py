@@ -0,0 +1,43 @@
+import sqlite3
+import os
+import sys
+
+db_path = sys.argv[1] if len(sys.argv) > 1 else "app.db"
+
+if not os.path.exists(db_path):
+    print(f"Error: {db_path} not found.")
+    exit(1)
+
+connection = sqlite3.connect(db_path)
+cursor = connection.cursor()
+
+def has_column(table, column):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+try:
+    print("Adding sync version columns...")
+    for table in ("notifications", "calendar_events"):
+        if not has_column(table, "version"):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            print(f"  {table}.version")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS sync_versions (
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        kind VARCHAR NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0,
+        reset_version INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, kind)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_notifications_user_version ON notifications (user_id, version)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_calendar_events_user_version ON calendar_events (user_id, version)")
+
+    connection.commit()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
+    connection.rollback()
+finally:
+    connection.close()
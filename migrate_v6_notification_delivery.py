@@ -0,0 +1,36 @@
+import sqlite3
+import os
+import sys
+
+db_path = sys.argv[1] if len(sys.argv) > 1 else "app.db"
+
+if not os.path.exists(db_path):
+    print(f"Error: {db_path} not found.")
+    exit(1)
+
+connection = sqlite3.connect(db_path)
+cursor = connection.cursor()
+
+try:
+    cursor.execute("PRAGMA table_info(notifications)")
+    if not any(row[1] == "delivered_at" for row in cursor.fetchall()):
+        print("Adding notifications.delivered_at...")
+        cursor.execute("ALTER TABLE notifications ADD COLUMN delivered_at DATETIME")
+        # Everything already visible counts as delivered; the dispatcher picks up the rest at startup
+        cursor.execute("""
+        UPDATE notifications
+        SET delivered_at = COALESCE(scheduled_for, created_at)
+        WHERE scheduled_for IS NULL OR scheduled_for <= datetime('now', 'localtime')
+        """)
+        print(f"  {cursor.rowcount} existing notifications marked delivered")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_notifications_user_read_created ON notifications (user_id, is_read, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_notifications_delivered_scheduled ON notifications (delivered_at, scheduled_for)")
+
+    connection.commit()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
+    connection.rollback()
+finally:
+    connection.close()
@@ -0,0 +1,25 @@
+import sqlite3
+import os
+import sys
+
+db_path = sys.argv[1] if len(sys.argv) > 1 else "app.db"
+
+if not os.path.exists(db_path):
+    print(f"Error: {db_path} not found.")
+    exit(1)
+
+connection = sqlite3.connect(db_path)
+cursor = connection.cursor()
+
+try:
+    cursor.execute("PRAGMA table_info(chats)")
+    if not any(row[1] == "truncated" for row in cursor.fetchall()):
+        print("Adding chats.truncated...")
+        cursor.execute("ALTER TABLE chats ADD COLUMN truncated BOOLEAN DEFAULT 0")
+    connection.commit()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
+    connection.rollback()
+finally:
+    connection.close()
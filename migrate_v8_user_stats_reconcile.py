@@ -0,0 +1,27 @@
+import sqlite3
+import os
+import sys
+
+db_path = sys.argv[1] if len(sys.argv) > 1 else "app.db"
+
+if not os.path.exists(db_path):
+    print(f"Error: {db_path} not found.")
+    exit(1)
+
+connection = sqlite3.connect(db_path)
+cursor = connection.cursor()
+
+try:
+    cursor.execute("PRAGMA table_info(user_stats)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if columns and "reconciled_at" not in columns:
+        # NULL marks existing rows stale, so the next read recomputes them
+        print("Adding user_stats.reconciled_at...")
+        cursor.execute("ALTER TABLE user_stats ADD COLUMN reconciled_at DATETIME")
+    connection.commit()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
+    connection.rollback()
+finally:
+    connection.close()
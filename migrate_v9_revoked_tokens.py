@@ -0,0 +1,29 @@
+import sqlite3
+import os
+import sys
+
+db_path = sys.argv[1] if len(sys.argv) > 1 else "app.db"
+
+if not os.path.exists(db_path):
+    print(f"Error: {db_path} not found.")
+    exit(1)
+
+connection = sqlite3.connect(db_path)
+cursor = connection.cursor()
+
+try:
+    print("Creating revoked_tokens table...")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS revoked_tokens (
+        token_hash VARCHAR NOT NULL PRIMARY KEY,
+        expires_at DATETIME NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at ON revoked_tokens (expires_at)")
+    connection.commit()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
+    connection.rollback()
+finally:
+    connection.close()
@@ -0,0 +1,45 @@
+"""
+Unit tests run against a throwaway SQLite file and never call the Mistral
+API. The environment is set before anything from backend is imported,
+since the database and client settings are read at import time.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix="tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("MISTRAL_API_KEY", None)
+os.environ["MOCK_AGENT_MODE"] = "true"
+os.environ["EMBEDDER"] = "hashing"
+
+from backend.database.database import Base, async_engine, engine  # noqa: E402
+from backend.database import models  # noqa: E402,F401  (registers the tables)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def run():
+    """Runs a coroutine on a fresh event loop, then drops the async pool tied to that loop."""
+    def runner(coro):
+        async def wrapped():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(wrapped())
+    return runner
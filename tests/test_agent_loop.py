@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from backend.agent import brain as brain_module
+from backend.agent.agent_loop import StepBudget, agent_loop_stats
+from backend.agent.brain import AgentBrain
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import ChatSession, User
+
+
+class _Stream:
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+class StubbornChat:
+    """Asks for a tool on every completion, even with tool_choice="none"."""
+
+    def __init__(self):
+        self.tool_choices = []
+
+    async def stream_async(self, model, messages, tools=None, tool_choice=None, **kwargs):
+        self.tool_choices.append(tool_choice)
+        step = len(self.tool_choices)
+        call = SimpleNamespace(index=0, id=f"call_{step}",
+                               function=SimpleNamespace(name="retrieve_current_plan", arguments="{}"))
+        chunks = [SimpleNamespace(content=f"step {step} ", tool_calls=None), SimpleNamespace(content=None, tool_calls=[call])]
+        return _Stream([SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=delta)])) for delta in chunks])
+
+
+def test_tool_calls_after_tool_choice_none_do_not_extend_the_loop(run, monkeypatch):
+    monkeypatch.setattr(brain_module, "StepBudget", lambda: StepBudget(max_steps=2))
+    agent_loop_stats.__init__()
+    brain = AgentBrain()
+    brain.mock_mode = False
+    brain.client = SimpleNamespace(chat=StubbornChat())
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = User(name="Loop", email="loop@example.com", password_hash="x")
+            db.add(user)
+            await db.commit()
+            session = ChatSession(user_id=user.id)
+            db.add(session)
+            await db.commit()
+            return [event async for event in brain.process_message_events("plan?", user, db, session.id)]
+
+    events = run(scenario())
+    assert brain.client.chat.tool_choices == ["auto", "none"]
+    assert events[-1] == {"type": "chat_end", "full_text": "step 1 step 2 "}
+    assert [e["text"] for e in events if e["type"] == "status"].count("Running tool: retrieve_current_plan...") == 1
+    stats = agent_loop_stats.stats()
+    assert stats["steps_per_reply"] == {2: 1}
+    assert stats["ignored_tool_calls"] == 1
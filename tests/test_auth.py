@@ -0,0 +1,31 @@
+from backend.auth.dependencies import _authenticate
+from backend.auth.security import create_access_token
+from backend.auth.token_cache import token_cache
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import User
+from backend.routers.auth import logout
+from fastapi import HTTPException
+import pytest
+
+
+def test_logout_is_seen_by_a_worker_without_the_token_cached(run):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            db.add(User(name="Logout", email="logout@example.com", password_hash="x"))
+            await db.commit()
+        token = create_access_token(data={"sub": "logout@example.com"})
+        assert (await _authenticate(token, None)).email == "logout@example.com"
+
+        async with AsyncSessionLocal() as db:
+            await logout(token, db)
+        # Another worker: nothing cached and no local revocation
+        token_cache._revoked.clear()
+        with pytest.raises(HTTPException) as error:
+            await _authenticate(token, None)
+        assert error.value.status_code == 401
+        assert token_cache.is_revoked(token)
+
+        other = create_access_token(data={"sub": "logout@example.com", "n": 2})
+        assert (await _authenticate(other, None)).email == "logout@example.com"
+
+    run(scenario())
@@ -0,0 +1,24 @@
+from sqlalchemy.engine import make_url
+
+from backend.database.database import _async_url, _engine_options
+
+
+def test_async_url_picks_the_async_driver():
+    assert _async_url("sqlite:///./app.db").drivername == "sqlite+aiosqlite"
+    assert _async_url("postgresql://u:p@db/app").drivername == "postgresql+asyncpg"
+    assert _async_url("postgresql+psycopg2://u:p@db/app").drivername == "postgresql+asyncpg"
+    # Explicit async drivers are left alone
+    assert _async_url("postgresql+asyncpg://u:p@db/app").drivername == "postgresql+asyncpg"
+
+
+def test_async_url_keeps_credentials_and_database():
+    url = _async_url("postgresql://user:secret@db:5433/app")
+    assert (url.username, url.password, url.host, url.port, url.database) == ("user", "secret", "db", 5433, "app")
+
+
+def test_engine_options_pool_servers_and_sqlite_files_but_not_memory():
+    postgres = _engine_options(make_url("postgresql+asyncpg://u:p@db/app"))
+    assert postgres["pool_pre_ping"] is True and "pool_size" in postgres
+    sqlite_file = _engine_options("sqlite+aiosqlite:///./app.db")
+    assert sqlite_file["connect_args"] == {"check_same_thread": False} and "pool_size" in sqlite_file
+    assert "pool_size" not in _engine_options("sqlite:///:memory:")
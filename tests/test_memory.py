@@ -0,0 +1,73 @@
+import asyncio
+
+from backend.agent.embeddings import HashingEmbedder
+from backend.agent.memory import AgentMemory, MemoryItem, MemoryStore, content_hash
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import User
+
+
+class SlowEmbedder(HashingEmbedder):
+    delay = 0.0
+
+    async def embed(self, texts):
+        await asyncio.sleep(self.delay)
+        return self.embed_sync(texts)
+
+
+async def _seeded(email, texts):
+    async with AsyncSessionLocal() as db:
+        user = User(name="Memory", email=email, password_hash="x")
+        db.add(user)
+        await db.commit()
+    store = MemoryStore(embedder=SlowEmbedder())
+    await store.add_batch([MemoryItem(user.id, text, "exchange", {}, content_hash(text)) for text in texts])
+    return user.id, store
+
+
+def test_retrieve_memory_returns_the_closest_memories(run):
+    async def scenario():
+        user_id, store = await _seeded("memory-hit@example.com", [
+            "User: how do rust lifetimes work\nAgent: they bound borrows", "User: css grid layout\nAgent: use areas",
+        ])
+        return await AgentMemory(store).retrieve_memory(user_id, "rust lifetimes and borrows")
+
+    memories = run(scenario())
+    assert memories and "rust lifetimes" in memories[0]["text"]
+
+
+def test_slow_retrieval_gives_up_at_the_timeout_and_keeps_loading(run):
+    async def scenario():
+        user_id, store = await _seeded("memory-slow@example.com", ["User: sql joins\nAgent: start with inner joins"])
+        store.embedder.delay = 0.5
+        memory = AgentMemory(store)
+        started = asyncio.get_running_loop().time()
+        memories = await memory.retrieve_memory(user_id, "sql joins", timeout=0.05)
+        waited = asyncio.get_running_loop().time() - started
+        # The abandoned search still finishes in the background
+        await asyncio.sleep(0.6)
+        return memories, waited, store.retrieval_timeouts, store.retrievals
+
+    memories, waited, timeouts, retrievals = run(scenario())
+    assert memories == []
+    assert waited < 0.3
+    assert timeouts == 1 and retrievals == 1
+
+
+class OtherEmbedder(SlowEmbedder):
+    name = "other"
+
+
+def test_texts_are_stored_again_after_the_embedder_changes(run):
+    text = "User: graph search\nAgent: try breadth-first"
+
+    async def scenario():
+        user_id, store = await _seeded("memory-embedder@example.com", [text])
+        again = await store.add_batch([MemoryItem(user_id, text, "exchange", {}, content_hash(text))])
+        switched = MemoryStore(embedder=OtherEmbedder())
+        stored = await switched.add_batch([MemoryItem(user_id, text, "exchange", {}, content_hash(text))])
+        return again, stored, await AgentMemory(switched).retrieve_memory(user_id, "graph search breadth-first")
+
+    again, stored, memories = run(scenario())
+    assert again == 0
+    assert stored == 1
+    assert memories and memories[0]["text"] == text
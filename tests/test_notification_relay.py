@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import Notification, User
+from backend.realtime.hub import NotificationHub
+from backend.realtime import relay as relay_module
+from backend.realtime.relay import NotificationRelay
+
+
+def test_relay_publishes_other_workers_deliveries_once(run, monkeypatch):
+    hub = NotificationHub(queue_size=10)
+    monkeypatch.setattr(relay_module, "notification_hub", hub)
+    relay = NotificationRelay(interval=1, overlap=10)
+    relay._since = datetime.now()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = User(name="Relay", email="relay@example.com", password_hash="x")
+            db.add(user)
+            await db.commit()
+            queue = hub.subscribe(user.id)
+            # Delivered and published by another worker
+            db.add(Notification(user_id=user.id, title="Due", message="now", delivered_at=datetime.now()))
+            # Already published by this worker
+            local = Notification(user_id=user.id, title="Local", message="now", delivered_at=datetime.now())
+            db.add(local)
+            await db.commit()
+            hub.publish_notification(local)
+        await relay.poll()
+        await relay.poll()
+        frames = []
+        while not queue.empty():
+            frames.append(queue.get_nowait())
+        return frames
+
+    frames = run(scenario())
+    assert len(frames) == 2
+    assert '"title": "Local"' in frames[0] and '"title": "Due"' in frames[1]
+    assert relay.relayed == 1
+
+
+def test_dispatcher_skips_rows_another_worker_delivered(run, monkeypatch):
+    from backend.realtime import dispatcher as dispatcher_module
+    from backend.realtime.dispatcher import NotificationDispatcher
+
+    hub = NotificationHub(queue_size=10)
+    monkeypatch.setattr(dispatcher_module, "notification_hub", hub)
+    dispatcher = NotificationDispatcher(batch_size=10)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = User(name="Dispatch", email="dispatch@example.com", password_hash="x")
+            db.add(user)
+            await db.commit()
+            queue = hub.subscribe(user.id)
+            note = Notification(user_id=user.id, title="Due", message="now", scheduled_for=datetime.now())
+            db.add(note)
+            await db.commit()
+        await dispatcher._deliver([note.id])
+        # A second worker holding the same row in its heap
+        await NotificationDispatcher(batch_size=10)._deliver([note.id])
+        return queue.qsize()
+
+    assert run(scenario()) == 1
+    assert dispatcher.delivered == 1
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine, insert, select
+
+from backend.database.pagination import decode_cursor, encode_cursor, keyset_filter
+
+metadata = MetaData()
+rows = Table("rows", metadata, Column("id", Integer, primary_key=True), Column("created_at", DateTime))
+
+
+def test_cursor_round_trip():
+    at = datetime(2026, 3, 2, 9, 30, 15, 123456)
+    cursor = encode_cursor(at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, datetime, int) == (at, 42)
+    assert decode_cursor(encode_cursor(None, 7), datetime, int) == (None, 7)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(1, 2, 3), encode_cursor("later", 1)])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, datetime, int)
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def table():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    # Equal timestamps so the id breaks ties
+    stamps = [datetime(2026, 1, 1, 9, minute) for minute in (0, 0, 1, 1, 1, 2)]
+    with engine.begin() as conn:
+        conn.execute(insert(rows), [{"id": i + 1, "created_at": at} for i, at in enumerate(stamps)])
+    yield engine
+    engine.dispose()
+
+
+def _walk(engine, descending, page=2):
+    """Pages through the table by cursor, as the routers do."""
+    key = [rows.c.created_at, rows.c.id]
+    order = [c.desc() for c in key] if descending else key
+    seen, cursor = [], None
+    with engine.connect() as conn:
+        while True:
+            query = select(rows)
+            if cursor:
+                query = query.where(keyset_filter(key, decode_cursor(cursor, datetime, int), descending))
+            page_rows = conn.execute(query.order_by(*order).limit(page)).all()
+            if not page_rows:
+                return seen
+            seen.extend(row.id for row in page_rows)
+            cursor = encode_cursor(page_rows[-1].created_at, page_rows[-1].id)
+
+
+def test_keyset_pages_cover_every_row_once(table):
+    assert _walk(table, descending=False) == [1, 2, 3, 4, 5, 6]
+    assert _walk(table, descending=True) == [6, 5, 4, 3, 2, 1]
+
+
+def test_goals_are_listed_newest_first(run):
+    from fastapi import Response
+    from backend.database.database import AsyncSessionLocal
+    from backend.database.models import Goal, User
+    from backend.routers.goals import get_goals
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = User(name="Goals", email="goals-order@example.com", password_hash="x")
+            db.add(user)
+            await db.commit()
+            db.add_all([Goal(user_id=user.id, text=f"Goal {i}", deadline="1 week") for i in range(3)])
+            await db.commit()
+            first = Response()
+            page = await get_goals(first, limit=2, current_user=user, db=db)
+            rest = await get_goals(Response(), cursor=first.headers["X-Next-Cursor"], limit=2, current_user=user, db=db)
+        return [g.text for g in page], [g.text for g in rest]
+
+    assert run(scenario()) == (["Goal 2", "Goal 1"], ["Goal 0"])
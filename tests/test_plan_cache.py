@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from backend.agent.plan_cache import PlanCache, normalize_plan_request, normalize_timeframe, plan_cache_key
+
+
+def _cache(**overrides):
+    options = dict(max_entries=8, db_size=100, ttl_seconds=3600, similarity=0)
+    options.update(overrides)
+    return PlanCache(**options)
+
+
+def test_normalize_plan_request_ignores_case_spacing_and_topic_order():
+    a = normalize_plan_request("  Learn RUST!  ", "2 Weeks", ["Lifetimes", "borrow  checker", ""])
+    b = normalize_plan_request("learn rust", "two weeks", ["Borrow Checker", "lifetimes", "lifetimes"])
+    assert a == b == ("learn rust", "2 weeks", ("borrow checker", "lifetimes"))
+    assert plan_cache_key(a) == plan_cache_key(b)
+
+
+def test_normalize_plan_request_keeps_meaningful_differences():
+    assert normalize_plan_request("Learn C++", "1 week", None)[0] == "learn c++"
+    assert plan_cache_key(normalize_plan_request("learn c#", "", None)) != plan_cache_key(normalize_plan_request("learn c", "", None))
+    assert plan_cache_key(normalize_plan_request("learn go", "2 weeks", None)) != \
+        plan_cache_key(normalize_plan_request("learn go", "3 weeks", None))
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("a month", "1 month"), ("3-day", "3 days"), ("1 weeks", "1 week"), ("twelve  months", "12 months"),
+    ("by friday", "by friday"), ("", ""),
+])
+def test_normalize_timeframe(raw, expected):
+    assert normalize_timeframe(raw) == expected
+
+
+def test_concurrent_identical_requests_share_one_generation(run):
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"roadmap": ["week 1"]}
+
+    async def scenario():
+        cache = _cache()
+        plans = await asyncio.gather(*[
+            cache.get_or_create("Learn Elixir", "2 weeks", None, generate) for _ in range(5)
+        ])
+        again = await cache.get_or_create("learn elixir", "two weeks", [], generate)
+        restarted = await _cache().get_or_create("Learn Elixir", "2 weeks", None, generate)
+        return cache, plans, again, restarted
+
+    cache, plans, again, restarted = run(scenario())
+    assert len(calls) == 1
+    assert all(plan == {"roadmap": ["week 1"]} for plan in plans + [again, restarted])
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 4, 1)
+
+
+def test_failed_generation_reaches_waiters_and_is_not_cached(run):
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("planner down")
+
+    async def scenario():
+        cache = _cache()
+        results = await asyncio.gather(*[
+            cache.get_or_create("Learn Zig", "1 week", None, failing) for _ in range(3)
+        ], return_exceptions=True)
+        retry = await cache.get_or_create("Learn Zig", "1 week", None, lambda: asyncio.sleep(0, {"ok": True}))
+        return results, retry
+
+    results, retry = run(scenario())
+    assert len(attempts) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retry == {"ok": True}
@@ -0,0 +1,29 @@
+from backend.agent.prompt import PrefixStats
+
+
+def request(*messages):
+    return [{"role": "system", "content": "STATIC|per-session"}] + [{"role": "user", "content": m} for m in messages]
+
+
+def test_shared_prefix_grows_with_the_conversation():
+    stats = PrefixStats()
+    assert stats.record(1, "TOOLS", request("hi"), "STATIC|") == 0
+    shared = stats.record(1, "TOOLS", request("hi", "more"), "STATIC|")
+    assert shared == len("TOOLS") + len("STATIC|per-session") + len('{"role": "user", "content": "hi"}')
+    assert stats.stats()["prefix_hits"] == 1
+
+
+def test_changed_static_text_is_a_miss():
+    stats = PrefixStats()
+    stats.record(1, "TOOLS", request("hi"), "STATIC|")
+    assert stats.record(1, "OTHER", request("hi"), "STATIC|") == 0
+    assert stats.stats()["prefix_hits"] == 0
+
+
+def test_keeps_no_conversation_text():
+    stats = PrefixStats(max_users=1)
+    stats.record(1, "TOOLS", request("secret"), "STATIC|")
+    stats.record(2, "TOOLS", request("secret"), "STATIC|")
+    assert list(stats._last) == [2]
+    assert all(isinstance(digest, bytes) for _, digest in stats._last[2])
+    assert "secret" not in repr(stats._last)
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+from backend.agent.context import build_context, context_cache, get_context
+from backend.agent.prompt import PromptBuilder, PromptSection, PromptStats
+from backend.agent.summary import SessionSummarizer
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import Chat, ChatSession, User
+
+
+class FakeCompletions:
+    """Stands in for the Mistral chat API; each summary is numbered."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def complete_async(self, model, messages):
+        self.calls += 1
+        content = f"summary {self.calls}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+async def _session(email):
+    async with AsyncSessionLocal() as db:
+        user = User(name="Summary", email=email, password_hash="x")
+        db.add(user)
+        await db.commit()
+        session = ChatSession(user_id=user.id)
+        db.add(session)
+        await db.commit()
+        return user.id, session.id
+
+
+async def _say(user_id, session_id, count, start=0):
+    async with AsyncSessionLocal() as db:
+        rows = [Chat(user_id=user_id, session_id=session_id, role="user" if i % 2 == 0 else "agent", message=f"m{i}")
+                for i in range(start, start + count)]
+        db.add_all(rows)
+        await db.commit()
+        return [row.id for row in rows]
+
+
+def _summarizer(keep_recent=4, min_new=3):
+    return SessionSummarizer(client=SimpleNamespace(chat=FakeCompletions()), keep_recent=keep_recent,
+                             min_new=min_new, max_fold=40, enabled=True)
+
+
+def test_every_message_is_quoted_or_summarized(run):
+    async def scenario():
+        user_id, session_id = await _session("summary-window@example.com")
+        summarizer = _summarizer()
+        ids, checks = [], []
+        for turn in range(8):
+            ids += await _say(user_id, session_id, 2, start=2 * turn)
+            await summarizer.refresh(user_id, session_id)
+            async with AsyncSessionLocal() as db:
+                context = await build_context(db, user_id, session_id)
+            quoted = [chat_id for chat_id, _, _ in context.session_history]
+            covered = [chat_id for chat_id in ids if chat_id <= context.summarized_until]
+            checks.append((covered + quoted == ids, len(quoted)))
+        return checks, summarizer
+
+    checks, summarizer = run(scenario())
+    assert all(complete for complete, _ in checks)
+    # Between keep_recent and keep_recent + min_new - 1 messages are quoted
+    assert all(4 <= quoted <= 6 for _, quoted in checks[2:])
+    assert summarizer.refreshes > 0
+
+
+def test_cached_context_drops_what_a_new_summary_covers(run):
+    async def scenario():
+        user_id, session_id = await _session("summary-cache@example.com")
+        ids = await _say(user_id, session_id, 8)
+        async with AsyncSessionLocal() as db:
+            context = await get_context(db, user_id, session_id)
+        before = len(context.history_items())
+        await _summarizer().refresh(user_id, session_id)
+        context_cache.append_message(user_id, session_id, ids[-1] + 1, "user", "newest")
+        async with AsyncSessionLocal() as db:
+            cached = await get_context(db, user_id, session_id)
+        return before, cached
+
+    before, cached = run(scenario())
+    assert before == 8
+    assert cached.session_summary.startswith("summary 1")
+    # Four older messages folded, the four latest plus the new one still quoted
+    assert [message for _, _, message in cached.session_history] == ["m4", "m5", "m6", "m7", "newest"]
+    # An older summary arriving late is ignored
+    cached.apply_summary("stale", cached.summarized_until - 1)
+    assert cached.session_summary.startswith("summary 1")
+
+
+def test_budget_drops_the_oldest_history_first():
+    history = PromptSection("history", 1, [f"message {i} " + "x" * 40 + "\n" for i in (5, 4, 3, 2, 1)],
+                            header="<h>\n", footer="</h>\n", chronological=True)
+    prompt = PromptBuilder(budget_tokens=45, stats=PromptStats()).build("{history}", [history])
+    assert prompt.dropped == {"history": 2}
+    assert [line.split(" x")[0] for line in prompt.text.splitlines()[1:-1]] == ["message 3", "message 4", "message 5"]
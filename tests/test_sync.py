@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import Notification, User
+from backend.database.pagination import encode_cursor
+from backend.database.sync import decode_sync_token, encode_sync_token, make_etag, not_modified
+from backend.routers.notifications import get_notifications
+
+
+def _request(headers=None):
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_sync_token_round_trip():
+    assert decode_sync_token(encode_sync_token(17)) == 17
+
+
+@pytest.mark.parametrize("token", ["garbage", encode_cursor(3, "2026-01-01T00:00:00")])
+def test_bad_sync_token_is_a_400(token):
+    with pytest.raises(HTTPException) as error:
+        decode_sync_token(token)
+    assert error.value.status_code == 400
+
+
+def test_not_modified_matches_weak_and_listed_etags():
+    etag = make_etag(1, 5)
+    assert not_modified(_request(), etag) is None
+    assert not_modified(_request({"If-None-Match": '"1-4"'}), etag) is None
+    assert not_modified(_request({"If-None-Match": f'"x", W/{etag}'}), etag).status_code == 304
+
+
+def test_since_token_returns_only_newer_notifications(run):
+    async def listing(db, user, since=None):
+        response = Response()
+        rows = await get_notifications(_request(), response, since=since, cursor=None, limit=50,
+                                       current_user=user, db=db)
+        return [row.title for row in rows], response.headers["X-Sync-Mode"], response.headers["X-Sync-Token"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = User(name="Sync", email="sync@example.com", password_hash="x")
+            db.add(user)
+            await db.commit()
+            db.add(Notification(user_id=user.id, title="first", message="m", type="system", delivered_at=datetime.now()))
+            await db.commit()
+            full = await listing(db, user)
+            db.add(Notification(user_id=user.id, title="second", message="m", type="system", delivered_at=datetime.now()))
+            await db.commit()
+            delta = await listing(db, user, since=full[2])
+            unchanged = await listing(db, user, since=delta[2])
+            return full, delta, unchanged
+
+    full, delta, unchanged = run(scenario())
+    assert full[:2] == (["first"], "full")
+    assert delta[:2] == (["second"], "delta")
+    assert unchanged[:2] == ([], "delta")
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+from backend.agent.tool_calls import ToolCallAssembler
+
+
+def delta(index, arguments="", call_id=None, name=None):
+    return SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_call_is_handed_out_when_its_arguments_close():
+    assembler = ToolCallAssembler()
+    assert assembler.feed(delta(0, '{"topic": "rust', "call_0", "search_web_resources")) == []
+    assert assembler.feed(delta(0, ' {braces} and \\"quotes\\"')) == []
+    ready = assembler.feed(delta(0, '", "tags": [1, {"a": 2}]}'))
+    assert len(ready) == 1
+    assert ready[0]["index"] == 0
+    assert ready[0]["args"] == {"topic": 'rust {braces} and "quotes"', "tags": [1, {"a": 2}]}
+    assert ready[0]["call"]["id"] == "call_0"
+    # Nothing is handed out twice
+    assert assembler.feed(delta(0, " ")) == []
+    assert assembler.finish() == []
+
+
+def test_interleaved_calls_complete_independently():
+    assembler = ToolCallAssembler()
+    assembler.feed(delta(0, '{"goal": ', "call_0", "generate_study_plan"))
+    assembler.feed(delta(1, '{"topic": "sql"', "call_1", "search_youtube_resources"))
+    first = assembler.feed(delta(1, "}"))
+    second = assembler.feed(delta(0, '"Learn SQL"}'))
+    assert [r["call"]["function"]["name"] for r in first + second] == ["search_youtube_resources", "generate_study_plan"]
+    assert [call["id"] for call in assembler.calls] == ["call_0", "call_1"]
+
+
+def test_call_waits_for_its_name_and_dict_arguments_are_accepted():
+    assembler = ToolCallAssembler()
+    assert assembler.feed(delta(0, "{}")) == []
+    ready = assembler.feed(delta(0, None, "call_0", "retrieve_current_plan"))
+    assert ready[0]["args"] == {}
+    dict_args = assembler.feed(delta(1, {"date_str": "2026-03-02"}, "call_1", "get_user_schedule"))
+    assert dict_args[0]["args"] == {"date_str": "2026-03-02"}
+    assert assembler.calls[1]["function"]["arguments"] == '{"date_str": "2026-03-02"}'
+
+
+def test_finish_returns_calls_without_arguments():
+    assembler = ToolCallAssembler()
+    assembler.feed(delta(0, "", "call_0", "retrieve_current_plan"))
+    done = assembler.finish()
+    assert [(d["index"], d["args"]) for d in done] == [(0, {})]
+
+
+def test_reused_index_never_relabels_a_dispatched_call():
+    assembler = ToolCallAssembler()
+    first = assembler.feed(delta(0, '{"date_str": "2026-03-02"}', "c1", "get_user_schedule"))
+    second_start = assembler.feed(delta(0, '{"query": ', "c2", "search_web_resources"))
+    second = assembler.feed(delta(0, '"rust"}'))
+    assert first[0]["call"] is assembler.calls[0]
+    assert assembler.calls[0] == {"id": "c1", "function": {"name": "get_user_schedule", "arguments": '{"date_str": "2026-03-02"}'}}
+    assert second_start == []
+    assert second[0]["index"] == 1
+    assert second[0]["call"]["id"] == "c2" and second[0]["args"] == {"query": "rust"}
+    assert assembler.finish() == []
+
+
+def test_malformed_arguments_fail_only_that_call():
+    assembler = ToolCallAssembler()
+    assert assembler.feed(delta(0, '{"topic": rust}', "c1", "search_web_resources")) == []
+    ready = assembler.feed(delta(1, '{"date_str": "2026-03-02"}', "c2", "get_user_schedule"))
+    assert ready[0]["args"] == {"date_str": "2026-03-02"}
+    done = assembler.finish()
+    assert len(done) == 1
+    assert done[0]["call"]["id"] == "c1" and done[0]["args"] is None
+    assert "Invalid arguments for search_web_resources" in done[0]["error"]
+
+
+def test_brain_answers_a_malformed_call_with_an_error_result(run):
+    from backend.agent.brain import AgentBrain
+
+    assembler = ToolCallAssembler()
+    assembler.feed(delta(0, '{"date_str": ', "c1", "get_user_schedule"))
+    ready = assembler.finish()[0]
+    user = SimpleNamespace(id=1)
+
+    async def scenario():
+        tool_tasks = []
+        event = AgentBrain()._dispatch_tool(ready, user, 2, tool_tasks)
+        return event, tool_tasks[0][0]["id"], await tool_tasks[0][2]
+
+    event, call_id, result = run(scenario())
+    assert event["type"] == "status"
+    assert call_id == "c1"
+    assert result["error"].startswith("Invalid arguments for get_user_schedule")
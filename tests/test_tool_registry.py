@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.agent.brain import AgentBrain
+from backend.agent.tool_registry import ToolContext, ToolHandler, ToolRegistry, ToolStats
+
+CTX = ToolContext(user_id=1, session_id=2)
+
+
+def definition(name):
+    return {"type": "function", "function": {"name": name, "parameters": {"type": "object", "properties": {}}}}
+
+
+def registry(handlers):
+    return ToolRegistry([definition(name) for name in handlers], handlers, stats=ToolStats())
+
+
+def test_definitions_and_handlers_must_match():
+    with pytest.raises(ValueError, match="no handler"):
+        ToolRegistry([definition("a")], {})
+    with pytest.raises(ValueError, match="without a tool definition"):
+        ToolRegistry([], {"a": ToolHandler("io", lambda args, ctx: None)})
+    with pytest.raises(ValueError, match="unknown kind"):
+        ToolRegistry([definition("a")], {"a": ToolHandler("gpu", lambda args, ctx: None)})
+
+
+def test_timeouts_and_failures_become_error_results(run):
+    async def slow(args, ctx):
+        await asyncio.sleep(1)
+
+    async def broken(args, ctx):
+        raise RuntimeError("boom")
+
+    async def echo(args, ctx):
+        return {"user": ctx.user_id, **args}
+
+    tools = registry({
+        "slow": ToolHandler("io", slow, timeout=0.05),
+        "broken": ToolHandler("io", broken),
+        "echo": ToolHandler("io", echo),
+    })
+    async def calls():
+        return await asyncio.gather(
+            tools.run("slow", {}, CTX), tools.run("broken", {}, CTX), tools.run("echo", {"x": 1}, CTX),
+        )
+
+    results = run(calls())
+    assert results[0] == {"error": "slow timed out after 0.05 seconds"}
+    assert results[1] == {"error": "broken failed: boom"}
+    assert results[2] == {"user": 1, "x": 1}
+    stats = tools.stats.stats()
+    assert stats["in_flight"] == 0
+    assert (stats["tools"]["slow"]["timeouts"], stats["tools"]["broken"]["errors"], stats["tools"]["echo"]["calls"]) == (1, 1, 1)
+
+
+def test_db_tools_get_their_own_session_and_cpu_tools_leave_the_loop(run):
+    sessions = []
+
+    async def db_tool(args, ctx, db):
+        sessions.append(db)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    def cpu_tool(args, ctx):
+        return threading.current_thread().name
+
+    tools = registry({"db_tool": ToolHandler("db", db_tool), "cpu_tool": ToolHandler("cpu", cpu_tool)})
+    async def calls():
+        return await asyncio.gather(
+            tools.run("db_tool", {}, CTX), tools.run("db_tool", {}, CTX), tools.run("cpu_tool", {}, CTX),
+        )
+
+    results = run(calls())
+    assert results[:2] == ["ok", "ok"]
+    assert sessions[0] is not sessions[1]
+    assert results[2].startswith("tool-cpu")
+
+
+def test_failed_tools_produce_no_plan_or_resources():
+    brain = AgentBrain()
+    saved = []
+    brain.memory.add_memory = lambda user_id, text, metadata=None: saved.append(text)
+    user = type("User", (), {"id": 1})()
+    error = {"error": "generate_study_plan timed out after 90 seconds"}
+
+    for name in ("generate_study_plan", "search_youtube_resources", "search_web_resources"):
+        events = brain._tool_events(name, error, user)
+        assert [event["type"] for event in events] == ["status"]
+    assert saved == []
+
+    plan = brain._tool_events("generate_study_plan", {"overview": "Learn SQL", "weekly_schedule": []}, user)
+    assert [event["type"] for event in plan] == ["plan"]
+    assert len(saved) == 1
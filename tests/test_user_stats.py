@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete, update
+
+from backend.database.database import AsyncSessionLocal
+from backend.database.models import ChatSession, Goal, User, UserStats
+from backend.routers import profile
+from backend.routers.profile import get_stats
+
+
+async def _user(db, email):
+    user = User(name="Stats", email=email, password_hash="x")
+    db.add(user)
+    await db.commit()
+    return user
+
+
+async def _stats(user):
+    async with AsyncSessionLocal() as db:
+        return await get_stats(current_user=user, db=db)
+
+
+def test_first_read_backfills_then_the_listener_applies_deltas(run):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = await _user(db, "stats-listener@example.com")
+            session = ChatSession(user_id=user.id)
+            db.add(session)
+            db.add_all([Goal(user_id=user.id, text="a", progress=40), Goal(user_id=user.id, text="b", progress=20)])
+            await db.commit()
+        first = await _stats(user)
+
+        async with AsyncSessionLocal() as db:
+            goal = Goal(user_id=user.id, text="c", progress=90, status="completed")
+            db.add(goal)
+            db.add(ChatSession(user_id=user.id))
+            await db.commit()
+            goal.status = "active"
+            goal.progress = 60
+            await db.commit()
+            await db.delete(await db.get(Goal, goal.id))
+            await db.commit()
+            db.add(Goal(user_id=user.id, text="d", progress=30, status="completed"))
+            await db.commit()
+            row = await db.get(UserStats, user.id)
+        return first, row, await _stats(user)
+
+    first, row, second = run(scenario())
+    assert first == {"total_goals": 2, "active_goals": 2, "completed_goals": 0, "total_sessions": 1, "total_progress": 30}
+    assert row.reconciled_at is not None
+    assert second == {"total_goals": 3, "active_goals": 2, "completed_goals": 1, "total_sessions": 2, "total_progress": 30}
+
+
+def test_stale_row_is_reconciled_after_core_writes(run, monkeypatch):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = await _user(db, "stats-core@example.com")
+            db.add_all([Goal(user_id=user.id, text=str(i), progress=10) for i in range(3)])
+            await db.commit()
+        before = await _stats(user)
+        async with AsyncSessionLocal() as db:
+            # Core delete: invisible to the flush listener
+            await db.execute(delete(Goal).where(Goal.user_id == user.id, Goal.text == "0"))
+            await db.commit()
+        cached = await _stats(user)
+        monkeypatch.setattr(profile, "USER_STATS_RECONCILE_SECONDS", -1)
+        return before, cached, await _stats(user)
+
+    before, cached, reconciled = run(scenario())
+    assert before["total_goals"] == 3
+    assert cached["total_goals"] == 3
+    assert reconciled["total_goals"] == 2
+
+
+def test_backfill_does_not_overwrite_an_existing_row(run):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = await _user(db, "stats-conflict@example.com")
+            db.add(UserStats(user_id=user.id, total_goals=7, reconciled_at=profile._utcnow() - timedelta(seconds=1)))
+            await db.commit()
+            await profile.backfill_user_stats(db, user.id)
+            await db.commit()
+            return (await db.get(UserStats, user.id, populate_existing=True)).total_goals
+
+    assert run(scenario()) == 7
+
+
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_reconcile_counts_a_null_status_as_active_like_the_listener(run, monkeypatch):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = await _user(db, "stats-null@example.com")
+            db.add(Goal(user_id=user.id, text="a", progress=10))
+            await db.commit()
+        listened = await _stats(user)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Goal).where(Goal.user_id == user.id).values(status=None))
+            await db.commit()
+        monkeypatch.setattr(profile, "USER_STATS_RECONCILE_SECONDS", -1)
+        return listened, await _stats(user)
+
+    listened, reconciled = run(scenario())
+    assert listened["active_goals"] == 1
+    assert reconciled == listened